@@ -1,8 +1,18 @@
+import asyncio
+import contextlib
+
 from fastapi import FastAPI
-from models.tables import Base
-from routes import auth, users, leaderboard
-from config.db import engine
+from routes import auth, users, leaderboard, metrics
+from config.db import async_engine
 from config.redis import close_sync_redis, close_async_redis, get_async_redis
+from controllers.score_history import (
+    SCORE_WRITE_BEHIND,
+    drain_score_history,
+    run_score_history_writer,
+)
+from controllers.leaderboard_push import close_leaderboard_feeds
+from controllers.retention import LEADERBOARD_IDLE_TTL, run_idle_eviction
+from controllers.user_summaries import listen_for_user_summary_invalidations
 from fastapi.security import HTTPBearer
 
 from fastapi_limiter import FastAPILimiter
@@ -15,13 +25,21 @@ security = HTTPBearer()
 
 @app.on_event("startup")
 async def startup():
-    Base.metadata.create_all(bind=engine)
     try:
         redis = await get_async_redis()
         await FastAPILimiter.init(redis)
         print("FastAPILimiter initialized successfully.")
     except Exception as e:
         print(f"Error initializing FastAPILimiter: {e}")
+    app.state.user_summary_listener = asyncio.create_task(
+        listen_for_user_summary_invalidations()
+    )
+    app.state.score_history_writer = None
+    if SCORE_WRITE_BEHIND:
+        app.state.score_history_writer = asyncio.create_task(run_score_history_writer())
+    app.state.idle_eviction = None
+    if LEADERBOARD_IDLE_TTL:
+        app.state.idle_eviction = asyncio.create_task(run_idle_eviction())
 
 
 @app.get("/")
@@ -32,10 +50,29 @@ def root():
 app.include_router(auth.router)
 app.include_router(users.router)
 app.include_router(leaderboard.router)
+app.include_router(metrics.router)
 
 
 @app.on_event("shutdown")
 async def shutdown():
+    listener = app.state.user_summary_listener
+    listener.cancel()
+    with contextlib.suppress(asyncio.CancelledError):
+        await listener
+    await close_leaderboard_feeds()
+    eviction = app.state.idle_eviction
+    if eviction:
+        eviction.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await eviction
+    writer = app.state.score_history_writer
+    if writer:
+        writer.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await writer
+        # flush queued history rows before the Redis and DB pools go away
+        await drain_score_history()
     close_sync_redis()
     await close_async_redis()
     print("Redis connections closed.")
+    await async_engine.dispose()
@@ -0,0 +1,98 @@
+"""
+Concurrency benchmark: many simultaneous submitters sharing one event loop.
+
+"sync" runs the submit script on the blocking redis_client from inside the
+coroutines, the way the old submit_score did, so every call freezes the loop.
+"async" awaits the same script on the pooled get_async_redis() client, so the
+loop keeps serving other coroutines while Redis answers.
+
+A heartbeat task ticking every 1ms reports the worst event-loop stall.
+
+Run against a live Redis (uses REDIS_HOST / REDIS_PORT like the app):
+    python -m benchmarks.bench_concurrent_submit
+"""
+
+import asyncio
+import os
+import random
+import time
+
+from config.redis import REDIS_MAX_CONNECTIONS, get_async_redis, redis_client
+from controllers.leaderboard import SUBMIT_BEST_SCORE_LUA, submit_best_score
+
+SUBMITTERS = int(os.environ.get("BENCH_SUBMITTERS", "200"))
+SUBMISSIONS_PER_SUBMITTER = int(os.environ.get("BENCH_SUBMISSIONS", "50"))
+BENCH_GAME = "__bench_concurrent_submit__"
+BENCH_KEY = f"leaderboard:{BENCH_GAME}"
+BENCH_VERSION_KEY = f"leaderboard_version:{BENCH_GAME}"
+BENCH_ENCODING_KEY = f"leaderboard_encoding:{BENCH_GAME}"
+
+sync_submit_best_score = redis_client.register_script(SUBMIT_BEST_SCORE_LUA)
+
+
+def submit_args(user_id: int, score: int) -> dict:
+    return {
+        "keys": [
+            BENCH_KEY,
+            BENCH_VERSION_KEY,
+            BENCH_ENCODING_KEY,
+            f"player_games:{user_id}",
+        ],
+        # no periods, top 0, keep all, plain scores
+        "args": [BENCH_GAME, 0, 0, 0, "plain", user_id, score],
+    }
+
+
+async def sync_submitter(user_id: int, rng: random.Random):
+    for _ in range(SUBMISSIONS_PER_SUBMITTER):
+        sync_submit_best_score(**submit_args(user_id, rng.randrange(1_000_000)))
+        await asyncio.sleep(0)
+
+
+async def async_submitter(user_id: int, rng: random.Random):
+    redis = await get_async_redis()
+    for _ in range(SUBMISSIONS_PER_SUBMITTER):
+        await submit_best_score(
+            **submit_args(user_id, rng.randrange(1_000_000)), client=redis
+        )
+
+
+async def heartbeat(stalls: list, stop: asyncio.Event):
+    while not stop.is_set():
+        before = time.perf_counter()
+        await asyncio.sleep(0.001)
+        stalls.append(time.perf_counter() - before - 0.001)
+
+
+async def run(label: str, submitter):
+    redis_client.delete(BENCH_KEY)
+    rng = random.Random(42)
+    stalls: list[float] = []
+    stop = asyncio.Event()
+    ticker = asyncio.create_task(heartbeat(stalls, stop))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(submitter(user_id, rng) for user_id in range(SUBMITTERS)))
+    elapsed = time.perf_counter() - started
+
+    stop.set()
+    await ticker
+    total = SUBMITTERS * SUBMISSIONS_PER_SUBMITTER
+    print(
+        f"{label:<6} {SUBMITTERS} submitters x {SUBMISSIONS_PER_SUBMITTER}: "
+        f"{total / elapsed:,.0f} submissions/s, "
+        f"worst loop stall {max(stalls, default=0) * 1000:.1f}ms"
+    )
+
+
+async def main():
+    print(f"async pool size: {REDIS_MAX_CONNECTIONS} (REDIS_MAX_CONNECTIONS)")
+    await run("sync", sync_submitter)
+    await run("async", async_submitter)
+    redis_client.delete(
+        BENCH_KEY, BENCH_ENCODING_KEY, *(f"player_games:{i}" for i in range(SUBMITTERS))
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,76 @@
+"""
+Stampede benchmark: N clients poll get-leaderboard right after the top
+changed, so every one of them misses the response cache at the same moment.
+
+"direct" has each reader run fetch_leaderboard itself, the way every miss
+did before single-flight: backend calls grow with the readers.
+"coalesced" goes through fetch_cached_leaderboard, where concurrent misses
+for the same page share one rebuild: backend calls stay at one per round.
+
+Run against a live Redis and MySQL (same env as the app):
+    python -m benchmarks.bench_leaderboard_stampede
+"""
+
+import asyncio
+import os
+import time
+
+import controllers.leaderboard_cache as leaderboard_cache
+from config.db import AsyncSessionLocal
+from config.redis import redis_client
+from controllers.leaderboard import fetch_leaderboard, leaderboard_version_key
+
+READERS = [int(n) for n in os.environ.get("BENCH_READERS", "1,10,100,1000").split(",")]
+PLAYERS = int(os.environ.get("BENCH_PLAYERS", "1000"))
+LIMIT = 10
+BENCH_GAME = "__bench_leaderboard_stampede__"
+BENCH_KEY = f"leaderboard:{BENCH_GAME}"
+
+backend_calls = 0
+
+
+async def counted_fetch_leaderboard(*args, **kwargs):
+    global backend_calls
+    backend_calls += 1
+    return await fetch_leaderboard(*args, **kwargs)
+
+
+leaderboard_cache.fetch_leaderboard = counted_fetch_leaderboard
+
+
+async def direct_reader():
+    async with AsyncSessionLocal() as db:
+        await counted_fetch_leaderboard(BENCH_GAME, LIMIT, db)
+
+
+async def coalesced_reader():
+    await leaderboard_cache.fetch_cached_leaderboard(BENCH_GAME, LIMIT)
+
+
+async def run(label: str, reader, readers: int):
+    global backend_calls
+    backend_calls = 0
+    # a submission reached the top: every cached copy is now stale
+    redis_client.incr(leaderboard_version_key(BENCH_GAME))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(reader() for _ in range(readers)))
+    elapsed = time.perf_counter() - started
+
+    print(
+        f"{label:<10} {readers:>5} readers: {backend_calls:>5} backend calls, "
+        f"{elapsed * 1000:.1f}ms"
+    )
+
+
+async def main():
+    redis_client.delete(BENCH_KEY)
+    redis_client.zadd(BENCH_KEY, {user_id: user_id for user_id in range(PLAYERS)})
+    for readers in READERS:
+        await run("direct", direct_reader, readers)
+        await run("coalesced", coalesced_reader, readers)
+    redis_client.delete(BENCH_KEY, leaderboard_version_key(BENCH_GAME))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,65 @@
+"""
+Microbenchmark: Redis side of submit_score, before vs after the Lua upsert.
+
+"before" replays the old zscore -> zadd -> zrevrank sequence (3 round trips),
+"after" runs the atomic SUBMIT_BEST_SCORE_LUA script (1 round trip).
+
+Run against a live Redis (uses REDIS_HOST / REDIS_PORT like the app):
+    python -m benchmarks.bench_submit_score
+"""
+
+import os
+import random
+import time
+
+from config.redis import redis_client
+from controllers.leaderboard import SUBMIT_BEST_SCORE_LUA
+
+submit_best_score = redis_client.register_script(SUBMIT_BEST_SCORE_LUA)
+
+SUBMISSIONS = int(os.environ.get("BENCH_SUBMISSIONS", "20000"))
+PLAYERS = int(os.environ.get("BENCH_PLAYERS", "1000"))
+BENCH_GAME = "__bench_submit_score__"
+BENCH_KEY = f"leaderboard:{BENCH_GAME}"
+BENCH_VERSION_KEY = f"leaderboard_version:{BENCH_GAME}"
+BENCH_ENCODING_KEY = f"leaderboard_encoding:{BENCH_GAME}"
+BENCH_PLAYER_GAMES_KEY = "player_games:__bench_submit_score__"
+
+
+def legacy_submit(user_id: int, score: int):
+    current_best = redis_client.zscore(BENCH_KEY, user_id) or 0
+    if score > current_best:
+        redis_client.zadd(BENCH_KEY, {user_id: score})
+    return current_best, redis_client.zrevrank(BENCH_KEY, user_id)
+
+
+def script_submit(user_id: int, score: int):
+    return submit_best_score(
+        keys=[BENCH_KEY, BENCH_VERSION_KEY, BENCH_ENCODING_KEY, BENCH_PLAYER_GAMES_KEY],
+        # no periods, top 0, keep all, plain scores
+        args=[BENCH_GAME, 0, 0, 0, "plain", user_id, score],
+    )
+
+
+def run(label: str, submit) -> float:
+    redis_client.delete(BENCH_KEY)
+    rng = random.Random(42)
+    submissions = [
+        (rng.randrange(PLAYERS), rng.randrange(1_000_000)) for _ in range(SUBMISSIONS)
+    ]
+
+    started = time.perf_counter()
+    for user_id, score in submissions:
+        submit(user_id, score)
+    elapsed = time.perf_counter() - started
+
+    rate = SUBMISSIONS / elapsed
+    print(f"{label:<8} {SUBMISSIONS} submissions in {elapsed:.2f}s -> {rate:,.0f}/s")
+    return rate
+
+
+if __name__ == "__main__":
+    before = run("before", legacy_submit)
+    after = run("after", script_submit)
+    redis_client.delete(BENCH_KEY, BENCH_ENCODING_KEY, BENCH_PLAYER_GAMES_KEY)
+    print(f"speedup  x{after / before:.2f}")
@@ -0,0 +1,27 @@
+"""
+Fill every player's game index (player_games:{id}) from leaderboard_best.
+
+Run once after deploying the index, before profiles are served from it:
+    python -m commands.backfill_player_games
+"""
+
+import asyncio
+import json
+
+from config.db import AsyncSessionLocal, async_engine
+from config.redis import close_async_redis
+from controllers.leaderboard_sync import backfill_player_games
+
+
+async def main():
+    try:
+        async with AsyncSessionLocal() as db:
+            indexed = await backfill_player_games(db)
+        print(json.dumps({"indexed": indexed}))
+    finally:
+        await close_async_redis()
+        await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
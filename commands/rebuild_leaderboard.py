@@ -0,0 +1,39 @@
+"""
+Rebuild or check a game's Redis leaderboard against the leaderboard table.
+
+    python -m commands.rebuild_leaderboard space_race            # full rebuild
+    python -m commands.rebuild_leaderboard space_race --diff     # report drift
+    python -m commands.rebuild_leaderboard space_race --repair   # fix drift in place
+"""
+
+import argparse
+import asyncio
+import json
+
+from config.db import AsyncSessionLocal, async_engine
+from config.redis import close_async_redis
+from controllers.leaderboard_sync import rebuild_leaderboard, reconcile_leaderboard
+
+
+async def main(game_ids: list[str], diff: bool, repair: bool):
+    try:
+        for game_id in game_ids:
+            async with AsyncSessionLocal() as db:
+                if diff or repair:
+                    report = await reconcile_leaderboard(game_id, db, repair=repair)
+                else:
+                    report = await rebuild_leaderboard(game_id, db)
+            print(json.dumps(report))
+    finally:
+        await close_async_redis()
+        await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("game_ids", nargs="+")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--diff", action="store_true", help="only report drift")
+    mode.add_argument("--repair", action="store_true", help="fix drift in place")
+    args = parser.parse_args()
+    asyncio.run(main(args.game_ids, args.diff, args.repair))
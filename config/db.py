@@ -1,6 +1,7 @@
 import os
 
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
 from urllib.parse import quote_plus
 
@@ -51,3 +52,48 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+# Async drivers for the same database, used by the async def routes so their
+# queries don't block the event loop: aiomysql in Docker, aiosqlite for tests.
+ASYNC_DRIVERS = {
+    "mysql+pymysql": "mysql+aiomysql",
+    "mysql": "mysql+aiomysql",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+
+def to_async_url(url: str) -> str:
+    driver, separator, rest = url.partition("://")
+    return ASYNC_DRIVERS.get(driver, driver) + separator + rest
+
+
+ASYNC_DATABASE_URL = os.environ.get("ASYNC_DATABASE_URL", to_async_url(DATABASE_URL))
+
+async_engine_options = {}
+if not ASYNC_DATABASE_URL.startswith("sqlite"):
+    # Connections only live for the duration of a query, so a small pool serves
+    # hundreds of in-flight requests; extra requests wait for a free connection.
+    async_engine_options = {
+        "pool_size": int(os.environ.get("DB_POOL_SIZE", "10")),
+        "max_overflow": int(os.environ.get("DB_MAX_OVERFLOW", "20")),
+    }
+
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    pool_pre_ping=True,
+    pool_recycle=3600,
+    **async_engine_options,
+)
+
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine,
+    autoflush=False,
+    # objects stay usable after commit; async sessions can't lazy-load expired attributes
+    expire_on_commit=False,
+)
+
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -0,0 +1,12 @@
+from typing import Callable
+
+# name -> function returning the current values, read by GET /metrics
+collectors: dict[str, Callable[[], dict]] = {}
+
+
+def register_collector(name: str, collector: Callable[[], dict]):
+    collectors[name] = collector
+
+
+def collect_metrics() -> dict:
+    return {name: collector() for name, collector in collectors.items()}
@@ -2,10 +2,16 @@ import os
 
 import redis
 from redis import asyncio as aioredis
+from redis.commands.core import AsyncScript
 
 
 REDIS_HOST = os.environ.get("REDIS_HOST", "redis")
 REDIS_PORT = int(os.environ.get("REDIS_PORT", "6379"))
+# Size of the async connection pool shared by every request in this worker.
+# When all connections are busy, callers wait up to REDIS_POOL_TIMEOUT seconds
+# for one to be released instead of opening more.
+REDIS_MAX_CONNECTIONS = int(os.environ.get("REDIS_MAX_CONNECTIONS", "50"))
+REDIS_POOL_TIMEOUT = float(os.environ.get("REDIS_POOL_TIMEOUT", "5"))
 
 # Synchronous Redis client
 # the connection pool reuses connections for better performance so its fine to not close it after every use
@@ -22,15 +28,27 @@ async def get_async_redis() -> aioredis.Redis:
     global async_redis_client
 
     if async_redis_client is None:
-        async_redis_client = await aioredis.from_url(
+        pool = aioredis.BlockingConnectionPool.from_url(
             f"redis://{REDIS_HOST}:{REDIS_PORT}",
+            max_connections=REDIS_MAX_CONNECTIONS,
+            timeout=REDIS_POOL_TIMEOUT,
             encoding="utf-8",
             decode_responses=True,
         )
+        async_redis_client = aioredis.Redis(connection_pool=pool)
 
     return async_redis_client
 
 
+def register_script(script: str) -> AsyncScript:
+    """
+    Register a Lua script that is not bound to any client.
+    The async client can be closed and recreated, so callers pass the live one
+    on every call: await script(keys=[...], args=[...], client=redis).
+    """
+    return AsyncScript(None, script.encode())
+
+
 def close_sync_redis():
     redis_client.close()
 
@@ -1,33 +1,64 @@
+import asyncio
+import hashlib
+import hmac
 import secrets
 import os
 import uuid
+from concurrent.futures import ThreadPoolExecutor
 from sqlite3 import IntegrityError
+from controllers.user_summaries import invalidate_user_summary
 from controllers.users import generate_default_avatar
-from fastapi import status, HTTPException
+from fastapi import status, HTTPException, Request
 from models.request import LoginRequest, RegisterRequest
 from models.response import RegisterResponse
 from models.tables import User
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from passlib.context import CryptContext
 import jwt
 from datetime import datetime, timedelta, timezone
 from dotenv import load_dotenv
 from pydantic import EmailStr
+from config.cache import LRUCache
 from config.mail import fast_mail
+from config.metrics import register_collector
 from fastapi_mail import MessageType, MessageSchema
 
-# deprecated="auto" ensures compatibility with older hashes
-# bcrypt__rounds=12 sets the cost factor for bcrypt the more rounds, the more secure but slower
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=12)
-
 load_dotenv()
 
+# deprecated="auto" ensures compatibility with older hashes
+# bcrypt__rounds sets the cost factor for bcrypt the more rounds, the more secure but slower
+# hashes made with a different cost are flagged for rehash on the next login
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+pwd_context = CryptContext(
+    schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS
+)
+
+# bcrypt burns ~250ms of CPU per call, so it runs on a dedicated bounded pool
+# instead of the event loop (bcrypt releases the GIL while hashing).
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "4"))
+# jobs allowed to wait for a free worker; beyond that requests fail fast with 503
+PASSWORD_HASH_MAX_QUEUE = int(os.getenv("PASSWORD_HASH_MAX_QUEUE", "16"))
+password_hash_executor = ThreadPoolExecutor(
+    max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash"
+)
+# running + queued jobs, only touched from the event loop thread
+password_hash_jobs = 0
+
 SECRET_KEY = os.getenv("SECRET_KEY")
 ALGORITHM = os.getenv("ALGORITHM")
+# shared secret for game servers calling service endpoints (batch submission)
+SERVICE_API_KEY = os.getenv("SERVICE_API_KEY")
+
+# Decoded payloads of recently verified tokens, keyed by the token's sha256 and
+# expiring with the token itself, so repeat requests skip signature checks.
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "10000"))
+verified_tokens = LRUCache(maxsize=TOKEN_CACHE_SIZE)
+register_collector("token_cache", verified_tokens.stats)
 
 
 async def register_user(
-    request: RegisterRequest, db: Session, client_ip: str
+    request: RegisterRequest, db: AsyncSession, client_ip: str
 ) -> RegisterResponse:
 
     print(f"Registration attempt from IP: {client_ip}")
@@ -39,14 +70,12 @@ async def register_user(
     avatar_url = generate_default_avatar(username)
 
     # Check if email or username or phone number already exists
-    existing_user = (
-        db.query(User)
-        .filter(
+    existing_user = await db.scalar(
+        select(User).where(
             (User.email == email)
             | (User.username == username)
             | (User.phone_number == phone_number)
         )
-        .first()
     )
     # If any of them exist, raise a conflict error
     # TODO consider the is_active flag here to allow reusing email/username/phone of deactivated accounts, or add a separate unique constraint on active accounts only
@@ -71,7 +100,9 @@ async def register_user(
     verification_expiry = datetime.now(timezone.utc) + timedelta(hours=1)
 
     try:
-        password_hash = hash_password(request.password)
+        password_hash = await run_password_job(hash_password, request.password)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -93,17 +124,17 @@ async def register_user(
         # Add and commit the new user to the database
         db.add(new_user)
 
-        db.commit()
+        await db.commit()
 
         # reload the instance from the database to get any defaults set by the DB
-        db.refresh(new_user)
+        await db.refresh(new_user)
 
         print(
             "User registered successfully.",
             f"user_name : {new_user.username}, email: {new_user.email}",
         )
     except IntegrityError as e:
-        db.rollback()
+        await db.rollback()
         # This catches database constraint violations
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT,
@@ -111,7 +142,7 @@ async def register_user(
         )
 
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Registration failed. Please try again",
@@ -130,14 +161,18 @@ async def register_user(
     )
 
 
-def login_user(request: LoginRequest, db: Session) -> dict:
-    existing_user = db.query(User).filter(User.username == request.username).first()
+async def login_user(request: LoginRequest, db: AsyncSession) -> dict:
+    existing_user = await db.scalar(
+        select(User).where(User.username == request.username)
+    )
 
-    if (
-        not existing_user
-        or not verify_password(request.password, existing_user.password_hash)
-        or not existing_user.is_active
-    ):
+    is_valid, new_hash = False, None
+    if existing_user:
+        is_valid, new_hash = await run_password_job(
+            verify_and_update_password, request.password, existing_user.password_hash
+        )
+
+    if not existing_user or not is_valid or not existing_user.is_active:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Invalid username or password.",
@@ -147,6 +182,14 @@ def login_user(request: LoginRequest, db: Session) -> dict:
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Email not verified. Please verify your email before logging in.",
         )
+    if new_hash:
+        # stored hash uses an outdated cost, upgrade it now that we know the password
+        existing_user.password_hash = new_hash
+        try:
+            await db.commit()
+        except Exception as e:
+            print("Failed to rehash password on login:", e)
+            await db.rollback()
     token = create_token(existing_user.id, existing_user.username)
     return {"message": "Login successful.", "token": token}
 
@@ -160,6 +203,41 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
 
+def verify_and_update_password(
+    plain_password: str, hashed_password: str
+) -> tuple[bool, str | None]:
+    # returns a new hash when the stored one was made with a different cost
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
+
+async def run_password_job(func, *args):
+    """
+    Run a bcrypt call on the password hash pool.
+    Raises 503 straight away when the pool's queue is full instead of letting
+    logins pile up behind each other.
+    """
+    global password_hash_jobs
+
+    if password_hash_jobs >= PASSWORD_HASH_WORKERS + PASSWORD_HASH_MAX_QUEUE:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Server is busy. Please try again shortly.",
+            headers={"Retry-After": "1"},
+        )
+    password_hash_jobs += 1
+    loop = asyncio.get_running_loop()
+    job = password_hash_executor.submit(func, *args)
+    # the slot is freed when the hash is done (or cancelled before it started),
+    # not when a disconnecting client stops waiting for it
+    job.add_done_callback(lambda _: loop.call_soon_threadsafe(release_password_job))
+    return await asyncio.wrap_future(job)
+
+
+def release_password_job():
+    global password_hash_jobs
+    password_hash_jobs -= 1
+
+
 def create_token(user_id: int, username: str) -> str:
     """Create a simple JWT token"""
     payload = {
@@ -173,14 +251,34 @@ def create_token(user_id: int, username: str) -> str:
 
 
 def verify_token(token: str) -> dict:
+    token_digest = hashlib.sha256(token.encode()).digest()
+    payload = verified_tokens.get(token_digest)
+    if payload is not None:
+        return payload
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        print("Decoded JWT payload:", payload)
-        return payload
     except jwt.ExpiredSignatureError:
         return {"error": "Token has expired."}
     except jwt.InvalidTokenError:
         return {"error": "Invalid token."}
+    if "exp" in payload:
+        verified_tokens.set(token_digest, payload, expires_at=payload["exp"])
+    return payload
+
+
+def verify_service_key(request: Request) -> None:
+    """Service endpoints authenticate the calling game server, not a player."""
+    service_key = request.headers.get("X-Service-Key")
+    # compare_digest so the check doesn't leak how much of the key matched
+    if (
+        not SERVICE_API_KEY
+        or not service_key
+        or not hmac.compare_digest(service_key.encode(), SERVICE_API_KEY.encode())
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid service credentials.",
+        )
 
 
 async def send_auth_email(
@@ -256,9 +354,9 @@ def generate_verification_email_content(username: str, verification_url: str) ->
     return text_content
 
 
-def email_verification(code: str, db: Session) -> dict:
+async def email_verification(code: str, db: AsyncSession) -> dict:
     # check if code exists
-    user = db.query(User).filter(User.email_verification_code == code).first()
+    user = await db.scalar(select(User).where(User.email_verification_code == code))
     if not user or not user.is_active:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -280,20 +378,21 @@ def email_verification(code: str, db: Session) -> dict:
     user.email_verification_code = None
     user.email_verification_expiry = None
     try:
-        db.commit()
-        db.refresh(user)
-        return {"message": "Email verified successfully."}
+        await db.commit()
+        await db.refresh(user)
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to verify email. please try again.",
         )
+    await invalidate_user_summary(user.id)
+    return {"message": "Email verified successfully."}
 
 
-async def resend_verification(email: str, db: Session, client_ip: str) -> dict:
+async def resend_verification(email: str, db: AsyncSession, client_ip: str) -> dict:
     print(f"Resend verification attempt from IP: {client_ip} for email: {email}")
-    user = db.query(User).filter(User.email == email.lower().strip()).first()
+    user = await db.scalar(select(User).where(User.email == email.lower().strip()))
     if not user or not user.is_active:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -309,10 +408,10 @@ async def resend_verification(email: str, db: Session, client_ip: str) -> dict:
     user.email_verification_expiry = verification_expiry
 
     try:
-        db.commit()
-        db.refresh(user)
+        await db.commit()
+        await db.refresh(user)
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to resend verification email.",
@@ -326,10 +425,10 @@ async def resend_verification(email: str, db: Session, client_ip: str) -> dict:
     return {"message": "Verification email resent successfully."}
 
 
-async def forgot_password(email: str, db: Session, client_ip: str) -> dict:
+async def forgot_password(email: str, db: AsyncSession, client_ip: str) -> dict:
     print(f"Forgot password attempt from IP: {client_ip} for email: {email}")
 
-    user = db.query(User).filter(User.email == email.lower().strip()).first()
+    user = await db.scalar(select(User).where(User.email == email.lower().strip()))
     if not user or not user.is_active:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -345,10 +444,10 @@ async def forgot_password(email: str, db: Session, client_ip: str) -> dict:
     user.password_reset_code = verification_code
     user.password_reset_expiry = datetime.now(timezone.utc) + timedelta(hours=1)
     try:
-        db.commit()
-        db.refresh(user)
+        await db.commit()
+        await db.refresh(user)
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to initiate password reset.",
@@ -382,8 +481,8 @@ def generate_password_reset_email_content(username: str, verification_url: str)
     return text_content
 
 
-def reset_password(code: str, new_password: str, db: Session) -> dict:
-    user = db.query(User).filter(User.password_reset_code == code).first()
+async def reset_password(code: str, new_password: str, db: AsyncSession) -> dict:
+    user = await db.scalar(select(User).where(User.password_reset_code == code))
     if not user or not user.is_active:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -398,15 +497,15 @@ def reset_password(code: str, new_password: str, db: Session) -> dict:
         )
     RegisterRequest.validate_password(new_password)
 
-    user.password_hash = hash_password(new_password)
+    user.password_hash = await run_password_job(hash_password, new_password)
     user.password_reset_code = None
     user.password_reset_expiry = None
     try:
-        db.commit()
-        db.refresh(user)
+        await db.commit()
+        await db.refresh(user)
         return {"message": "Password reset successfully."}
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to reset password.",
@@ -0,0 +1,65 @@
+from datetime import datetime, timezone
+
+from sqlalchemy import case, func
+from sqlalchemy.dialects import mysql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models.tables import LeaderboardBest
+
+
+def best_scores_upsert(dialect_name: str):
+    """
+    INSERT into leaderboard_best that keeps the higher score on a duplicate
+    (game_id, user_code). MySQL in production, SQLite's ON CONFLICT in tests.
+    """
+    table = LeaderboardBest.__table__
+    if dialect_name == "sqlite":
+        statement = sqlite.insert(table)
+        new = statement.excluded
+        return statement.on_conflict_do_update(
+            index_elements=[table.c.game_id, table.c.user_code],
+            set_={
+                "achieved_at": case(
+                    (new.best_score > table.c.best_score, new.achieved_at),
+                    else_=table.c.achieved_at,
+                ),
+                # sqlite's two-argument max() is GREATEST
+                "best_score": func.max(table.c.best_score, new.best_score),
+            },
+        )
+
+    statement = mysql.insert(table)
+    new = statement.inserted
+    # MySQL applies these left to right, so achieved_at has to read the old
+    # best_score before it is raised
+    return statement.on_duplicate_key_update(
+        [
+            (
+                "achieved_at",
+                case(
+                    (new.best_score > table.c.best_score, new.achieved_at),
+                    else_=table.c.achieved_at,
+                ),
+            ),
+            ("best_score", func.greatest(table.c.best_score, new.best_score)),
+        ]
+    )
+
+
+async def upsert_best_scores(db: AsyncSession, history_rows: list[dict]):
+    """Fold leaderboard history rows into leaderboard_best, in the caller's transaction."""
+    if not history_rows:
+        return
+    now = datetime.now(timezone.utc)
+    await db.execute(
+        best_scores_upsert(db.get_bind().dialect.name),
+        [
+            {
+                "game_id": row["game_id"],
+                "user_code": row["user_code"],
+                "best_score": row["score"],
+                "achieved_at": row.get("created_at") or now,
+            }
+            for row in history_rows
+        ],
+    )
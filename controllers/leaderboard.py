@@ -1,127 +1,758 @@
-from models.request import SubmitScoreRequest
-from models.response import UserProfileResponse
-from models.tables import LeaderboardEntry, User
-from sqlalchemy.orm import Session
-from config.redis import redis_client
-from config.redis import get_async_redis
+import base64
+import json
+import os
+from collections import defaultdict
 
+from models.request import SubmitScoreRequest, SubmitScoresBatchRequest
+from models.response import AuthenticatedUser
+from models.tables import LeaderboardBest, LeaderboardEntry
+from sqlalchemy import func, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from sqlalchemy.orm import aliased
+from config.db import AsyncSessionLocal
+from config.redis import get_async_redis, register_script
+from controllers.best_scores import upsert_best_scores
+from controllers.periods import Period, leaderboard_key, period_boards
+from controllers.retention import evicted_key, keep_top, trim_board
+from controllers.score_history import (
+    SCORE_WRITE_BEHIND,
+    enqueue_history,
+    new_history_entry,
+)
+from controllers.tie_break import (
+    decode_score,
+    encode_score,
+    encoding_key,
+    score_encoding,
+    score_in_range,
+)
+from controllers.user_summaries import get_user_summaries, get_user_summary
 
-def submit_score(
-    request: SubmitScoreRequest, current_user: UserProfileResponse, db: Session
+# Keeps each player's best score in one game and returns, per player,
+# {previous_best, new_rank}. Running the compare-and-set inside Redis makes it
+# atomic, so two game servers submitting for the same player at once can't
+# overwrite a higher score. The same call raises the player's score on every
+# open period board (ZADD GT) and records the game in each player's game
+# index so profile lookups never have to SCAN the keyspace. When a raised
+# score lands in the top N of any board, the game's version counter is bumped
+# so cached top-N responses (controllers.leaderboard_cache) are rebuilt, and
+# the new version is published for live feeds (controllers.leaderboard_push).
+# Games with a keep-top-K policy (controllers.retention) are trimmed back to K
+# afterwards; a player cut off gets a nil rank. A call that creates the
+# all-time board records the score encoding it was written with
+# (controllers.tie_break), so a new game is not rebuilt for lacking one.
+# KEYS: all-time board, P period boards, version key, encoding key, then one
+#       player_games key per player
+# ARGV: game_id, P, P expire-at timestamps, N, K (0: keep all), encoding,
+#       then member/score pairs in the same order as the player keys
+SUBMIT_BEST_SCORE_LUA = """
+local periods = tonumber(ARGV[2])
+local version_key = KEYS[periods + 2]
+local top_n = tonumber(ARGV[periods + 3])
+local keep = tonumber(ARGV[periods + 4])
+local first_player = periods + 4
+local first_pair = periods + 6
+local created = redis.call('ZCARD', KEYS[1]) == 0
+local previous = {}
+local top_changed = false
+for i = first_player, #KEYS do
+    local n = i - first_player
+    local member, score = ARGV[first_pair + 2 * n], ARGV[first_pair + 2 * n + 1]
+    local best = redis.call('ZSCORE', KEYS[1], member)
+    if not best or tonumber(score) > tonumber(best) then
+        redis.call('ZADD', KEYS[1], score, member)
+        top_changed = top_changed or redis.call('ZREVRANK', KEYS[1], member) < top_n
+    end
+    for p = 2, periods + 1 do
+        if redis.call('ZADD', KEYS[p], 'GT', 'CH', score, member) == 1 then
+            top_changed = top_changed or redis.call('ZREVRANK', KEYS[p], member) < top_n
+        end
+    end
+    redis.call('SADD', KEYS[i], ARGV[1])
+    previous[n + 1] = best
+end
+for p = 2, periods + 1 do
+    redis.call('EXPIREAT', KEYS[p], ARGV[p + 1])
+end
+if keep > 0 then
+    redis.call('ZREMRANGEBYRANK', KEYS[1], 0, -(keep + 1))
+end
+if created then
+    redis.call('SET', KEYS[periods + 3], ARGV[periods + 5], 'NX')
+end
+if top_changed then
+    local version = redis.call('INCR', version_key)
+    redis.call('PUBLISH', 'leaderboard_updates:' .. ARGV[1], version)
+end
+local result = {}
+for n = 0, #KEYS - first_player do
+    result[2 * n + 1] = previous[n + 1]
+    result[2 * n + 2] = redis.call('ZREVRANK', KEYS[1], ARGV[first_pair + 2 * n])
+end
+return result
+"""
+submit_best_score = register_script(SUBMIT_BEST_SCORE_LUA)
+
+# A member's rank and the entries within ARGV[2] places of it. The window
+# bounds depend on the rank, so this has to run server side to stay one trip.
+# KEYS: board  ARGV: member, radius
+AROUND_MEMBER_LUA = """
+local rank = redis.call('ZREVRANK', KEYS[1], ARGV[1])
+if not rank then
+    return {}
+end
+local radius = tonumber(ARGV[2])
+local first = math.max(rank - radius, 0)
+return {rank, redis.call('ZREVRANGE', KEYS[1], first, rank + radius, 'WITHSCORES')}
+"""
+around_member = register_script(AROUND_MEMBER_LUA)
+
+# Next page after a (score, member) cursor. When the member still holds that
+# score its rank is the resume point, O(log N). Otherwise (it moved or was
+# removed) resume at the cursor's score, skipping ties already returned: ties
+# come in descending member order, so those above the cursor member were seen.
+# They are counted by binary search over the ties' ranks, one ZREVRANGE of a
+# single rank per step, so a score shared by many players is still
+# O(log(ties) * log N).
+# KEYS: board  ARGV: cursor member, cursor score, page size
+PAGE_AFTER_LUA = """
+local start
+local current = redis.call('ZSCORE', KEYS[1], ARGV[1])
+if current and tonumber(current) == tonumber(ARGV[2]) then
+    start = redis.call('ZREVRANK', KEYS[1], ARGV[1]) + 1
+else
+    local low = redis.call('ZCOUNT', KEYS[1], '(' .. ARGV[2], '+inf')
+    local high = low + redis.call('ZCOUNT', KEYS[1], ARGV[2], ARGV[2])
+    while low < high do
+        local mid = math.floor((low + high) / 2)
+        if redis.call('ZREVRANGE', KEYS[1], mid, mid)[1] > ARGV[1] then
+            low = mid + 1
+        else
+            high = mid
+        end
+    end
+    start = low
+end
+local stop = start + tonumber(ARGV[3]) - 1
+return {start, redis.call('ZREVRANGE', KEYS[1], start, stop, 'WITHSCORES')}
+"""
+page_after = register_script(PAGE_AFTER_LUA)
+
+# get-leaderboard page size cap; pages above the threshold are streamed
+LEADERBOARD_MAX_PAGE_SIZE = int(os.getenv("LEADERBOARD_MAX_PAGE_SIZE", "1000"))
+LEADERBOARD_STREAM_THRESHOLD = int(os.getenv("LEADERBOARD_STREAM_THRESHOLD", "200"))
+LEADERBOARD_STREAM_CHUNK = 100
+# submissions landing this high on a board invalidate cached top-N responses,
+# so it is also the largest cached page
+LEADERBOARD_CACHE_TOP_N = int(os.getenv("LEADERBOARD_CACHE_TOP_N", "100"))
+
+
+def submit_best_score_params(game_id: str, scores: list[tuple[int, int]]) -> dict:
+    """keys/args for submit_best_score from (user_id, score) pairs of one game"""
+    boards = period_boards(game_id)
+    keys = [leaderboard_key(game_id)] + [key for key, _ in boards]
+    keys.extend([leaderboard_version_key(game_id), encoding_key(game_id)])
+    args = [game_id, len(boards)] + [expire_at for _, expire_at in boards]
+    args.extend([LEADERBOARD_CACHE_TOP_N, keep_top(game_id), score_encoding(game_id)])
+    for user_id, score in scores:
+        keys.append(player_games_key(user_id))
+        args.extend([user_id, encode_score(game_id, score)])
+    return {"keys": keys, "args": args}
+
+
+def score_result(game_id: str, score: int, previous_best, rank: int) -> dict:
+    current_best = decode_score(game_id, previous_best) or 0
+
+    if score <= current_best:
+        return {
+            "message": "Score submitted successfully.",
+            "best_score": current_best,
+            "score": score,
+            "rank": rank + 1,
+        }
+    else:
+        return {
+            "message": "Score submitted successfully.",
+            "previous_best": current_best,
+            "score": score,
+            "rank": rank + 1,
+        }  # rank is 0-based
+
+
+def is_trimmed_rank(game_id: str, rank: int | None) -> bool:
+    # a kept board only ranks its top K exactly
+    keep = keep_top(game_id)
+    return bool(keep) and (rank is None or rank >= keep)
+
+
+def cold_score_result(score: int, cold: tuple[int, int] | None) -> dict:
+    # below the kept top K: best and rank come from leaderboard_best, which
+    # in write-behind mode may not have this submission yet
+    best, rank = cold or (score, None)
+    return {
+        "message": "Score submitted successfully.",
+        "best_score": max(best, score),
+        "score": score,
+        "rank": None if rank is None else rank + 1,
+        "approximate": True,
+    }
+
+
+async def submit_score(
+    request: SubmitScoreRequest, current_user: AuthenticatedUser, db: AsyncSession
 ):
     # Logic to submit the score to the leaderboard
     score = request.score
     game_id = request.game_id
     user_id = current_user.id
-    existing_user = db.query(User).filter(User.id == current_user.id).first()
+    existing_user = await get_user_summary(current_user.id, db)
     if not existing_user or not existing_user.is_active:
         return {"error": "User not found."}
+    if not score_in_range(game_id, score):
+        return {"error": "Score out of range for this game."}
     user_code = existing_user.user_code
 
-    # Insert in the LeaderboardEntry table (SQL)
-    new_sumbission = LeaderboardEntry(user_code=user_code, game_id=game_id, score=score)
-    db.add(new_sumbission)
-    try:
-        db.commit()
-    except Exception as e:
-        print("Error during score submission:", e)
-        db.rollback()
-        return {"error": "Score submission failed."}
+    history = new_history_entry(user_code, game_id, score)
+    if not SCORE_WRITE_BEHIND:
+        # Insert in the LeaderboardEntry table (SQL)
+        new_sumbission = LeaderboardEntry(**history)
+        db.add(new_sumbission)
+        try:
+            # same transaction, so leaderboard_best never disagrees with history
+            await upsert_best_scores(db, [history])
+            await db.commit()
+        except Exception as e:
+            print("Error during score submission:", e)
+            await db.rollback()
+            return {"error": "Score submission failed."}
 
     # Insert in Redis sorted set for quick leaderboard retrieval
-    redis_key = f"leaderboard:{game_id}"
     try:
-        current_best = redis_client.zscore(redis_key, user_id) or 0
-        print("Current best score in Redis:", current_best)
+        async_redis_client = await get_async_redis()
+        params = submit_best_score_params(game_id, [(user_id, score)])
+        if SCORE_WRITE_BEHIND:
+            # ranking update and queued history row are applied together (MULTI)
+            async with async_redis_client.pipeline(transaction=True) as pipe:
+                await submit_best_score(**params, client=pipe)
+                enqueue_history(pipe, [history])
+                (previous_best, rank), _ = await pipe.execute()
+        else:
+            # one atomic round trip: keep the max score and read the new rank
+            previous_best, rank = await submit_best_score(
+                **params, client=async_redis_client
+            )
+    except Exception as e:
+        print("Error updating Redis leaderboard:", e)
+        if not SCORE_WRITE_BEHIND:
+            # the row is committed, so SQL still holds this player's best; a
+            # wider outage is fixed with controllers.leaderboard_sync
+            await resync_player_best(game_id, user_id, user_code, db)
+        return {"error": "Score submission failed at leaderboard update."}
 
-        if score <= current_best:
-            rank = redis_client.zrevrank(redis_key, user_id)
-            return {
-                "message": "Score submitted successfully.",
-                "best_score": current_best,
-                "score": score,
-                "rank": rank + 1,
+    if is_trimmed_rank(game_id, rank):
+        # Redis took the score; a failed count only loses the rank
+        try:
+            cold = await fetch_cold_ranks(game_id, [user_code], db)
+        except Exception as e:
+            print("Error counting ranks in SQL:", e)
+            cold = {}
+        return cold_score_result(score, cold.get(user_code))
+    return score_result(game_id, score, previous_best, rank)
+
+
+async def submit_scores_batch(
+    request: SubmitScoresBatchRequest, db: AsyncSession
+) -> dict:
+    """
+    Submit a finished round for many players at once (game servers).
+    One bulk INSERT for the history rows (or one XADD each in write-behind
+    mode) and one pipeline holding one submit_best_score call per game.
+    Results come back in request order.
+    """
+    entries = request.entries
+    users = await get_user_summaries([entry.user_id for entry in entries], db)
+
+    results: list[dict | None] = [None] * len(entries)
+    accepted = []
+    for index, entry in enumerate(entries):
+        user = users.get(entry.user_id)
+        if not user or not user.is_active:
+            results[index] = {"user_id": entry.user_id, "error": "User not found."}
+        elif not score_in_range(entry.game_id, entry.score):
+            results[index] = {
+                "user_id": entry.user_id,
+                "error": "Score out of range for this game.",
             }
         else:
+            accepted.append((index, entry, user.user_code))
+    if not accepted:
+        return {"results": results}
 
-            redis_client.zadd(redis_key, {user_id: score})
-            rank = redis_client.zrevrank(redis_key, user_id)
-            return {
-                "message": "Score submitted successfully.",
-                "previous_best": current_best,
-                "score": score,
-                "rank": rank + 1,
-            }  # rank is 0-based
+    history = [
+        new_history_entry(user_code, entry.game_id, entry.score)
+        for _, entry, user_code in accepted
+    ]
+    if not SCORE_WRITE_BEHIND:
+        try:
+            await db.execute(insert(LeaderboardEntry), history)
+            await upsert_best_scores(db, history)
+            await db.commit()
+        except Exception as e:
+            print("Error during batch score submission:", e)
+            await db.rollback()
+            return {"error": "Score submission failed."}
+
+    by_game = defaultdict(list)
+    for index, entry, _ in accepted:
+        by_game[entry.game_id].append((index, entry))
+
+    try:
+        async_redis_client = await get_async_redis()
+        async with async_redis_client.pipeline(transaction=SCORE_WRITE_BEHIND) as pipe:
+            for game_id, game_entries in by_game.items():
+                await submit_best_score(
+                    **submit_best_score_params(
+                        game_id,
+                        [(entry.user_id, entry.score) for _, entry in game_entries],
+                    ),
+                    client=pipe,
+                )
+            if SCORE_WRITE_BEHIND:
+                enqueue_history(pipe, history)
+            replies = (await pipe.execute())[: len(by_game)]
     except Exception as e:
         print("Error updating Redis leaderboard:", e)
-        # TODO: Redis failed after SQL commit — add refresh_redis_leaderboard(game_id, db) to resync Redis from SQL, then retry zadd
+        if not SCORE_WRITE_BEHIND:
+            # the rows are committed: put the SQL bests back, as submit_score does
+            players_by_game = defaultdict(dict)
+            for _, entry, user_code in accepted:
+                players_by_game[entry.game_id][user_code] = entry.user_id
+            for game_id, players in players_by_game.items():
+                await resync_player_bests(game_id, players, db)
         return {"error": "Score submission failed at leaderboard update."}
 
+    user_codes = {index: user_code for index, _, user_code in accepted}
+    cold = defaultdict(list)
+    for game_entries, reply in zip(by_game.values(), replies):
+        for (index, entry), previous_best, rank in zip(
+            game_entries, reply[::2], reply[1::2]
+        ):
+            if is_trimmed_rank(entry.game_id, rank):
+                cold[entry.game_id].append((index, entry))
+                continue
+            results[index] = {
+                "user_id": entry.user_id,
+                "game_id": entry.game_id,
+                **score_result(entry.game_id, entry.score, previous_best, rank),
+            }
 
-def fetch_leaderboard(game_id: str, limit: int, db: Session):
-    # Logic to fetch the leaderboard for a specific game
-    redis_key = f"leaderboard:{game_id}"
+    # players cut off a trimmed board: one SQL query per game
+    for game_id, game_entries in cold.items():
+        try:
+            cold_ranks = await fetch_cold_ranks(
+                game_id, [user_codes[index] for index, _ in game_entries], db
+            )
+        except Exception as e:
+            print("Error counting ranks in SQL:", e)
+            cold_ranks = {}
+        for index, entry in game_entries:
+            results[index] = {
+                "user_id": entry.user_id,
+                "game_id": entry.game_id,
+                **cold_score_result(entry.score, cold_ranks.get(user_codes[index])),
+            }
+    return {"results": results}
+
+
+def ranked_entries(game_id: str, entries, first_rank: int, users: dict) -> list[dict]:
+    """ZREVRANGE (member, score) pairs to response rows, keeping Redis ranks."""
+    leaderboard = []
+    for rank, (user_id, score) in enumerate(entries, start=first_rank):
+        user = users.get(int(user_id))
+        # TODO if user is None, it means the user was deleted after submitting score — add a placeholder username like "Deleted User" and consider removing their score from Redis
+        if user and user.is_active:
+            leaderboard.append(
+                {
+                    "rank": rank,
+                    "username": user.username,
+                    "score": decode_score(game_id, score),
+                }
+            )
+    return leaderboard
+
+
+def encode_cursor(member: str, score: float) -> str:
+    return base64.urlsafe_b64encode(json.dumps([score, member]).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> tuple[float, str]:
     try:
-        top_entries = redis_client.zrevrange(
-            redis_key, 0, limit - 1, withscores=True
-        )  # Get top 'limit' entries in descending order with scores
-        print("Top entries from Redis:", top_entries)
-        leaderboard = []
-        for rank, (user_id, score) in enumerate(top_entries, start=1):
-            user = db.query(User).filter(User.id == int(user_id)).first()
-            # TODO if user is None, it means the user was deleted after submitting score — add a placeholder username like "Deleted User" and consider removing their score from Redis
-            if user and user.is_active:
-                leaderboard.append(
-                    {"rank": rank, "username": user.username, "score": score}
-                )
-        return {"game_id": game_id, "leaderboard": leaderboard}
+        score, member = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return float(score), str(member)
+    except Exception:
+        raise ValueError("Invalid cursor.")
+
+
+async def fetch_leaderboard_page(
+    game_id: str,
+    limit: int,
+    period: Period = "all",
+    offset: int = 0,
+    cursor: str | None = None,
+) -> dict:
+    """
+    One page of (member, score) pairs plus the 0-based rank of the first one.
+    Offsets and cursors both resolve to a rank in O(log N), so page 10,000
+    costs the same as page 1; cursors also stay put while scores change.
+    """
+    redis_key = leaderboard_key(game_id, period)
+    try:
+        score_member = decode_cursor(cursor) if cursor else None
+    except ValueError as e:
+        return {"error": str(e)}
+    try:
+        async_redis_client = await get_async_redis()
+        if score_member is None:
+            entries = await async_redis_client.zrevrange(
+                redis_key, offset, offset + limit - 1, withscores=True
+            )  # Get 'limit' entries from 'offset' in descending order with scores
+            first_rank = offset
+        else:
+            score, member = score_member
+            first_rank, flat_entries = await page_after(
+                keys=[redis_key], args=[member, score, limit], client=async_redis_client
+            )
+            entries = [
+                (member, float(score))
+                for member, score in zip(flat_entries[::2], flat_entries[1::2])
+            ]
+        return {"first_rank": first_rank, "entries": entries}
     except Exception as e:
         print("Error fetching leaderboard from Redis:", e)
         return {"error": "Failed to fetch leaderboard."}
 
 
-def fetch_user_rank(game_id: str, current_user: UserProfileResponse) -> dict:
+def next_cursor(entries, limit: int) -> str | None:
+    # a short page is the last one
+    if len(entries) < limit:
+        return None
+    member, score = entries[-1]
+    return encode_cursor(member, score)
+
+
+async def fetch_leaderboard(
+    game_id: str,
+    limit: int,
+    db: AsyncSession,
+    period: Period = "all",
+    offset: int = 0,
+    cursor: str | None = None,
+):
+    # Logic to fetch the leaderboard for a specific game
+    page = await fetch_leaderboard_page(game_id, limit, period, offset, cursor)
+    if "error" in page:
+        return page
+    entries = page["entries"]
+    try:
+        # resolve every username in one batch (cache, then a single IN (...) query)
+        users = await get_user_summaries([int(user_id) for user_id, _ in entries], db)
+    except Exception as e:
+        print("Error resolving leaderboard users:", e)
+        return {"error": "Failed to fetch leaderboard."}
+    leaderboard = ranked_entries(game_id, entries, page["first_rank"] + 1, users)
+    response = {"game_id": game_id, "leaderboard": leaderboard}
+    if period != "all":
+        response["period"] = period
+    cursor = next_cursor(entries, limit)
+    if cursor:
+        response["next_cursor"] = cursor
+    return response
+
+
+async def stream_leaderboard(
+    game_id: str,
+    page: dict,
+    limit: int,
+    period: Period = "all",
+    session_factory: async_sessionmaker = AsyncSessionLocal,
+):
+    """
+    JSON body for a large page, written LEADERBOARD_STREAM_CHUNK rows at a
+    time so usernames are looked up (and bytes sent) as the page goes out.
+    Uses its own session: the request's one may be closed before the body.
+    """
+    entries = page["entries"]
+    head = {"game_id": game_id}
+    if period != "all":
+        head["period"] = period
+    yield json.dumps(head)[:-1].encode() + b', "leaderboard": ['
+
+    separator = b""
+    async with session_factory() as db:
+        for start in range(0, len(entries), LEADERBOARD_STREAM_CHUNK):
+            chunk = entries[start : start + LEADERBOARD_STREAM_CHUNK]
+            users = await get_user_summaries([int(user_id) for user_id, _ in chunk], db)
+            first_rank = page["first_rank"] + start + 1
+            for row in ranked_entries(game_id, chunk, first_rank, users):
+                yield separator + json.dumps(row).encode()
+                separator = b", "
+
+    cursor = next_cursor(entries, limit)
+    yield b"]" + (f', "next_cursor": "{cursor}"'.encode() if cursor else b"") + b"}"
+
+
+async def fetch_around_me(
+    game_id: str,
+    current_user: AuthenticatedUser,
+    db: AsyncSession,
+    radius: int,
+    top: int = 0,
+    period: Period = "all",
+) -> dict:
+    """
+    The player's rank window (radius entries above and below) and optionally
+    the global top, in one round trip; every username resolved in one batch.
+    """
+    redis_key = leaderboard_key(game_id, period)
+    try:
+        async_redis_client = await get_async_redis()
+        async with async_redis_client.pipeline(transaction=False) as pipe:
+            await around_member(
+                keys=[redis_key], args=[current_user.id, radius], client=pipe
+            )
+            if top:
+                pipe.zrevrange(redis_key, 0, top - 1, withscores=True)
+            replies = await pipe.execute()
+        window = replies[0]
+        if not window:
+            return {"message": "User not ranked yet."}
+        rank, flat_entries = window
+        # Lua hands WITHSCORES back as a flat member, score, ... list
+        around = list(zip(flat_entries[::2], flat_entries[1::2]))
+        top_entries = replies[1] if top else []
+
+        users = await get_user_summaries(
+            [int(user_id) for user_id, _ in around + top_entries], db
+        )
+        first_rank = max(rank - radius, 0) + 1
+        response = {
+            "game_id": game_id,
+            "rank": rank + 1,
+            "around": ranked_entries(game_id, around, first_rank, users),
+        }
+        if top:
+            response["top"] = ranked_entries(game_id, top_entries, 1, users)
+        if period != "all":
+            response["period"] = period
+        return response
+    except Exception as e:
+        print("Error fetching neighbourhood from Redis:", e)
+        return {"error": "Failed to fetch leaderboard."}
+
+
+async def fetch_user_rank(
+    game_id: str, current_user: AuthenticatedUser, db: AsyncSession
+) -> dict:
+    """
+    Exact rank from Redis; on a trimmed board, players below the kept top K
+    are counted in leaderboard_best instead and marked approximate.
+    """
     user_id = current_user.id
     redis_key = f"leaderboard:{game_id}"
     try:
-        rank = redis_client.zrevrank(redis_key, user_id)
+        async_redis_client = await get_async_redis()
+        async with async_redis_client.pipeline(transaction=False) as pipe:
+            pipe.zrevrank(redis_key, user_id)
+            pipe.zscore(redis_key, user_id)
+            rank, score = await pipe.execute()
+        if is_trimmed_rank(game_id, rank):
+            user = await get_user_summary(user_id, db)
+            cold = user and (await fetch_cold_ranks(game_id, [user.user_code], db)).get(
+                user.user_code
+            )
+            if cold:
+                best, rank = cold
+                return {
+                    "user_id": user_id,
+                    "rank": rank + 1,
+                    "score": best,
+                    "approximate": True,
+                }
+            return {"message": "User not ranked yet."}
         if rank is None:
             return {"message": "User not ranked yet."}
         else:
-            score = redis_client.zscore(redis_key, user_id)
             return {
                 "user_id": user_id,
                 "rank": rank + 1,
-                "score": score,
+                "score": decode_score(game_id, score),
             }  # rank is 0-based
     except Exception as e:
         print("Error fetching user rank from Redis:", e)
         return {"error": "Failed to fetch user rank."}
 
 
-async def get_player_ranks_from_redis(player_id: int) -> dict[str, int]:
+def player_bests_query(game_id: str, user_codes):
+    # primary key lookups on leaderboard_best
+    return select(
+        LeaderboardBest.user_code,
+        LeaderboardBest.best_score,
+        LeaderboardBest.achieved_at,
+    ).where(
+        LeaderboardBest.game_id == game_id,
+        LeaderboardBest.user_code.in_(user_codes),
+    )
+
+
+def players_ahead_count():
+    # per row, one range count on ix_leaderboard_best_game_id_best_score
+    ahead = aliased(LeaderboardBest)
+    return (
+        select(func.count())
+        .where(
+            ahead.game_id == LeaderboardBest.game_id,
+            ahead.best_score > LeaderboardBest.best_score,
+        )
+        .scalar_subquery()
+    )
+
+
+def cold_ranks_query(game_id: str, user_codes: list[str]):
+    return select(
+        LeaderboardBest.user_code, LeaderboardBest.best_score, players_ahead_count()
+    ).where(
+        LeaderboardBest.game_id == game_id, LeaderboardBest.user_code.in_(user_codes)
+    )
+
+
+def player_cold_ranks_query(game_ids: list[str], user_code: str):
+    # the same count for one player across several games
+    return select(
+        LeaderboardBest.game_id, LeaderboardBest.best_score, players_ahead_count()
+    ).where(
+        LeaderboardBest.game_id.in_(game_ids), LeaderboardBest.user_code == user_code
+    )
+
+
+async def fetch_cold_ranks(
+    game_id: str, user_codes: list[str], db: AsyncSession
+) -> dict[str, tuple[int, int]]:
     """
-    Discover games from Redis and return player's rank in each one.
+    (best score, 0-based rank) by user_code from leaderboard_best. Ties share
+    a rank and write-behind rows not yet flushed are missed: approximate.
+    """
+    rows = await db.execute(cold_ranks_query(game_id, user_codes))
+    return {user_code: (best, ahead) for user_code, best, ahead in rows}
+
+
+async def fetch_player_cold_ranks(
+    game_ids: list[str], user_code: str, db: AsyncSession
+) -> dict[str, tuple[int, int]]:
+    """fetch_cold_ranks for one player, by game_id, in one query."""
+    rows = await db.execute(player_cold_ranks_query(game_ids, user_code))
+    return {game_id: (best, ahead) for game_id, best, ahead in rows}
+
+
+async def resync_player_best(game_id: str, user_id: int, user_code: str, db):
+    """Copy one player's SQL best for a game into Redis, never lowering it."""
+    await resync_player_bests(game_id, {user_code: user_id}, db)
+
+
+async def resync_player_bests(game_id: str, players: dict[str, int], db):
+    """
+    Copy the SQL bests of players (user_code -> user_id) for a game into
+    Redis, never lowering them: one query and one pipeline.
+    """
+    try:
+        rows = await db.execute(player_bests_query(game_id, players))
+        rows = rows.all()
+        if not rows:
+            return
+        async_redis_client = await get_async_redis()
+        key = leaderboard_key(game_id)
+        async with async_redis_client.pipeline(transaction=False) as pipe:
+            for user_code, best_score, achieved_at in rows:
+                user_id = players[user_code]
+                best = encode_score(game_id, best_score, achieved_at)
+                pipe.zadd(key, {user_id: best}, gt=True)
+                pipe.sadd(player_games_key(user_id), game_id)
+            trim_board(pipe, key, game_id)
+            bump_leaderboard_version(pipe, game_id)
+            await pipe.execute()
+    except Exception as e:
+        print("Error resyncing player best from SQL:", e)
+
+
+def leaderboard_version_key(game_id: str) -> str:
+    # bumped whenever the top of any of the game's boards may have changed
+    return f"leaderboard_version:{game_id}"
+
+
+def leaderboard_channel(game_id: str) -> str:
+    # same name SUBMIT_BEST_SCORE_LUA publishes to
+    return f"leaderboard_updates:{game_id}"
+
+
+def bump_leaderboard_version(pipe, game_id: str):
+    """Queue the same invalidation submit_best_score does on a pipeline."""
+    pipe.incr(leaderboard_version_key(game_id))
+    pipe.publish(leaderboard_channel(game_id), "")
+
+
+def player_games_key(player_id: int) -> str:
+    # set of game ids the player has submitted to, kept up to date by submit_score
+    return f"player_games:{player_id}"
+
+
+async def get_player_ranks_from_redis(
+    player_id: int, user_code: str, db: AsyncSession
+) -> dict[str, int]:
+    """
+    Return player's rank in each game listed in their game index. Players cut
+    off a trimmed board, and games whose board is evicted or not rebuilt yet,
+    are ranked from leaderboard_best instead, marked approximate.
     """
     async_redis_client = await get_async_redis()
 
     result: dict[str, int] = {}
-    cursor = 0
+    game_ids = sorted(await async_redis_client.smembers(player_games_key(player_id)))
+    if not game_ids:
+        return result
 
-    while True:
-        cursor, keys = await async_redis_client.scan(
-            cursor=cursor, match="leaderboard:*", count=100
-        )
+    # queue every rank and score lookup and send them in a single round trip
+    async with async_redis_client.pipeline(transaction=False) as pipe:
+        for game_id in game_ids:
+            key = f"leaderboard:{game_id}"
+            pipe.zrevrank(key, str(player_id))
+            pipe.zscore(key, str(player_id))
+            pipe.exists(key)
+            pipe.exists(evicted_key(game_id))
+        replies = await pipe.execute()
 
-        for key in keys:
-            rank = await async_redis_client.zrevrank(key, str(player_id))
-
-            if rank is not None:
-                game_id = key[len("leaderboard:") :]
-                current_score = redis_client.zscore(key, str(player_id)) or 0
-                result[game_id] = {"score": current_score, "rank": rank + 1}
+    cold_games = []
+    for game_id, rank, current_score, board, evicted in zip(
+        game_ids, replies[::4], replies[1::4], replies[2::4], replies[3::4]
+    ):
+        # profile views don't rebuild boards; the next read or write of the
+        # game does (controllers.leaderboard_sync.ensure_leaderboard)
+        if not board or evicted or is_trimmed_rank(game_id, rank):
+            cold_games.append(game_id)
+        elif rank is not None:
+            result[game_id] = {
+                "score": decode_score(game_id, current_score) or 0,
+                "rank": rank + 1,
+            }
 
-        if cursor == 0:
-            break
+    if cold_games:
+        try:
+            cold = await fetch_player_cold_ranks(cold_games, user_code, db)
+        except Exception as e:
+            print("Error counting ranks in SQL:", e)
+            cold = {}
+        for game_id in cold_games:
+            if game_id in cold:
+                best, rank = cold[game_id]
+                result[game_id] = {"score": best, "rank": rank + 1, "approximate": True}
 
-    return result
+    # by game id, cold games included
+    return {game_id: result[game_id] for game_id in game_ids if game_id in result}
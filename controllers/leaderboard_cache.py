@@ -0,0 +1,161 @@
+import asyncio
+import json
+import os
+import time
+import uuid
+
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from config.cache import LRUCache, SingleFlight
+from config.db import AsyncSessionLocal
+from config.metrics import register_collector
+from config.redis import get_async_redis, register_script
+from controllers.leaderboard import (
+    LEADERBOARD_CACHE_TOP_N,
+    fetch_leaderboard,
+    leaderboard_version_key,
+)
+from controllers.periods import Period
+
+# First pages of get-leaderboard, already JSON-encoded, per (game, period,
+# limit). Each entry remembers the game's version counter it was built from;
+# submit_best_score bumps the counter only when a score lands in the top
+# LEADERBOARD_CACHE_TOP_N, so a hit costs one GET and no encoding at all.
+LEADERBOARD_CACHE_SIZE = int(os.getenv("LEADERBOARD_CACHE_SIZE", "10000"))
+# backstop for changes that don't touch scores (renamed or deactivated users)
+LEADERBOARD_CACHE_TTL = int(os.getenv("LEADERBOARD_CACHE_TTL", "30"))
+# After a version bump every poller misses at once. Misses for the same page
+# share one rebuild per worker; with the fleet lock on, one worker rebuilds
+# and the others pick its bytes up from Redis.
+LEADERBOARD_FLEET_LOCK = os.getenv("LEADERBOARD_FLEET_LOCK", "false").lower() == "true"
+LEADERBOARD_LOCK_TTL_MS = int(os.getenv("LEADERBOARD_LOCK_TTL_MS", "2000"))
+# how long a worker waits for the lock holder before rebuilding itself
+LEADERBOARD_LOCK_WAIT = float(os.getenv("LEADERBOARD_LOCK_WAIT", "1"))
+LEADERBOARD_LOCK_POLL = 0.02
+
+leaderboard_responses = LRUCache(maxsize=LEADERBOARD_CACHE_SIZE)
+leaderboard_rebuilds = SingleFlight()
+register_collector("leaderboard_cache", leaderboard_responses.stats)
+register_collector("leaderboard_rebuilds", leaderboard_rebuilds.stats)
+
+# only the holder's token releases the lock, never one that expired and was
+# taken by another worker
+RELEASE_LOCK_LUA = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+release_lock = register_script(RELEASE_LOCK_LUA)
+
+# pushes a held lock's expiry out, again only for the holder's token
+EXTEND_LOCK_LUA = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+extend_lock = register_script(EXTEND_LOCK_LUA)
+
+
+def is_cacheable(limit: int, offset: int = 0, cursor: str | None = None) -> bool:
+    return offset == 0 and cursor is None and limit <= LEADERBOARD_CACHE_TOP_N
+
+
+def shared_response_key(game_id: str, period: Period, limit: int, version) -> str:
+    return f"leaderboard_response:{game_id}:{period}:{limit}:{version or 0}"
+
+
+def encode_response(response: dict) -> bytes:
+    # same bytes FastAPI's JSONResponse would produce for the dict
+    return json.dumps(
+        response, ensure_ascii=False, allow_nan=False, separators=(",", ":")
+    ).encode("utf-8")
+
+
+async def render_leaderboard(
+    game_id: str, limit: int, period: Period, session_factory: async_sessionmaker
+) -> bytes | dict:
+    # own session: the request that started a shared rebuild may finish first
+    async with session_factory() as db:
+        response = await fetch_leaderboard(game_id, limit, db, period=period)
+    if "error" in response:
+        return response
+    return encode_response(response)
+
+
+async def render_with_fleet_lock(
+    game_id: str,
+    limit: int,
+    period: Period,
+    version,
+    session_factory: async_sessionmaker,
+) -> bytes | dict:
+    async_redis_client = await get_async_redis()
+    key = shared_response_key(game_id, period, limit, version)
+    lock_key = f"{key}:lock"
+    token = uuid.uuid4().hex
+    deadline = time.monotonic() + LEADERBOARD_LOCK_WAIT
+    while time.monotonic() < deadline:
+        shared = await async_redis_client.get(key)
+        if shared is not None:
+            return shared.encode("utf-8")
+        if await async_redis_client.set(
+            lock_key, token, nx=True, px=LEADERBOARD_LOCK_TTL_MS
+        ):
+            try:
+                body = await render_leaderboard(game_id, limit, period, session_factory)
+                if isinstance(body, bytes):
+                    await async_redis_client.set(key, body, ex=LEADERBOARD_CACHE_TTL)
+                return body
+            finally:
+                await release_lock(
+                    keys=[lock_key], args=[token], client=async_redis_client
+                )
+        await asyncio.sleep(LEADERBOARD_LOCK_POLL)
+    # the holder is too slow or gone; don't keep the request waiting
+    return await render_leaderboard(game_id, limit, period, session_factory)
+
+
+async def fetch_cached_leaderboard(
+    game_id: str,
+    limit: int,
+    period: Period = "all",
+    session_factory: async_sessionmaker = AsyncSessionLocal,
+) -> bytes | dict:
+    """
+    Encoded top-limit response for a game. Error dicts are returned as they
+    are and never cached.
+    """
+    try:
+        async_redis_client = await get_async_redis()
+        version = await async_redis_client.get(leaderboard_version_key(game_id))
+    except Exception as e:
+        print("Error reading leaderboard version from Redis:", e)
+        return {"error": "Failed to fetch leaderboard."}
+
+    cache_key = (game_id, period, limit)
+    cached = leaderboard_responses.get(cache_key)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+
+    async def rebuild():
+        if LEADERBOARD_FLEET_LOCK:
+            return await render_with_fleet_lock(
+                game_id, limit, period, version, session_factory
+            )
+        return await render_leaderboard(game_id, limit, period, session_factory)
+
+    try:
+        body = await leaderboard_rebuilds.run((*cache_key, version), rebuild)
+    except Exception as e:
+        print("Error rebuilding cached leaderboard:", e)
+        return {"error": "Failed to fetch leaderboard."}
+    if isinstance(body, dict):
+        return body
+    # the version is read before the page, so a submission racing this read
+    # leaves a stale entry under an already outdated version
+    leaderboard_responses.set(
+        cache_key, (version, body), expires_at=time.time() + LEADERBOARD_CACHE_TTL
+    )
+    return body
@@ -0,0 +1,234 @@
+import asyncio
+import json
+import os
+
+from config.metrics import register_collector
+from config.redis import get_async_redis
+from controllers.leaderboard import leaderboard_channel
+from controllers.leaderboard_cache import fetch_cached_leaderboard
+from controllers.periods import Period
+
+# Live leaderboards over Server-Sent Events. Each worker runs one GameFeed per
+# game that has subscribers and one listener with a single PSUBSCRIBE on
+# leaderboard_updates:* (submit_best_score publishes there when a game's top N
+# changes) that wakes the matching feed. At most once per tick a feed re-reads
+# each page its subscribers watch and sends them what changed.
+LEADERBOARD_PUSH_TICK = float(os.getenv("LEADERBOARD_PUSH_TICK", "1"))
+# comment lines keep proxies from closing quiet streams
+LEADERBOARD_PUSH_KEEPALIVE = float(os.getenv("LEADERBOARD_PUSH_KEEPALIVE", "15"))
+# a subscriber this many events behind gets one snapshot instead
+LEADERBOARD_PUSH_QUEUE_SIZE = 16
+
+push_stats = {"feeds": 0, "subscribers": 0, "pushes": 0, "snapshots_resent": 0}
+register_collector("leaderboard_push", lambda: dict(push_stats))
+
+
+def sse_event(kind: str, payload: dict) -> bytes:
+    return f"event: {kind}\ndata: {json.dumps(payload)}\n\n".encode("utf-8")
+
+
+def diff_rows(previous: list[dict], current: list[dict]) -> dict:
+    """Rows that are new or different by rank, and ranks that are now empty."""
+    before = {row["rank"]: row for row in previous}
+    after = {row["rank"]: row for row in current}
+    return {
+        "changed": [row for rank, row in after.items() if before.get(rank) != row],
+        "removed": [rank for rank in before if rank not in after],
+    }
+
+
+class GameFeed:
+    """One push loop shared by a game's viewers."""
+
+    def __init__(self, game_id: str):
+        self.game_id = game_id
+        # (period, limit) -> last page sent, and the queues watching it
+        self.pages: dict[tuple[Period, int], dict] = {}
+        self.subscribers: dict[tuple[Period, int], set[asyncio.Queue]] = {}
+        self.dirty = False
+        self.wakeup = asyncio.Event()
+        self.next_push = 0.0
+        self.task: asyncio.Task | None = None
+
+    def notify(self):
+        # the game's top N may have changed
+        self.dirty = True
+        self.wakeup.set()
+
+    async def fetch_page(self, period: Period, limit: int) -> dict | None:
+        # shares the response cache and its single-flight with polling clients
+        body = await fetch_cached_leaderboard(self.game_id, limit, period)
+        if isinstance(body, dict):
+            return None
+        return json.loads(body)
+
+    async def subscribe(self, period: Period, limit: int) -> asyncio.Queue | None:
+        view = (period, limit)
+        page = self.pages.get(view)
+        if page is None:
+            page = await self.fetch_page(period, limit)
+            if page is None:
+                return None
+            self.pages.setdefault(view, page)
+        queue = asyncio.Queue(maxsize=LEADERBOARD_PUSH_QUEUE_SIZE)
+        queue.put_nowait(sse_event("snapshot", self.pages[view]))
+        self.subscribers.setdefault(view, set()).add(queue)
+        push_stats["subscribers"] += 1
+        if self.task is None:
+            self.task = asyncio.create_task(self.run())
+        return queue
+
+    def unsubscribe(self, period: Period, limit: int, queue: asyncio.Queue):
+        view = (period, limit)
+        queues = self.subscribers.get(view, set())
+        if queue in queues:
+            queues.discard(queue)
+            push_stats["subscribers"] -= 1
+        if not queues:
+            self.subscribers.pop(view, None)
+            self.pages.pop(view, None)
+        if not self.subscribers:
+            close_feed(self)
+
+    def send(self, view: tuple[Period, int], event: bytes):
+        for queue in self.subscribers.get(view, ()):
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                # too slow for diffs: start it over from the current page
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(sse_event("snapshot", self.pages[view]))
+                push_stats["snapshots_resent"] += 1
+
+    async def push_changes(self):
+        for view in list(self.subscribers):
+            page = await self.fetch_page(*view)
+            if page is None:
+                self.dirty = True  # try again next tick
+                continue
+            previous = self.pages.get(view)
+            if previous is None or view not in self.subscribers:
+                continue
+            diff = diff_rows(previous["leaderboard"], page["leaderboard"])
+            self.pages[view] = page
+            if diff["changed"] or diff["removed"]:
+                self.send(view, sse_event("diff", {"game_id": self.game_id, **diff}))
+                push_stats["pushes"] += 1
+
+    async def run(self):
+        """Background task: coalesce update messages into one push per tick."""
+        loop = asyncio.get_running_loop()
+        # also stops on its own once the last viewer leaves, in case a
+        # cancel lands while a read is completing and gets swallowed
+        while self.subscribers:
+            now = loop.time()
+            if self.dirty and now >= self.next_push:
+                self.dirty = False
+                self.next_push = now + LEADERBOARD_PUSH_TICK
+                try:
+                    await self.push_changes()
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    print("Leaderboard feed failed, retrying:", e)
+                    self.dirty = True
+                continue
+            self.wakeup.clear()
+            timeout = self.next_push - now if self.dirty else LEADERBOARD_PUSH_TICK
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+
+async def listen_for_updates():
+    """
+    Background task: one pub/sub connection per worker, however many games
+    are watched, dispatching each update to the game's feed.
+    """
+    prefix = leaderboard_channel("")
+    while feeds:
+        try:
+            async_redis_client = await get_async_redis()
+            async with async_redis_client.pubsub() as pubsub:
+                await pubsub.psubscribe(leaderboard_channel("*"))
+                # anything published while we were disconnected is lost
+                for feed in list(feeds.values()):
+                    feed.notify()
+                while feeds:
+                    message = await pubsub.get_message(
+                        ignore_subscribe_messages=True, timeout=LEADERBOARD_PUSH_TICK
+                    )
+                    if message is None:
+                        continue
+                    feed = feeds.get(message["channel"].removeprefix(prefix))
+                    if feed is not None:
+                        feed.notify()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print("Leaderboard update listener failed, retrying:", e)
+            await asyncio.sleep(1)
+
+
+feeds: dict[str, GameFeed] = {}
+listener: asyncio.Task | None = None
+
+
+def get_feed(game_id: str) -> GameFeed:
+    global listener
+    feed = feeds.get(game_id)
+    if feed is None:
+        feed = feeds[game_id] = GameFeed(game_id)
+        push_stats["feeds"] += 1
+    if listener is None or listener.done():
+        listener = asyncio.create_task(listen_for_updates())
+    return feed
+
+
+def close_feed(feed: GameFeed):
+    global listener
+    if feeds.get(feed.game_id) is feed:
+        del feeds[feed.game_id]
+        push_stats["feeds"] -= 1
+    if feed.task is not None:
+        feed.task.cancel()
+        feed.task = None
+    if not feeds and listener is not None:
+        listener.cancel()
+        listener = None
+
+
+async def close_leaderboard_feeds():
+    global listener
+    tasks = [feed.task for feed in feeds.values() if feed.task is not None]
+    if listener is not None:
+        tasks.append(listener)
+        listener.cancel()
+        listener = None
+    for feed in list(feeds.values()):
+        close_feed(feed)
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def stream_leaderboard_updates(game_id: str, limit: int, period: Period = "all"):
+    """
+    SSE body: a snapshot event with the current page, then a diff event
+    (changed rows and emptied ranks) whenever that page changes.
+    """
+    feed = get_feed(game_id)
+    queue = await feed.subscribe(period, limit)
+    if queue is None:
+        if not feed.subscribers:
+            close_feed(feed)
+        yield sse_event("error", {"error": "Failed to fetch leaderboard."})
+        return
+    try:
+        while True:
+            try:
+                yield await asyncio.wait_for(queue.get(), LEADERBOARD_PUSH_KEEPALIVE)
+            except asyncio.TimeoutError:
+                yield b": keep-alive\n\n"
+    finally:
+        feed.unsubscribe(period, limit, queue)
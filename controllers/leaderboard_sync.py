@@ -0,0 +1,424 @@
+import asyncio
+import os
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from config.cache import LRUCache, SingleFlight
+from config.db import AsyncSessionLocal
+from config.metrics import register_collector
+from config.redis import get_async_redis
+from controllers.leaderboard import bump_leaderboard_version, player_games_key
+from controllers.leaderboard_cache import extend_lock, release_lock
+from controllers.periods import leaderboard_key
+from controllers.score_history import (
+    SCORE_HISTORY_STREAM,
+    SCORE_WRITE_BEHIND,
+    entry_created_at,
+)
+from controllers.retention import (
+    evicted_key,
+    forget_activity,
+    keep_top,
+    note_activity,
+    retention_stats,
+    trim_board,
+)
+from controllers.tie_break import (
+    decode_score,
+    encode_score,
+    encoding_key,
+    score_encoding,
+)
+from models.tables import LeaderboardBest, User
+
+# Rebuilds and drift checks walk leaderboard_best and the sorted set in
+# chunks of this many players, so memory stays flat however big the game is.
+REBUILD_CHUNK_SIZE = int(os.getenv("LEADERBOARD_REBUILD_CHUNK_SIZE", "5000"))
+# a staging key left behind by a crashed rebuild expires on its own
+REBUILD_STAGING_TTL = int(os.getenv("LEADERBOARD_REBUILD_STAGING_TTL", "3600"))
+REBUILD_CLOCK_MARGIN = 5
+# A board missing from Redis (flushed, or evicted for being idle), or written
+# with another score encoding (controllers.tie_break), is rebuilt from SQL by
+# the first read or write that finds it: one rebuild per worker (single-flight)
+# and one across the fleet (lock). Each worker then trusts the board is there
+# for LEADERBOARD_PRESENCE_TTL seconds.
+LEADERBOARD_PRESENCE_TTL = float(os.getenv("LEADERBOARD_PRESENCE_TTL", "5"))
+LEADERBOARD_REHYDRATE_LOCK_TTL_MS = int(
+    os.getenv("LEADERBOARD_REHYDRATE_LOCK_TTL_MS", "60000")
+)
+# how long a request waits for another worker's rebuild before going ahead
+LEADERBOARD_REHYDRATE_WAIT = float(os.getenv("LEADERBOARD_REHYDRATE_WAIT", "5"))
+LEADERBOARD_REHYDRATE_POLL = 0.05
+# game ids with no rows in leaderboard_best are not looked up again by reads
+# for this long, so requests for made-up games cost no Redis or SQL work; a
+# write makes the game known on its worker straight away
+LEADERBOARD_UNKNOWN_GAME_TTL = float(os.getenv("LEADERBOARD_UNKNOWN_GAME_TTL", "60"))
+
+present_games = LRUCache(maxsize=10000)
+unknown_games = LRUCache(maxsize=10000)
+leaderboard_rehydrations = SingleFlight()
+register_collector("leaderboard_rehydrations", leaderboard_rehydrations.stats)
+
+
+def best_scores_query(game_id: str):
+    # one row per player from leaderboard_best, no aggregate over the history
+    return (
+        select(User.id, LeaderboardBest.best_score, LeaderboardBest.achieved_at)
+        .join(User, User.user_code == LeaderboardBest.user_code)
+        .where(LeaderboardBest.game_id == game_id)
+    )
+
+
+async def stream_best_scores(game_id: str, db: AsyncSession, since=None):
+    """
+    Yield lists of (user_id, sorted-set score) read through a server-side
+    cursor. With since, only players whose best was reached at or after then.
+    """
+    query = best_scores_query(game_id)
+    if since is not None:
+        query = query.where(LeaderboardBest.achieved_at >= since)
+    result = await db.stream(query.execution_options(yield_per=REBUILD_CHUNK_SIZE))
+    async for partition in result.partitions():
+        yield [
+            (user_id, encode_score(game_id, best, achieved_at))
+            for user_id, best, achieved_at in partition
+        ]
+
+
+async def apply_best_scores(async_redis_client, key: str, game_id: str, chunk):
+    async with async_redis_client.pipeline(transaction=False) as pipe:
+        # GT: only raise, a newer higher score may already be in Redis
+        pipe.zadd(key, dict(chunk), gt=True)
+        trim_board(pipe, key, game_id)
+        for user_id, _ in chunk:
+            pipe.sadd(player_games_key(user_id), game_id)
+        await pipe.execute()
+
+
+async def replay_queued_history(async_redis_client, game_id: str, db: AsyncSession):
+    """Write-behind entries still in the stream aren't in SQL yet; re-apply them."""
+    replayed = 0
+    start = "-"
+    while True:
+        messages = await async_redis_client.xrange(
+            SCORE_HISTORY_STREAM, min=start, count=REBUILD_CHUNK_SIZE
+        )
+        if not messages:
+            return replayed
+        start = "(" + messages[-1][0]
+        entries = [(i, f) for i, f in messages if f["game_id"] == game_id]
+        if not entries:
+            continue
+        user_ids = dict(
+            (
+                await db.execute(
+                    select(User.user_code, User.id).where(
+                        User.user_code.in_({f["user_code"] for _, f in entries})
+                    )
+                )
+            ).all()
+        )
+        best: dict[int, int] = {}
+        for message_id, fields in entries:
+            user_id = user_ids.get(fields["user_code"])
+            if user_id is not None:
+                score = encode_score(
+                    game_id, int(fields["score"]), entry_created_at(message_id)
+                )
+                best[user_id] = (
+                    score if user_id not in best else max(best[user_id], score)
+                )
+        if best:
+            await apply_best_scores(
+                async_redis_client, f"leaderboard:{game_id}", game_id, best.items()
+            )
+            replayed += len(best)
+
+
+async def rebuild_leaderboard(
+    game_id: str, db: AsyncSession, renew_lock: Callable[[], Awaitable] | None = None
+) -> dict:
+    """
+    Rebuild leaderboard:{game_id} from SQL: load a staging sorted set chunk by
+    chunk, swap it in with RENAME, then re-apply whatever was submitted while
+    the rebuild was running (those scores went to the key that got replaced).
+    renew_lock, if given, is awaited after every chunk so a lock guarding the
+    rebuild lasts as long as the rebuild does.
+    """
+    async_redis_client = await get_async_redis()
+    key = f"leaderboard:{game_id}"
+    staging_key = f"{key}:rebuild:{uuid.uuid4().hex}"
+    # achieved_at is stamped in UTC by whichever worker took the score; the
+    # margin covers clock drift between workers (re-applying is harmless)
+    started_at = datetime.now(timezone.utc) - timedelta(seconds=REBUILD_CLOCK_MARGIN)
+
+    loaded = 0
+    async for chunk in stream_best_scores(game_id, db):
+        await apply_best_scores(async_redis_client, staging_key, game_id, chunk)
+        await async_redis_client.expire(staging_key, REBUILD_STAGING_TTL)
+        loaded += len(chunk)
+        if renew_lock:
+            await renew_lock()
+
+    async with async_redis_client.pipeline(transaction=True) as pipe:
+        if loaded:
+            pipe.rename(staging_key, key)
+            # RENAME keeps the staging TTL
+            pipe.persist(key)
+            pipe.set(encoding_key(game_id), score_encoding(game_id))
+        else:
+            pipe.delete(key)
+        await pipe.execute()
+
+    caught_up = 0
+    async for chunk in stream_best_scores(game_id, db, since=started_at):
+        await apply_best_scores(async_redis_client, key, game_id, chunk)
+        caught_up += len(chunk)
+        if renew_lock:
+            await renew_lock()
+    if SCORE_WRITE_BEHIND:
+        caught_up += await replay_queued_history(async_redis_client, game_id, db)
+    # after the catch-up, so no cached response outlives a half-applied board
+    async with async_redis_client.pipeline(transaction=False) as pipe:
+        bump_leaderboard_version(pipe, game_id)
+        await pipe.execute()
+
+    return {"game_id": game_id, "loaded": loaded, "caught_up": caught_up}
+
+
+async def backfill_player_games(db: AsyncSession) -> int:
+    """
+    Rebuild every player_games:{id} index from leaderboard_best. Profiles read
+    only the index, so games played before it existed need this once; SADD
+    makes re-running it harmless.
+    """
+    async_redis_client = await get_async_redis()
+    query = select(User.id, LeaderboardBest.game_id).join(
+        User, User.user_code == LeaderboardBest.user_code
+    )
+    result = await db.stream(query.execution_options(yield_per=REBUILD_CHUNK_SIZE))
+    indexed = 0
+    async for partition in result.partitions():
+        async with async_redis_client.pipeline(transaction=False) as pipe:
+            for user_id, game_id in partition:
+                pipe.sadd(player_games_key(user_id), game_id)
+            await pipe.execute()
+        indexed += len(partition)
+    return indexed
+
+
+async def find_players_without_scores(
+    game_id: str, user_ids: list[int], db: AsyncSession
+) -> list[int]:
+    with_scores = set(
+        await db.scalars(
+            select(User.id)
+            .join(LeaderboardBest, LeaderboardBest.user_code == User.user_code)
+            .where(LeaderboardBest.game_id == game_id, User.id.in_(user_ids))
+        )
+    )
+    return [user_id for user_id in user_ids if user_id not in with_scores]
+
+
+async def trim_floor(async_redis_client, key: str, game_id: str) -> float | None:
+    """Lowest score still kept on a full board of a game with a top K."""
+    keep = keep_top(game_id)
+    if not keep:
+        return None
+    async with async_redis_client.pipeline(transaction=False) as pipe:
+        pipe.zcard(key)
+        pipe.zrange(key, 0, 0, withscores=True)
+        size, lowest = await pipe.execute()
+    return lowest[0][1] if size >= keep else None
+
+
+async def reconcile_leaderboard(
+    game_id: str, db: AsyncSession, repair: bool = False
+) -> dict:
+    """
+    Compare leaderboard:{game_id} with SQL without rebuilding it.
+    missing/behind: SQL best is not in Redis or is higher (repair raises them).
+    ahead: Redis is higher than SQL, normally write-behind rows not yet
+    written; left alone, a full rebuild resets them.
+    extra: in Redis with no rows in SQL (repair removes them, except in
+    write-behind mode where they are usually still queued).
+    trimmed: not in Redis because they are below a kept top K; not drift.
+    """
+    async_redis_client = await get_async_redis()
+    key = f"leaderboard:{game_id}"
+    report = {
+        "game_id": game_id,
+        "checked": 0,
+        "missing": 0,
+        "behind": 0,
+        "ahead": 0,
+        "extra": 0,
+        "trimmed": 0,
+        "repaired": repair,
+    }
+    changed = False
+    floor = await trim_floor(async_redis_client, key, game_id)
+
+    async for chunk in stream_best_scores(game_id, db):
+        redis_scores = await async_redis_client.zmscore(
+            key, [user_id for user_id, _ in chunk]
+        )
+        stale = []
+        for (user_id, best), current in zip(chunk, redis_scores):
+            # compare submitted scores: a tie-break time off by a second
+            # between SQL and Redis is not drift
+            sql_score = decode_score(game_id, best)
+            redis_score = decode_score(game_id, current)
+            if current is None and floor is not None and best < floor:
+                report["trimmed"] += 1
+            elif current is None:
+                report["missing"] += 1
+                stale.append((user_id, best))
+            elif sql_score > redis_score:
+                report["behind"] += 1
+                stale.append((user_id, best))
+            elif sql_score < redis_score:
+                report["ahead"] += 1
+        report["checked"] += len(chunk)
+        if repair and stale:
+            await apply_best_scores(async_redis_client, key, game_id, stale)
+            changed = True
+
+    cursor = 0
+    while True:
+        cursor, members = await async_redis_client.zscan(
+            key, cursor, count=REBUILD_CHUNK_SIZE
+        )
+        if members:
+            extra = await find_players_without_scores(
+                game_id, [int(user_id) for user_id, _ in members], db
+            )
+            report["extra"] += len(extra)
+            if repair and extra and not SCORE_WRITE_BEHIND:
+                await async_redis_client.zrem(key, *extra)
+                changed = True
+        if cursor == 0:
+            break
+
+    if changed:
+        async with async_redis_client.pipeline(transaction=False) as pipe:
+            bump_leaderboard_version(pipe, game_id)
+            await pipe.execute()
+    return report
+
+
+async def board_missing(async_redis_client, game_id: str, touch=False) -> bool:
+    """Missing, evicted, or written with another score encoding."""
+    async with async_redis_client.pipeline(transaction=False) as pipe:
+        pipe.exists(leaderboard_key(game_id))
+        pipe.exists(evicted_key(game_id))
+        pipe.get(encoding_key(game_id))
+        if touch:
+            note_activity(pipe, game_id)
+        boards, evicted, encoding, *_ = await pipe.execute()
+    if not boards or evicted:
+        return True
+    return (encoding or "plain") != score_encoding(game_id)
+
+
+async def rehydrate_leaderboard(
+    game_id: str, session_factory: async_sessionmaker = AsyncSessionLocal
+) -> bool:
+    """
+    Rebuild a missing or stale board under the fleet lock. Returns False if
+    another worker is still at it after LEADERBOARD_REHYDRATE_WAIT.
+    """
+    async_redis_client = await get_async_redis()
+    lock_key = f"leaderboard_rehydrate:{game_id}"
+    token = uuid.uuid4().hex
+    deadline = time.monotonic() + LEADERBOARD_REHYDRATE_WAIT
+    while not await async_redis_client.set(
+        lock_key, token, nx=True, px=LEADERBOARD_REHYDRATE_LOCK_TTL_MS
+    ):
+        if time.monotonic() >= deadline:
+            return False
+        await asyncio.sleep(LEADERBOARD_REHYDRATE_POLL)
+
+    async def renew_lock():
+        # a big game outlasts the lock TTL; without this a second worker
+        # would start another full rebuild halfway through
+        renewed = await extend_lock(
+            keys=[lock_key],
+            args=[token, LEADERBOARD_REHYDRATE_LOCK_TTL_MS],
+            client=async_redis_client,
+        )
+        if not renewed:
+            raise RuntimeError(f"Lost the rehydrate lock for {game_id}")
+
+    try:
+        if not await board_missing(async_redis_client, game_id):
+            # another worker rebuilt it while this one waited for the lock
+            return True
+        async with session_factory() as db:
+            # unknown game ids must not leave keys behind
+            has_scores = await db.scalar(
+                select(LeaderboardBest.game_id)
+                .where(LeaderboardBest.game_id == game_id)
+                .limit(1)
+            )
+            if has_scores is not None:
+                await rebuild_leaderboard(game_id, db, renew_lock=renew_lock)
+        await async_redis_client.delete(evicted_key(game_id))
+        if has_scores is None:
+            unknown_games.set(
+                game_id, True, expires_at=time.time() + LEADERBOARD_UNKNOWN_GAME_TTL
+            )
+        else:
+            retention_stats["rehydrated"] += 1
+        return True
+    finally:
+        await release_lock(keys=[lock_key], args=[token], client=async_redis_client)
+
+
+async def ensure_leaderboard(game_id: str, write: bool = False) -> dict | None:
+    """
+    Call before reading or writing a game's board: rebuilds it from SQL if it
+    is missing and records the game as active for idle eviction. Returns an
+    error for reads while another worker is still rebuilding the board, so
+    they don't serve it empty; writes go ahead, the rebuild's catch-up
+    re-applies them.
+    """
+    if write:
+        # the game has a score from now on
+        unknown_games.pop(game_id)
+    elif unknown_games.get(game_id):
+        return None
+    if present_games.get(game_id):
+        return None
+    try:
+        async_redis_client = await get_async_redis()
+        if await board_missing(async_redis_client, game_id, touch=True):
+            rebuilt = await leaderboard_rehydrations.run(
+                game_id, lambda: rehydrate_leaderboard(game_id)
+            )
+            if not rebuilt:
+                # checked again by the next request, not trusted for the TTL
+                if write:
+                    return None
+                return {"error": "Leaderboard is being rebuilt, try again shortly."}
+            if write:
+                # the rebuild found no rows yet, but this write is one
+                unknown_games.pop(game_id)
+            elif unknown_games.get(game_id):
+                # keep made-up ids out of the idle-eviction index
+                async with async_redis_client.pipeline(transaction=False) as pipe:
+                    forget_activity(pipe, game_id)
+                    await pipe.execute()
+                return None
+        present_games.set(
+            game_id, True, expires_at=time.time() + LEADERBOARD_PRESENCE_TTL
+        )
+    except Exception as e:
+        # the request goes on and reports its own Redis errors
+        print("Error rehydrating leaderboard from SQL:", e)
+    return None
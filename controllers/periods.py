@@ -0,0 +1,54 @@
+from datetime import datetime, timedelta, timezone
+from typing import Literal
+
+# Time-windowed boards live next to the all-time one, e.g.
+# leaderboard:{game}:d:2026-10-18. Each is a plain sorted set written by
+# submit_best_score, so reading a window costs the same as the all-time board.
+# Periods are UTC; the season is the calendar quarter.
+Period = Literal["all", "daily", "weekly", "monthly", "season"]
+WINDOWED_PERIODS: tuple[Period, ...] = ("daily", "weekly", "monthly", "season")
+
+
+def period_bounds(period: Period, now: datetime) -> tuple[str, datetime, datetime]:
+    """Label, start and end (exclusive) of the window that contains now."""
+    day = datetime(now.year, now.month, now.day, tzinfo=timezone.utc)
+    if period == "daily":
+        return f"d:{day:%Y-%m-%d}", day, day + timedelta(days=1)
+    if period == "weekly":
+        start = day - timedelta(days=day.weekday())
+        year, week, _ = start.isocalendar()
+        return f"w:{year}-W{week:02d}", start, start + timedelta(weeks=1)
+    if period == "monthly":
+        start = day.replace(day=1)
+        return f"m:{start:%Y-%m}", start, add_months(start, 1)
+    if period == "season":
+        quarter = (now.month - 1) // 3
+        start = day.replace(month=quarter * 3 + 1, day=1)
+        return f"s:{start.year}-Q{quarter + 1}", start, add_months(start, 3)
+    raise ValueError(f"Unknown period: {period}")
+
+
+def add_months(start: datetime, months: int) -> datetime:
+    month = start.month - 1 + months
+    return start.replace(year=start.year + month // 12, month=month % 12 + 1)
+
+
+def leaderboard_key(game_id: str, period: Period = "all", now: datetime = None) -> str:
+    if period == "all":
+        return f"leaderboard:{game_id}"
+    label, _, _ = period_bounds(period, now or datetime.now(timezone.utc))
+    return f"leaderboard:{game_id}:{label}"
+
+
+def period_boards(game_id: str, now: datetime = None) -> list[tuple[str, int]]:
+    """
+    (key, expire_at) for every window open right now. A board outlives its
+    window by one window length so the previous period can still be read.
+    """
+    now = now or datetime.now(timezone.utc)
+    boards = []
+    for period in WINDOWED_PERIODS:
+        label, start, end = period_bounds(period, now)
+        expire_at = end + (end - start)
+        boards.append((f"leaderboard:{game_id}:{label}", int(expire_at.timestamp())))
+    return boards
@@ -0,0 +1,144 @@
+import asyncio
+import os
+import time
+
+from config.metrics import register_collector
+from config.redis import get_async_redis
+from controllers.periods import leaderboard_key
+
+# Opt-in cap on how many players a game's all-time board keeps in Redis. A
+# game listed in LEADERBOARD_KEEP_TOP ("game_a:10000,game_b:500") is trimmed
+# back to its top K with ZREMRANGEBYRANK on every write, so its sorted set
+# stays the same size however many players it gets. Players below the cut
+# still have their best in leaderboard_best; their rank is counted there.
+LEADERBOARD_KEEP_TOP: dict[str, int] = {
+    game_id.strip(): int(count)
+    for game_id, _, count in (
+        entry.rpartition(":")
+        for entry in os.getenv("LEADERBOARD_KEEP_TOP", "").split(",")
+        if entry.strip()
+    )
+}
+
+
+def keep_top(game_id: str) -> int:
+    """How many players the game keeps in Redis; 0 keeps everyone."""
+    return max(LEADERBOARD_KEEP_TOP.get(game_id, 0), 0)
+
+
+def trim_board(pipe, key: str, game_id: str):
+    """Queue the trim submit_best_score does on a pipeline."""
+    keep = keep_top(game_id)
+    if keep:
+        pipe.zremrangebyrank(key, 0, -(keep + 1))
+
+
+# Opt-in idle eviction: with LEADERBOARD_IDLE_TTL set (seconds), games nobody
+# read or wrote for that long lose their all-time board and get an evicted
+# marker. The next read or write rebuilds them from SQL on demand
+# (controllers.leaderboard_sync.ensure_leaderboard). Period boards already
+# expire on their own and are not evicted.
+LEADERBOARD_IDLE_TTL = int(os.getenv("LEADERBOARD_IDLE_TTL", "0"))
+LEADERBOARD_EVICT_INTERVAL = int(os.getenv("LEADERBOARD_EVICT_INTERVAL", "300"))
+LEADERBOARD_EVICT_BATCH = 100
+# game id -> last touched (unix time), written at most every few seconds per
+# worker and game by ensure_leaderboard, and seeded when eviction starts
+LEADERBOARD_ACTIVITY_KEY = "leaderboard_activity"
+
+retention_stats = {"evicted": 0, "rehydrated": 0}
+register_collector("leaderboard_retention", lambda: dict(retention_stats))
+
+
+def evicted_key(game_id: str) -> str:
+    # set while a game's board is (being) dropped; cleared by the rehydration
+    return f"leaderboard_evicted:{game_id}"
+
+
+def note_activity(pipe, game_id: str):
+    if LEADERBOARD_IDLE_TTL:
+        pipe.zadd(LEADERBOARD_ACTIVITY_KEY, {game_id: time.time()})
+
+
+def forget_activity(pipe, game_id: str):
+    if LEADERBOARD_IDLE_TTL:
+        pipe.zrem(LEADERBOARD_ACTIVITY_KEY, game_id)
+
+
+async def seed_activity() -> int:
+    """
+    Date every all-time board already in Redis as touched now, so boards
+    nobody reads or writes after idle eviction is turned on still age out.
+    ZADD NX leaves games that are already tracked alone.
+    """
+    async_redis_client = await get_async_redis()
+    prefix = leaderboard_key("")
+    now = time.time()
+    seeded = 0
+    cursor = 0
+    while True:
+        cursor, keys = await async_redis_client.scan(
+            cursor, match=f"{prefix}*", count=LEADERBOARD_EVICT_BATCH, _type="zset"
+        )
+        if keys:
+            async with async_redis_client.pipeline(transaction=False) as pipe:
+                for key in keys:
+                    pipe.ttl(key)
+                ttls = await pipe.execute()
+            # period boards and rebuild staging keys expire; all-time ones don't
+            boards = {
+                key.removeprefix(prefix): now
+                for key, ttl in zip(keys, ttls)
+                if ttl == -1
+            }
+            if boards:
+                seeded += await async_redis_client.zadd(
+                    LEADERBOARD_ACTIVITY_KEY, boards, nx=True
+                )
+        if cursor == 0:
+            return seeded
+
+
+async def evict_idle_leaderboards() -> list[str]:
+    """Drop the boards of games untouched for LEADERBOARD_IDLE_TTL seconds."""
+    async_redis_client = await get_async_redis()
+    cutoff = time.time() - LEADERBOARD_IDLE_TTL
+    idle = await async_redis_client.zrangebyscore(
+        LEADERBOARD_ACTIVITY_KEY, "-inf", cutoff, start=0, num=LEADERBOARD_EVICT_BATCH
+    )
+    evicted = []
+    for game_id in idle:
+        # skip games touched since the range was read
+        last_touched = await async_redis_client.zscore(
+            LEADERBOARD_ACTIVITY_KEY, game_id
+        )
+        if last_touched is None or last_touched > cutoff:
+            continue
+        async with async_redis_client.pipeline(transaction=False) as pipe:
+            # marker first: a write landing on the emptied key still leads the
+            # next reader to a full rebuild instead of a one-player board
+            pipe.set(evicted_key(game_id), 1)
+            pipe.unlink(leaderboard_key(game_id))
+            pipe.zrem(LEADERBOARD_ACTIVITY_KEY, game_id)
+            await pipe.execute()
+        evicted.append(game_id)
+    retention_stats["evicted"] += len(evicted)
+    return evicted
+
+
+async def run_idle_eviction():
+    """
+    Background task: evict idle boards every LEADERBOARD_EVICT_INTERVAL. The
+    first run also seeds the activity index with boards already in Redis.
+    """
+    seeded = False
+    while True:
+        try:
+            if not seeded:
+                await seed_activity()
+                seeded = True
+            await evict_idle_leaderboards()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print("Idle leaderboard eviction failed, retrying:", e)
+        await asyncio.sleep(LEADERBOARD_EVICT_INTERVAL)
@@ -0,0 +1,186 @@
+import asyncio
+import os
+import socket
+import time
+import uuid
+from datetime import datetime, timezone
+
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from config.db import AsyncSessionLocal
+from config.metrics import register_collector
+from config.redis import get_async_redis
+from controllers.best_scores import upsert_best_scores
+from models.tables import LeaderboardEntry
+
+# Write-behind mode: submissions are appended to a Redis Stream in the same
+# MULTI as the ranking update and a consumer group copies them into the
+# leaderboard table in batches, so MySQL commit latency is off the submit path.
+SCORE_WRITE_BEHIND = os.getenv("SCORE_WRITE_BEHIND", "false").lower() == "true"
+SCORE_HISTORY_STREAM = "score_history:stream"
+SCORE_HISTORY_GROUP = "score_history_writers"
+SCORE_HISTORY_BATCH_SIZE = int(os.getenv("SCORE_HISTORY_BATCH_SIZE", "500"))
+# entries another consumer read but never acked are taken over after this long
+SCORE_HISTORY_CLAIM_IDLE_MS = int(os.getenv("SCORE_HISTORY_CLAIM_IDLE_MS", "30000"))
+SCORE_HISTORY_DRAIN_TIMEOUT = float(os.getenv("SCORE_HISTORY_DRAIN_TIMEOUT", "10"))
+CONSUMER_NAME = f"{socket.gethostname()}-{os.getpid()}"
+
+# written entries are XDEL'd, so the stream only ever holds the backlog
+history_stats = {
+    "backlog": 0,
+    "oldest_pending_age_seconds": 0.0,
+    "written": 0,
+    "duplicates": 0,
+    "failed_batches": 0,
+}
+register_collector("score_history", lambda: dict(history_stats))
+
+
+def new_history_entry(user_code: str, game_id: str, score: int) -> dict:
+    return {"user_code": user_code, "game_id": game_id, "score": score}
+
+
+def enqueue_history(pipe, entries: list[dict]):
+    """Queue XADDs on a pipeline that also carries the ranking update."""
+    for entry in entries:
+        # the submission id makes redelivered entries safe to insert twice;
+        # rows committed synchronously leave it NULL
+        pipe.xadd(SCORE_HISTORY_STREAM, {"submission_id": str(uuid.uuid4()), **entry})
+
+
+def entry_created_at(message_id: str) -> datetime:
+    # stream ids start with the enqueue time in ms, which is when the score came in
+    return datetime.fromtimestamp(int(message_id.split("-")[0]) / 1000, timezone.utc)
+
+
+async def ensure_consumer_group(async_redis_client):
+    try:
+        await async_redis_client.xgroup_create(
+            SCORE_HISTORY_STREAM, SCORE_HISTORY_GROUP, id="0", mkstream=True
+        )
+    except Exception as e:
+        if "BUSYGROUP" not in str(e):
+            raise
+
+
+async def write_history_batch(
+    messages: list[tuple[str, dict]],
+    session_factory: async_sessionmaker = AsyncSessionLocal,
+) -> int:
+    """
+    Insert one batch of stream entries, skipping submission ids that an earlier,
+    unacked delivery already wrote. Returns the number of new rows.
+    """
+    rows = {
+        fields["submission_id"]: {
+            "submission_id": fields["submission_id"],
+            "user_code": fields["user_code"],
+            "game_id": fields["game_id"],
+            "score": int(fields["score"]),
+            "created_at": entry_created_at(message_id),
+        }
+        for message_id, fields in messages
+    }
+    async with session_factory() as db:
+        existing = await db.scalars(
+            select(LeaderboardEntry.submission_id).where(
+                LeaderboardEntry.submission_id.in_(list(rows))
+            )
+        )
+        for submission_id in existing:
+            rows.pop(submission_id)
+        if rows:
+            await db.execute(insert(LeaderboardEntry), list(rows.values()))
+            await upsert_best_scores(db, list(rows.values()))
+            await db.commit()
+    history_stats["duplicates"] += len(messages) - len(rows)
+    return len(rows)
+
+
+async def persist_messages(async_redis_client, messages: list[tuple[str, dict]]):
+    if not messages:
+        return
+    history_stats["written"] += await write_history_batch(messages)
+    message_ids = [message_id for message_id, _ in messages]
+    async with async_redis_client.pipeline(transaction=False) as pipe:
+        pipe.xack(SCORE_HISTORY_STREAM, SCORE_HISTORY_GROUP, *message_ids)
+        pipe.xdel(SCORE_HISTORY_STREAM, *message_ids)
+        await pipe.execute()
+
+
+async def update_backlog_stats(async_redis_client):
+    info = await async_redis_client.xinfo_stream(SCORE_HISTORY_STREAM)
+    history_stats["backlog"] = info["length"]
+    first_entry = info.get("first-entry")
+    if first_entry:
+        oldest = int(first_entry[0].split("-")[0]) / 1000
+        history_stats["oldest_pending_age_seconds"] = max(0.0, time.time() - oldest)
+    else:
+        history_stats["oldest_pending_age_seconds"] = 0.0
+
+
+async def read_history(async_redis_client, block: int | None) -> list:
+    # entries abandoned by a crashed or failing consumer come first
+    _, claimed, *_ = await async_redis_client.xautoclaim(
+        SCORE_HISTORY_STREAM,
+        SCORE_HISTORY_GROUP,
+        CONSUMER_NAME,
+        min_idle_time=SCORE_HISTORY_CLAIM_IDLE_MS,
+        count=SCORE_HISTORY_BATCH_SIZE,
+    )
+    if claimed:
+        return claimed
+    response = await async_redis_client.xreadgroup(
+        SCORE_HISTORY_GROUP,
+        CONSUMER_NAME,
+        {SCORE_HISTORY_STREAM: ">"},
+        count=SCORE_HISTORY_BATCH_SIZE,
+        block=block,
+    )
+    return response[0][1] if response else []
+
+
+async def run_score_history_writer():
+    """Background task: copy queued submissions into the leaderboard table."""
+    while True:
+        try:
+            async_redis_client = await get_async_redis()
+            await ensure_consumer_group(async_redis_client)
+            while True:
+                await update_backlog_stats(async_redis_client)
+                messages = await read_history(async_redis_client, block=1000)
+                await persist_messages(async_redis_client, messages)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # unacked entries stay pending and are reclaimed by xautoclaim
+            history_stats["failed_batches"] += 1
+            print("Score history writer failed, retrying:", e)
+            await asyncio.sleep(1)
+
+
+async def drain_score_history(timeout: float = SCORE_HISTORY_DRAIN_TIMEOUT):
+    """
+    Called on shutdown after the writer task is cancelled: flush this worker's
+    pending entries and whatever is still undelivered, up to timeout seconds.
+    """
+    async_redis_client = await get_async_redis()
+    deadline = time.monotonic() + timeout
+    try:
+        await ensure_consumer_group(async_redis_client)
+        # "0" re-reads entries delivered to this consumer but not yet acked
+        for start in ("0", ">"):
+            while time.monotonic() < deadline:
+                response = await async_redis_client.xreadgroup(
+                    SCORE_HISTORY_GROUP,
+                    CONSUMER_NAME,
+                    {SCORE_HISTORY_STREAM: start},
+                    count=SCORE_HISTORY_BATCH_SIZE,
+                )
+                messages = response[0][1] if response else []
+                if not messages:
+                    break
+                await persist_messages(async_redis_client, messages)
+    except Exception as e:
+        print("Error draining score history:", e)
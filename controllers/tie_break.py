@@ -0,0 +1,67 @@
+import os
+import time
+from datetime import datetime, timezone
+
+# Games listed in LEADERBOARD_TIE_BREAK_GAMES rank equal scores by who got
+# there first instead of by member string. Their sorted sets hold
+# score * 2^32 + (2^32 - 1 - seconds since TIE_BREAK_EPOCH): a higher score
+# always wins, and on a tie the earlier time is the larger number. The result
+# stays an exact double while |score| < 2^21, so a rank is still one ZREVRANK
+# and the Lua compare-and-set works on it unchanged.
+#
+# Adding a game that already has scores to the list (or taking one off) changes
+# what its sorted set should hold. Each rebuild, and the submission that
+# creates a board, records the encoding it wrote under
+# leaderboard_encoding:{game}, and ensure_leaderboard rebuilds a board whose
+# recorded encoding differs from the configured one, the same way it rebuilds
+# a missing board. The current period boards are not rebuilt: they hold mixed
+# values until they roll over.
+TIE_BREAK_GAMES = frozenset(
+    game_id.strip()
+    for game_id in os.getenv("LEADERBOARD_TIE_BREAK_GAMES", "").split(",")
+    if game_id.strip()
+)
+TIE_BREAK_EPOCH = 1767225600  # 2026-01-01 UTC
+TIME_SLOTS = 2**32  # seconds, ~136 years from the epoch
+MAX_TIE_BREAK_SCORE = 2**21 - 1
+
+
+def uses_tie_break(game_id: str) -> bool:
+    return game_id in TIE_BREAK_GAMES
+
+
+def score_encoding(game_id: str) -> str:
+    return "tie_break" if uses_tie_break(game_id) else "plain"
+
+
+def encoding_key(game_id: str) -> str:
+    # boards built before this key existed hold plain scores
+    return f"leaderboard_encoding:{game_id}"
+
+
+def score_in_range(game_id: str, score: int) -> bool:
+    return not uses_tie_break(game_id) or abs(score) <= MAX_TIE_BREAK_SCORE
+
+
+def encode_score(game_id: str, score: int, achieved_at: datetime | None = None):
+    """Sorted-set value for a score; achieved_at defaults to now."""
+    if not uses_tie_break(game_id):
+        return score
+    if achieved_at is None:
+        timestamp = time.time()
+    else:
+        if achieved_at.tzinfo is None:
+            # DATETIME columns come back naive, in UTC
+            achieved_at = achieved_at.replace(tzinfo=timezone.utc)
+        timestamp = achieved_at.timestamp()
+    elapsed = min(max(int(timestamp) - TIE_BREAK_EPOCH, 0), TIME_SLOTS - 1)
+    return score * TIME_SLOTS + (TIME_SLOTS - 1 - elapsed)
+
+
+def decode_score(game_id: str, stored):
+    """Score as submitted; plain boards keep returning Redis' float."""
+    if stored is None:
+        return None
+    if not uses_tie_break(game_id):
+        return float(stored)
+    return int(float(stored)) // TIME_SLOTS
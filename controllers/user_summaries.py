@@ -0,0 +1,181 @@
+import asyncio
+import os
+import time
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config.cache import LRUCache
+from config.metrics import register_collector
+from config.redis import get_async_redis, register_script
+from models.response import UserSummary
+from models.tables import User
+
+# Lookups go in-process LRU -> Redis hash user_summary:{id} -> MySQL, so hot
+# requests (auth, submit, leaderboard) don't touch the users table.
+USER_SUMMARY_CACHE_SIZE = int(os.getenv("USER_SUMMARY_CACHE_SIZE", "50000"))
+# Redis copies expire on their own as a backstop for a missed invalidation
+USER_SUMMARY_TTL = int(os.getenv("USER_SUMMARY_TTL", "3600"))
+# in-process copies live shorter: a worker misses pub/sub messages while reconnecting
+USER_SUMMARY_LOCAL_TTL = int(os.getenv("USER_SUMMARY_LOCAL_TTL", "300"))
+# every worker listens here and drops its local copy of the published user id
+USER_SUMMARY_CHANNEL = "user_summary:invalidate"
+# An invalidation leaves a tombstone this long instead of deleting the hash:
+# a request that read the old row just before the commit can't write it back
+USER_SUMMARY_TOMBSTONE_TTL = int(os.getenv("USER_SUMMARY_TOMBSTONE_TTL", "10"))
+
+# Write a summary read from SQL only if the key is absent, so neither a live
+# copy nor a tombstone is overwritten.
+# KEYS: user_summary:{id}  ARGV: ttl, then field/value pairs
+FILL_USER_SUMMARY_LUA = """
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    return 0
+end
+redis.call('HSET', KEYS[1], unpack(ARGV, 2))
+redis.call('EXPIRE', KEYS[1], ARGV[1])
+return 1
+"""
+fill_user_summary = register_script(FILL_USER_SUMMARY_LUA)
+
+user_summaries = LRUCache(maxsize=USER_SUMMARY_CACHE_SIZE)
+register_collector("user_summary_cache", user_summaries.stats)
+
+
+def user_summary_key(user_id: int) -> str:
+    return f"user_summary:{user_id}"
+
+
+def to_redis_hash(summary: UserSummary) -> dict:
+    return {
+        "id": summary.id,
+        "user_code": summary.user_code,
+        "username": summary.username,
+        "avatar_url": summary.avatar_url or "",
+        "is_active": int(summary.is_active),
+        "is_verified": int(summary.is_verified),
+    }
+
+
+def from_redis_hash(fields: dict) -> UserSummary:
+    return UserSummary(**{**fields, "avatar_url": fields.get("avatar_url") or None})
+
+
+def cache_locally(summary: UserSummary):
+    user_summaries.set(
+        summary.id, summary, expires_at=time.time() + USER_SUMMARY_LOCAL_TTL
+    )
+
+
+async def get_user_summaries(
+    user_ids: list[int], db: AsyncSession
+) -> dict[int, UserSummary]:
+    """
+    Resolve many users at once: local hits first, then one Redis pipeline,
+    then one IN (...) query for whatever is left. Unknown ids are left out.
+    """
+    result: dict[int, UserSummary] = {}
+    missing = []
+    for user_id in dict.fromkeys(user_ids):
+        summary = user_summaries.get(user_id)
+        if summary is None:
+            missing.append(user_id)
+        else:
+            result[user_id] = summary
+    if not missing:
+        return result
+
+    async_redis_client = await get_async_redis()
+    try:
+        async with async_redis_client.pipeline(transaction=False) as pipe:
+            for user_id in missing:
+                pipe.hgetall(user_summary_key(user_id))
+            cached = await pipe.execute()
+    except Exception as e:
+        print("Error reading user summaries from Redis:", e)
+        cached = [None] * len(missing)
+
+    not_in_redis = []
+    for user_id, fields in zip(missing, cached):
+        if fields and "invalidated" not in fields:
+            result[user_id] = from_redis_hash(fields)
+            cache_locally(result[user_id])
+        else:
+            not_in_redis.append(user_id)
+    if not not_in_redis:
+        return result
+
+    rows = await db.execute(
+        select(
+            User.id,
+            User.user_code,
+            User.username,
+            User.avatar_url,
+            User.is_active,
+            User.is_verified,
+        ).where(User.id.in_(not_in_redis))
+    )
+    loaded = [UserSummary.model_validate(row, from_attributes=True) for row in rows]
+    for summary in loaded:
+        result[summary.id] = summary
+        cache_locally(summary)
+
+    if loaded:
+        try:
+            async with async_redis_client.pipeline(transaction=False) as pipe:
+                for summary in loaded:
+                    fields = to_redis_hash(summary)
+                    await fill_user_summary(
+                        keys=[user_summary_key(summary.id)],
+                        args=[USER_SUMMARY_TTL]
+                        + [item for pair in fields.items() for item in pair],
+                        client=pipe,
+                    )
+                await pipe.execute()
+        except Exception as e:
+            print("Error caching user summaries in Redis:", e)
+
+    return result
+
+
+async def get_user_summary(user_id: int, db: AsyncSession) -> UserSummary | None:
+    return (await get_user_summaries([user_id], db)).get(user_id)
+
+
+async def invalidate_user_summary(user_id: int):
+    """
+    Call after committing a change to a cached column (is_active, is_verified,
+    avatar_url, username). Replaces the Redis copy with a tombstone and tells
+    every worker to drop its local one. Never raises: the change is already
+    committed, and the TTLs bound how long a missed invalidation lasts.
+    """
+    user_summaries.pop(user_id)
+    key = user_summary_key(user_id)
+    try:
+        async_redis_client = await get_async_redis()
+        async with async_redis_client.pipeline(transaction=True) as pipe:
+            pipe.delete(key)
+            pipe.hset(key, "invalidated", 1)
+            pipe.expire(key, USER_SUMMARY_TOMBSTONE_TTL)
+            pipe.publish(USER_SUMMARY_CHANNEL, user_id)
+            await pipe.execute()
+    except Exception as e:
+        print("Error invalidating user summary in Redis:", e)
+
+
+async def listen_for_user_summary_invalidations():
+    """Background task: evict local copies when another worker changes a user."""
+    while True:
+        try:
+            async_redis_client = await get_async_redis()
+            async with async_redis_client.pubsub() as pubsub:
+                await pubsub.subscribe(USER_SUMMARY_CHANNEL)
+                # anything published while we were disconnected is lost
+                user_summaries.clear()
+                async for message in pubsub.listen():
+                    if message["type"] == "message":
+                        user_summaries.pop(int(message["data"]))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print("User summary invalidation listener failed, retrying:", e)
+            await asyncio.sleep(1)
@@ -1,18 +1,22 @@
 from config.cloudinary import upload_avatar
-from config.db import get_db
+from config.db import get_async_db
 from fastapi import Depends, HTTPException, Request, status
-from models.response import DifferentUserProfileResponse, UserProfileResponse
+from models.response import (
+    AuthenticatedUser,
+    DifferentUserProfileResponse,
+    UserProfileResponse,
+)
 from models.tables import User
 from fastapi import UploadFile
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from urllib.parse import quote
 from controllers.leaderboard import get_player_ranks_from_redis
+from controllers.user_summaries import get_user_summary, invalidate_user_summary
 from config.cloudinary import delete_avatar
 
 
-async def get_current_user(
-    request: Request, db: Session = Depends(get_db)
-) -> UserProfileResponse:
+def decode_bearer_token(request: Request) -> dict:
     from controllers.auth import verify_token
 
     auth = request.headers.get("Authorization", "")
@@ -28,12 +32,41 @@ async def get_current_user(
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail=payload["error"]
         )
-    user = db.query(User).filter(User.id == payload["user_id"]).first()
+    return payload
+
+
+async def get_current_identity(
+    request: Request, db: AsyncSession = Depends(get_async_db)
+) -> AuthenticatedUser:
+    """
+    Token claims plus the active flag, for routes that only need the caller's id.
+    Skips the per-game rank lookups that get_current_user does for the profile,
+    and reads the active flag from the user summary cache.
+    """
+    payload = decode_bearer_token(request)
+    summary = await get_user_summary(payload["user_id"], db)
+    if not summary or not summary.is_active:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="User not found"
+        )
+
+    return AuthenticatedUser(
+        id=payload["user_id"], username=payload["username"], is_active=True
+    )
+
+
+async def get_current_user(
+    request: Request, db: AsyncSession = Depends(get_async_db)
+) -> UserProfileResponse:
+    payload = decode_bearer_token(request)
+    user = await db.scalar(select(User).where(User.id == payload["user_id"]))
     if not user or not user.is_active:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="User not found"
         )
-    games = await get_player_ranks_from_redis(player_id=user.id)
+    games = await get_player_ranks_from_redis(
+        player_id=user.id, user_code=user.user_code, db=db
+    )
 
     return UserProfileResponse(
         id=payload["user_id"],
@@ -45,14 +78,18 @@ async def get_current_user(
     )
 
 
-async def get_user_profile(username: str, db: Session) -> DifferentUserProfileResponse:
-    user = db.query(User).filter(User.username == username).first()
+async def get_user_profile(
+    username: str, db: AsyncSession
+) -> DifferentUserProfileResponse:
+    user = await db.scalar(select(User).where(User.username == username))
 
     if not user or not user.is_active:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="User not found"
         )
-    games = await get_player_ranks_from_redis(player_id=user.id)
+    games = await get_player_ranks_from_redis(
+        player_id=user.id, user_code=user.user_code, db=db
+    )
 
     return DifferentUserProfileResponse(
         username=user.username,
@@ -62,11 +99,11 @@ async def get_user_profile(username: str, db: Session) -> DifferentUserProfileRe
 
 
 async def update_user_profile(
-    db: Session,
-    current_user: UserProfileResponse,
+    db: AsyncSession,
+    current_user: AuthenticatedUser,
     avatar_file: UploadFile,
 ) -> dict:
-    user = db.query(User).filter(User.id == current_user.id).first()
+    user = await db.scalar(select(User).where(User.id == current_user.id))
 
     if not user or not user.is_active:
         raise HTTPException(
@@ -76,20 +113,21 @@ async def update_user_profile(
         avatar_url = await upload_avatar(avatar_file, current_user.username)
         user.avatar_url = avatar_url
     try:
-        db.commit()
+        await db.commit()
     except Exception as e:
         print("Error updating user profile:", e)
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to update user profile.",
         )
-    db.refresh(user)
+    await db.refresh(user)
+    await invalidate_user_summary(user.id)
     return {"message": "avatar updated successfully."}
 
 
-async def remove_user_avatar(db: Session, current_user: UserProfileResponse) -> dict:
-    user = db.query(User).filter(User.id == current_user.id).first()
+async def remove_user_avatar(db: AsyncSession, current_user: AuthenticatedUser) -> dict:
+    user = await db.scalar(select(User).where(User.id == current_user.id))
 
     if not user or not user.is_active:
         raise HTTPException(
@@ -98,15 +136,16 @@ async def remove_user_avatar(db: Session, current_user: UserProfileResponse) ->
     await delete_avatar(user.username)
     user.avatar_url = generate_default_avatar(username=user.username)
     try:
-        db.commit()
+        await db.commit()
     except Exception:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to delete user avatar.",
         )
 
-    db.refresh(user)
+    await db.refresh(user)
+    await invalidate_user_summary(user.id)
 
     return {"message": "avatar deleted successfully."}
 
@@ -0,0 +1,66 @@
+"""initial schema: users and leaderboard as create_all used to build them
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18
+
+Databases created by the old startup create_all already have these tables;
+they are left as they are, so `alembic upgrade head` adopts them.
+"""
+
+from alembic import context, op
+import sqlalchemy as sa
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # offline (--sql) runs have no connection to inspect and emit everything
+    existing = (
+        [] if context.is_offline_mode() else sa.inspect(op.get_bind()).get_table_names()
+    )
+    if "users" not in existing:
+        op.create_table(
+            "users",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("user_code", sa.String(36), nullable=False, unique=True),
+            sa.Column("username", sa.String(50), nullable=False, unique=True),
+            sa.Column("email", sa.String(255), nullable=False, unique=True),
+            sa.Column("password_hash", sa.String(255), nullable=False),
+            sa.Column("phone_number", sa.String(15)),
+            sa.Column("is_verified", sa.Boolean(), server_default=sa.false()),
+            sa.Column("is_active", sa.Boolean(), server_default=sa.true()),
+            sa.Column("email_verification_code", sa.String(255), unique=True),
+            sa.Column("email_verification_expiry", sa.DateTime(timezone=True)),
+            sa.Column("password_reset_code", sa.String(255), unique=True),
+            sa.Column("password_reset_expiry", sa.DateTime(timezone=True)),
+            sa.Column("avatar_url", sa.String(255)),
+            sa.Column(
+                "created_at", sa.DateTime(timezone=True), server_default=sa.func.now()
+            ),
+            sa.Column(
+                "updated_at", sa.DateTime(timezone=True), server_default=sa.func.now()
+            ),
+        )
+    if "leaderboard" not in existing:
+        op.create_table(
+            "leaderboard",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("user_code", sa.String(36), nullable=False),
+            sa.Column("score", sa.Integer(), nullable=False),
+            sa.Column("game_id", sa.String(50), nullable=False),
+            sa.Column(
+                "created_at", sa.DateTime(timezone=True), server_default=sa.func.now()
+            ),
+            sa.Column(
+                "updated_at", sa.DateTime(timezone=True), server_default=sa.func.now()
+            ),
+        )
+
+
+def downgrade():
+    op.drop_table("leaderboard")
+    op.drop_table("users")
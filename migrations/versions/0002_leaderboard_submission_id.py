@@ -0,0 +1,33 @@
+"""leaderboard.submission_id for write-behind dedup
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18
+"""
+
+from alembic import context, op
+import sqlalchemy as sa
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # create_all after the write-behind change already added the column
+    if not context.is_offline_mode():
+        columns = sa.inspect(op.get_bind()).get_columns("leaderboard")
+        if "submission_id" in {column["name"] for column in columns}:
+            return
+    with op.batch_alter_table("leaderboard") as batch:
+        batch.add_column(sa.Column("submission_id", sa.String(36), nullable=True))
+        batch.create_unique_constraint(
+            "uq_leaderboard_submission_id", ["submission_id"]
+        )
+
+
+def downgrade():
+    with op.batch_alter_table("leaderboard") as batch:
+        batch.drop_constraint("uq_leaderboard_submission_id", type_="unique")
+        batch.drop_column("submission_id")
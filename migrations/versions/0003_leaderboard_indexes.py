@@ -0,0 +1,32 @@
+"""leaderboard indexes for top scores and per-player lookups
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index(
+        "ix_leaderboard_game_id_score",
+        "leaderboard",
+        ["game_id", sa.text("score DESC")],
+    )
+    op.create_index(
+        "ix_leaderboard_user_code_game_id",
+        "leaderboard",
+        ["user_code", "game_id", "score"],
+    )
+
+
+def downgrade():
+    op.drop_index("ix_leaderboard_user_code_game_id", table_name="leaderboard")
+    op.drop_index("ix_leaderboard_game_id_score", table_name="leaderboard")
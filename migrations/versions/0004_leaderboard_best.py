@@ -0,0 +1,53 @@
+"""leaderboard_best: each player's best score per game
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "leaderboard_best",
+        sa.Column("game_id", sa.String(50), nullable=False),
+        sa.Column("user_code", sa.String(36), nullable=False),
+        sa.Column("best_score", sa.Integer(), nullable=False),
+        sa.Column("achieved_at", sa.DateTime(timezone=True), nullable=False),
+        sa.PrimaryKeyConstraint("game_id", "user_code", name="pk_leaderboard_best"),
+    )
+    op.create_index(
+        "ix_leaderboard_best_game_id_best_score",
+        "leaderboard_best",
+        ["game_id", sa.text("best_score DESC")],
+    )
+    # backfill from the history: the best score and the first time it was reached
+    op.execute(
+        """
+        INSERT INTO leaderboard_best (game_id, user_code, best_score, achieved_at)
+        SELECT l.game_id, l.user_code, l.score, MIN(l.created_at)
+        FROM leaderboard l
+        JOIN (
+            SELECT game_id, user_code, MAX(score) AS best_score
+            FROM leaderboard
+            GROUP BY game_id, user_code
+        ) b ON b.game_id = l.game_id
+            AND b.user_code = l.user_code
+            AND b.best_score = l.score
+        GROUP BY l.game_id, l.user_code, l.score
+        """
+    )
+
+
+def downgrade():
+    op.drop_index(
+        "ix_leaderboard_best_game_id_best_score", table_name="leaderboard_best"
+    )
+    op.drop_table("leaderboard_best")
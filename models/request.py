@@ -55,3 +55,14 @@ class LoginRequest(BaseModel):
 class SubmitScoreRequest(BaseModel):
     game_id: str
     score: int
+
+
+class BatchScoreEntry(BaseModel):
+    user_id: int
+    game_id: str
+    score: int
+
+
+class SubmitScoresBatchRequest(BaseModel):
+    # one finished round from a game server, capped to keep the Lua calls short
+    entries: list[BatchScoreEntry] = Field(..., min_length=1, max_length=1000)
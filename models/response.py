@@ -8,6 +8,23 @@ class RegisterResponse(BaseModel):
     requires_verification: bool
 
 
+class AuthenticatedUser(BaseModel):
+    # Cheap identity for routes that only need who is calling, not their profile
+    id: int
+    username: str
+    is_active: bool = True
+
+
+class UserSummary(BaseModel):
+    # The few user columns hot requests need, cached in-process and in Redis
+    id: int
+    user_code: str
+    username: str
+    avatar_url: str | None = None
+    is_active: bool = True
+    is_verified: bool = False
+
+
 class UserProfileResponse(BaseModel):
     id: int
     username: str
@@ -1,4 +1,15 @@
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, true, false
+from sqlalchemy import (
+    Column,
+    PrimaryKeyConstraint,
+    Integer,
+    String,
+    DateTime,
+    Boolean,
+    Index,
+    UniqueConstraint,
+    true,
+    false,
+)
 from sqlalchemy.sql import func
 from sqlalchemy.ext.declarative import declarative_base
 
@@ -42,5 +53,34 @@ class LeaderboardEntry(Base):
     user_code = Column(String(36), nullable=False)
     score = Column(Integer, nullable=False)
     game_id = Column(String(50), nullable=False)
+    # set per submission so write-behind redeliveries can be skipped
+    submission_id = Column(String(36), nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    # schema changes go through a new revision in migrations/versions
+    __table_args__ = (
+        UniqueConstraint("submission_id", name="uq_leaderboard_submission_id"),
+        # top scores of a game: WHERE game_id = ? ORDER BY score DESC
+        Index("ix_leaderboard_game_id_score", "game_id", score.desc()),
+        # one player's history / best in a game; score makes MAX() index-only
+        Index("ix_leaderboard_user_code_game_id", "user_code", "game_id", "score"),
+    )
+
+
+class LeaderboardBest(Base):
+    """Each player's best score per game, kept current by every submission."""
+
+    __tablename__ = "leaderboard_best"
+
+    game_id = Column(String(50), nullable=False)
+    user_code = Column(String(36), nullable=False)
+    best_score = Column(Integer, nullable=False)
+    # when best_score was first reached
+    achieved_at = Column(DateTime(timezone=True), nullable=False)
+
+    __table_args__ = (
+        PrimaryKeyConstraint("game_id", "user_code", name="pk_leaderboard_best"),
+        # rank in SQL: COUNT(*) WHERE game_id = ? AND best_score > ?
+        Index("ix_leaderboard_best_game_id_best_score", "game_id", best_score.desc()),
+    )
@@ -1,7 +1,7 @@
 from controllers import auth
 from fastapi import APIRouter, Depends
-from config.db import get_db
-from sqlalchemy.orm import Session
+from config.db import get_async_db
+from sqlalchemy.ext.asyncio import AsyncSession
 from models.request import LoginRequest, RegisterRequest
 from models.response import RegisterResponse
 from fastapi_limiter.depends import RateLimiter
@@ -22,7 +22,7 @@ router = APIRouter(
 async def register(
     request: Request,
     request_data: RegisterRequest,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ) -> RegisterResponse:
     client_ip = request.client.host
     return await auth.register_user(
@@ -36,16 +36,16 @@ async def register(
     "/login",
     dependencies=[Depends(RateLimiter(times=5, seconds=60))],
 )
-def login(
+async def login(
     request: LoginRequest,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    return auth.login_user(request, db)
+    return await auth.login_user(request, db)
 
 
 @router.get("/verify-email")
-def verify_email(code: str, db: Session = Depends(get_db)):
-    return auth.email_verification(code, db)
+async def verify_email(code: str, db: AsyncSession = Depends(get_async_db)):
+    return await auth.email_verification(code, db)
 
 
 @router.post(
@@ -55,7 +55,7 @@ def verify_email(code: str, db: Session = Depends(get_db)):
 async def resend_verification_email(
     request: Request,
     email: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     client_ip = request.client.host
     return await auth.resend_verification(email, db, client_ip)
@@ -68,7 +68,7 @@ async def resend_verification_email(
 async def forgot_password(
     request: Request,
     email: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     client_ip = request.client.host
     return await auth.forgot_password(email, db, client_ip)
@@ -78,9 +78,9 @@ async def forgot_password(
     "/reset-password",
     dependencies=[Depends(RateLimiter(times=5, seconds=60))],
 )
-def reset_password(
+async def reset_password(
     code: str,
     new_password: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    return auth.reset_password(code, new_password, db)
+    return await auth.reset_password(code, new_password, db)
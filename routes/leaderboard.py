@@ -1,9 +1,29 @@
-from fastapi import APIRouter, Depends, Request
-from config.db import get_db
-from sqlalchemy.orm import Session
-from models.request import SubmitScoreRequest
-from controllers import users
-from controllers.leaderboard import fetch_leaderboard, fetch_user_rank, submit_score
+from fastapi import APIRouter, Depends, Query, Request
+from fastapi.responses import Response, StreamingResponse
+from config.db import get_async_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from models.request import SubmitScoreRequest, SubmitScoresBatchRequest
+from controllers import auth, users
+from controllers.periods import Period
+from controllers.leaderboard_cache import fetch_cached_leaderboard, is_cacheable
+from controllers.leaderboard_push import stream_leaderboard_updates
+from controllers.leaderboard_sync import (
+    ensure_leaderboard,
+    rebuild_leaderboard,
+    reconcile_leaderboard,
+)
+from controllers.leaderboard import (
+    LEADERBOARD_CACHE_TOP_N,
+    LEADERBOARD_MAX_PAGE_SIZE,
+    LEADERBOARD_STREAM_THRESHOLD,
+    fetch_around_me,
+    fetch_leaderboard,
+    fetch_leaderboard_page,
+    stream_leaderboard,
+    fetch_user_rank,
+    submit_score,
+    submit_scores_batch,
+)
 
 router = APIRouter(
     prefix="/leaderboard",
@@ -14,22 +34,128 @@ router = APIRouter(
 async def submit_new_score(
     request: Request,
     body: SubmitScoreRequest,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    current_user = await users.get_current_user(request=request, db=db)
-    return submit_score(request=body, current_user=current_user, db=db)
+    current_user = await users.get_current_identity(request=request, db=db)
+    await ensure_leaderboard(body.game_id, write=True)
+    return await submit_score(request=body, current_user=current_user, db=db)
+
+
+@router.post("/api/submit-scores")
+async def submit_new_scores(
+    request: Request,
+    body: SubmitScoresBatchRequest,
+    db: AsyncSession = Depends(get_async_db),
+):
+    auth.verify_service_key(request)
+    for game_id in {entry.game_id for entry in body.entries}:
+        await ensure_leaderboard(game_id, write=True)
+    return await submit_scores_batch(request=body, db=db)
 
 
 @router.get("/api/get-leaderboard/{game_id}")
-def get_leaderboard(game_id: str, db: Session = Depends(get_db), limit: int = 10):
-    return fetch_leaderboard(game_id=game_id, limit=limit, db=db)
+async def get_leaderboard(
+    game_id: str,
+    db: AsyncSession = Depends(get_async_db),
+    limit: int = Query(10, ge=1, le=LEADERBOARD_MAX_PAGE_SIZE),
+    period: Period = "all",
+    offset: int = Query(0, ge=0),
+    cursor: str | None = None,
+):
+    rebuilding = await ensure_leaderboard(game_id)
+    if rebuilding:
+        return rebuilding
+    if is_cacheable(limit, offset, cursor):
+        body = await fetch_cached_leaderboard(game_id, limit, period)
+        if isinstance(body, dict):
+            return body
+        return Response(content=body, media_type="application/json")
+    if limit <= LEADERBOARD_STREAM_THRESHOLD:
+        return await fetch_leaderboard(
+            game_id=game_id,
+            limit=limit,
+            db=db,
+            period=period,
+            offset=offset,
+            cursor=cursor,
+        )
+    page = await fetch_leaderboard_page(game_id, limit, period, offset, cursor)
+    if "error" in page:
+        return page
+    return StreamingResponse(
+        stream_leaderboard(game_id, page, limit, period),
+        media_type="application/json",
+    )
+
+
+@router.get("/api/get-leaderboard/{game_id}/stream")
+async def stream_live_leaderboard(
+    game_id: str,
+    limit: int = Query(10, ge=1, le=LEADERBOARD_CACHE_TOP_N),
+    period: Period = "all",
+):
+    rebuilding = await ensure_leaderboard(game_id)
+    if rebuilding:
+        return rebuilding
+    return StreamingResponse(
+        stream_leaderboard_updates(game_id, limit, period),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/api/get-leaderboard/{game_id}/around-me")
+async def get_leaderboard_around_me(
+    game_id: str,
+    request: Request,
+    db: AsyncSession = Depends(get_async_db),
+    radius: int = Query(5, ge=1, le=50),
+    top: int = Query(0, ge=0, le=100),
+    period: Period = "all",
+):
+    current_user = await users.get_current_identity(request=request, db=db)
+    rebuilding = await ensure_leaderboard(game_id)
+    if rebuilding:
+        return rebuilding
+    return await fetch_around_me(
+        game_id=game_id,
+        current_user=current_user,
+        db=db,
+        radius=radius,
+        top=top,
+        period=period,
+    )
 
 
 @router.get("/api/get-leaderboard/{game_id}/user-rank")
 async def get_user_rank(
     game_id: str,
     request: Request,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
+):
+    current_user = await users.get_current_identity(request=request, db=db)
+    rebuilding = await ensure_leaderboard(game_id)
+    if rebuilding:
+        return rebuilding
+    return await fetch_user_rank(game_id=game_id, current_user=current_user, db=db)
+
+
+@router.post("/api/admin/rebuild/{game_id}")
+async def rebuild_game_leaderboard(
+    game_id: str,
+    request: Request,
+    db: AsyncSession = Depends(get_async_db),
+):
+    auth.verify_service_key(request)
+    return await rebuild_leaderboard(game_id=game_id, db=db)
+
+
+@router.post("/api/admin/reconcile/{game_id}")
+async def reconcile_game_leaderboard(
+    game_id: str,
+    request: Request,
+    db: AsyncSession = Depends(get_async_db),
+    repair: bool = False,
 ):
-    current_user = await users.get_current_user(request=request, db=db)
-    return fetch_user_rank(game_id=game_id, current_user=current_user)
+    auth.verify_service_key(request)
+    return await reconcile_leaderboard(game_id=game_id, db=db, repair=repair)
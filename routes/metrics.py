@@ -0,0 +1,11 @@
+from fastapi import APIRouter
+from config.metrics import collect_metrics
+
+
+router = APIRouter()
+
+
+@router.get("/metrics")
+def get_metrics() -> dict:
+    """In-process counters of this worker (caches, queues)"""
+    return collect_metrics()
@@ -1,9 +1,9 @@
 from fastapi import APIRouter, Depends
 from fastapi import Request
 from controllers import users
-from config.db import get_db
+from config.db import get_async_db
 from models.response import DifferentUserProfileResponse, UserProfileResponse
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import UploadFile
 
 
@@ -15,7 +15,7 @@ router = APIRouter(
 @router.get("/api/profile")
 async def get_my_profile(
     request: Request,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ) -> UserProfileResponse:
 
     return await users.get_current_user(request=request, db=db)
@@ -23,7 +23,7 @@ async def get_my_profile(
 
 @router.get("/api/profile/{username}")
 async def get_user_profile(
-    username: str, db: Session = Depends(get_db)
+    username: str, db: AsyncSession = Depends(get_async_db)
 ) -> DifferentUserProfileResponse:
     """View another user's public profile"""
     return await users.get_user_profile(username=username, db=db)
@@ -33,17 +33,17 @@ async def get_user_profile(
 async def update_profile(
     request: Request,
     avatar_file: UploadFile,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ) -> dict:
-    current_user = await users.get_current_user(request=request, db=db)
+    current_user = await users.get_current_identity(request=request, db=db)
     return await users.update_user_profile(db, current_user, avatar_file)
 
 
 @router.delete("/api/profile/avatar")
 async def delete_avatar(
     request: Request,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ) -> dict:
     """Remove custom avatar and revert to default"""
-    current_user = await users.get_current_user(request=request, db=db)
+    current_user = await users.get_current_identity(request=request, db=db)
     return await users.remove_user_avatar(db, current_user)
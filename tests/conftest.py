@@ -5,14 +5,33 @@ from types import SimpleNamespace
 from unittest.mock import AsyncMock
 from unittest.mock import Mock
 import pytest
+import pytest_asyncio
 from sqlalchemy import text
 from models.request import LoginRequest, RegisterRequest, SubmitScoreRequest
-from models.response import UserProfileResponse
+from models.response import UserProfileResponse, UserSummary
 
 project_root = Path(__file__).parent.parent
 sys.path.insert(0, str(project_root))
 
 
+@pytest.fixture(autouse=True)
+def clear_in_process_caches():
+    # module-level caches would otherwise leak users between tests
+    from controllers.leaderboard_cache import leaderboard_responses
+    from controllers.leaderboard_sync import present_games, unknown_games
+    from controllers.user_summaries import user_summaries
+
+    user_summaries.clear()
+    leaderboard_responses.clear()
+    present_games.clear()
+    unknown_games.clear()
+    yield
+    user_summaries.clear()
+    leaderboard_responses.clear()
+    present_games.clear()
+    unknown_games.clear()
+
+
 @pytest.fixture
 def mock_db():
     db = Mock()
@@ -23,6 +42,35 @@ def mock_db():
     return db
 
 
+@pytest.fixture
+def async_db_session(mocker):
+    db = mocker.Mock()
+    db.scalar = AsyncMock()
+    db.execute = AsyncMock(return_value=mocker.Mock())
+    db.commit = AsyncMock()
+    db.rollback = AsyncMock()
+    db.refresh = AsyncMock()
+    return db
+
+
+@pytest_asyncio.fixture
+async def sqlite_db():
+    # in-memory aiosqlite stand-in for MySQL, shared by every connection in the test
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+    from sqlalchemy.pool import StaticPool
+    from models.tables import Base
+
+    engine = create_async_engine("sqlite+aiosqlite://", poolclass=StaticPool)
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
+
+    session_factory = async_sessionmaker(bind=engine, expire_on_commit=False)
+    async with session_factory() as db:
+        yield db
+
+    await engine.dispose()
+
+
 @pytest.fixture
 def sample_register_request():
     return RegisterRequest(
@@ -203,9 +251,18 @@ def make_current_user():
 
 
 @pytest.fixture
-def mock_leaderboard_user(mocker):
-    user = mocker.Mock()
-    user.id = 1
-    user.username = "testuser"
-    user.user_code = "test-uuid-123"
-    return user
+def mock_leaderboard_user():
+    return UserSummary(id=1, username="testuser", user_code="test-uuid-123")
+
+
+@pytest.fixture
+def mock_async_redis(mocker):
+    redis = mocker.MagicMock()
+    for command in ("zrevrange", "zrevrank", "zscore", "smembers", "evalsha"):
+        setattr(redis, command, AsyncMock())
+    pipe = mocker.Mock()
+    pipe.execute = AsyncMock()
+    redis.pipeline.return_value.__aenter__.return_value = pipe
+    for module in ("controllers.leaderboard", "controllers.user_summaries"):
+        mocker.patch(f"{module}.get_async_redis", AsyncMock(return_value=redis))
+    return redis
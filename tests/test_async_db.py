@@ -0,0 +1,111 @@
+from unittest.mock import AsyncMock
+
+import pytest
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config.db import get_async_db, to_async_url
+from controllers.auth import register_user
+from controllers.leaderboard import fetch_leaderboard, submit_score
+from models.tables import LeaderboardEntry, User
+
+
+def make_user(user_id: int, username: str, is_active: bool = True) -> User:
+    return User(
+        id=user_id,
+        user_code=f"code-{user_id}",
+        username=username,
+        email=f"{username}@example.com",
+        password_hash="hashed",
+        is_active=is_active,
+    )
+
+
+class TestAsyncEngineConfig:
+    def test_sync_drivers_map_to_async_drivers(self):
+        assert (
+            to_async_url("mysql+pymysql://root:pw@mysql:3306/db")
+            == "mysql+aiomysql://root:pw@mysql:3306/db"
+        )
+        assert to_async_url("sqlite:///test.db") == "sqlite+aiosqlite:///test.db"
+
+    def test_async_url_is_left_untouched(self):
+        url = "mysql+asyncmy://root:pw@mysql:3306/db"
+        assert to_async_url(url) == url
+
+    @pytest.mark.asyncio
+    async def test_get_async_db_yields_async_session(self):
+        dependency = get_async_db()
+        db = await dependency.__anext__()
+
+        assert isinstance(db, AsyncSession)
+        await dependency.aclose()
+
+
+class TestControllersOnSqlite:
+    @pytest.mark.asyncio
+    async def test_register_user_persists_user(
+        self, sqlite_db, sample_register_request, mocker
+    ):
+        mocker.patch("controllers.auth.send_auth_email", new=AsyncMock())
+
+        result = await register_user(
+            sample_register_request, sqlite_db, client_ip="127.0.0.1"
+        )
+
+        user = await sqlite_db.scalar(select(User).where(User.username == "testuser"))
+        assert result.username == "testuser"
+        assert user.email == "test@example.com"
+        assert user.email_verification_code is not None
+
+    @pytest.mark.asyncio
+    async def test_submit_score_records_history_row(
+        self,
+        sqlite_db,
+        mock_async_redis,
+        make_submit_request,
+        make_current_user,
+        mocker,
+    ):
+        sqlite_db.add(make_user(1, "testuser"))
+        await sqlite_db.commit()
+        # user summary cache: Redis miss, then the write-back
+        pipe = mock_async_redis.pipeline.return_value.__aenter__.return_value
+        pipe.execute.side_effect = [[{}], []]
+        mocker.patch(
+            "controllers.leaderboard.submit_best_score",
+            new_callable=AsyncMock,
+            return_value=[None, 0],
+        )
+
+        result = await submit_score(
+            make_submit_request(score=150), make_current_user(), sqlite_db
+        )
+
+        entries = (await sqlite_db.scalars(select(LeaderboardEntry))).all()
+        assert result["rank"] == 1
+        assert [(e.user_code, e.game_id, e.score) for e in entries] == [
+            ("code-1", "game_001", 150)
+        ]
+
+    @pytest.mark.asyncio
+    async def test_fetch_leaderboard_resolves_users_from_sql(
+        self, sqlite_db, mock_async_redis
+    ):
+        sqlite_db.add_all([make_user(1, "alice"), make_user(2, "bob", is_active=False)])
+        await sqlite_db.commit()
+        mock_async_redis.zrevrange.return_value = [
+            ("1", 300.0),
+            ("2", 200.0),
+            ("3", 100.0),
+        ]
+        pipe = mock_async_redis.pipeline.return_value.__aenter__.return_value
+        pipe.execute.side_effect = [[{}, {}, {}], []]
+
+        result = await fetch_leaderboard("game_001", limit=10, db=sqlite_db)
+
+        assert result == {
+            "game_id": "game_001",
+            "leaderboard": [{"rank": 1, "username": "alice", "score": 300.0}],
+        }
+        assert await sqlite_db.scalar(select(func.count(User.id))) == 2
@@ -1,6 +1,23 @@
+import asyncio
+import threading
+
 import pytest
 from fastapi import HTTPException
-from controllers.auth import hash_password, login_user, verify_password
+from passlib.context import CryptContext
+
+import controllers.auth
+from controllers.auth import (
+    BCRYPT_ROUNDS,
+    PASSWORD_HASH_MAX_QUEUE,
+    PASSWORD_HASH_WORKERS,
+    hash_password,
+    login_user,
+    create_token,
+    run_password_job,
+    verified_tokens,
+    verify_password,
+    verify_token,
+)
 
 
 class TestPasswordHashing:
@@ -43,69 +60,197 @@ class TestPasswordHashing:
         assert verified_hash == False
 
 
+class TestVerifyToken:
+    @pytest.fixture(autouse=True)
+    def signing_key(self, mocker):
+        mocker.patch("controllers.auth.SECRET_KEY", "test-secret-key-for-testing-only")
+        mocker.patch("controllers.auth.ALGORITHM", "HS256")
+        verified_tokens.clear()
+
+    def test_repeat_verification_skips_signature_check(self, mocker):
+        token = create_token(1, "testuser")
+        decode = mocker.spy(controllers.auth.jwt, "decode")
+
+        first = verify_token(token)
+        second = verify_token(token)
+
+        assert first == second
+        assert first["user_id"] == 1
+        decode.assert_called_once()
+        assert verified_tokens.stats()["hits"] >= 1
+
+    def test_invalid_token_is_not_cached(self):
+        size_before = len(verified_tokens)
+
+        assert verify_token("not-a-jwt") == {"error": "Invalid token."}
+        assert len(verified_tokens) == size_before
+
+    def test_cached_token_expires_with_exp_claim(self, mocker):
+        token = create_token(1, "testuser")
+        payload = verify_token(token)
+        decode = mocker.spy(controllers.auth.jwt, "decode")
+
+        # once past exp the cache entry is gone and the token is decoded again
+        mocker.patch("config.cache.time.time", return_value=payload["exp"] + 1)
+        verify_token(token)
+
+        decode.assert_called_once()
+
+    def test_does_not_print_payload(self, capsys):
+        verify_token(create_token(1, "testuser"))
+
+        assert capsys.readouterr().out == ""
+
+
 class TestRegisterUser:
     @pytest.mark.asyncio
     async def test_successful_registration(
-        self, db_session, sample_register_request, mocker
+        self, async_db_session, sample_register_request, mocker
     ):
-        db_session.query.return_value.filter.return_value.first.return_value = None
+        async_db_session.scalar.return_value = None
         mocker.patch("controllers.auth.send_auth_email", return_value=True)
 
         from controllers.auth import register_user
 
         result = await register_user(
-            sample_register_request, db_session, client_ip="127.0.0.1"
+            sample_register_request, async_db_session, client_ip="127.0.0.1"
         )
 
         assert result.requires_verification is True
         assert "Registration successful" in result.message
-        db_session.add.assert_called_once()
+        async_db_session.add.assert_called_once()
 
     @pytest.mark.asyncio
     async def test_duplicate_user_raises_conflict(
-        self, db_session, sample_register_request, mock_user
+        self, async_db_session, sample_register_request, mock_user
     ):
-        db_session.query.return_value.filter.return_value.first.return_value = mock_user
+        async_db_session.scalar.return_value = mock_user
 
         from controllers.auth import register_user
 
         with pytest.raises(HTTPException) as exc_info:
             await register_user(
-                sample_register_request, db_session, client_ip="127.0.0.1"
+                sample_register_request, async_db_session, client_ip="127.0.0.1"
             )
 
         assert exc_info.value.status_code == 409
-        db_session.add.assert_not_called()
+        async_db_session.add.assert_not_called()
 
     @pytest.mark.asyncio
     async def test_db_commit_failure_raises_500(
-        self, db_session, sample_register_request
+        self, async_db_session, sample_register_request
     ):
-        db_session.query.return_value.filter.return_value.first.return_value = None
-        db_session.commit.side_effect = Exception("DB error")
+        async_db_session.scalar.return_value = None
+        async_db_session.commit.side_effect = Exception("DB error")
 
         from controllers.auth import register_user
 
         with pytest.raises(HTTPException) as exc_info:
             await register_user(
-                sample_register_request, db_session, client_ip="127.0.0.1"
+                sample_register_request, async_db_session, client_ip="127.0.0.1"
             )
 
         assert exc_info.value.status_code == 500
-        db_session.rollback.assert_called_once()
+        async_db_session.rollback.assert_awaited_once()
 
 
 class TestLogin:
-    def test_successful_login(
-        self, mocker, db_session, sample_login_request, mock_user
+    @pytest.mark.asyncio
+    async def test_successful_login(
+        self, mocker, async_db_session, sample_login_request, mock_user
     ):
         # Mock the database query to return the mock user
-        db_session.query.return_value.filter.return_value.first.return_value = mock_user
+        async_db_session.scalar.return_value = mock_user
 
-        mocker.patch("controllers.auth.verify_password", return_value=True)
+        mocker.patch(
+            "controllers.auth.verify_and_update_password", return_value=(True, None)
+        )
         # Call the login_user function
-        response = login_user(sample_login_request, db_session)
+        response = await login_user(sample_login_request, async_db_session)
 
         # Assertions
         assert "token" in response
         assert response["message"] == "Login successful."
+        async_db_session.commit.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_wrong_password_raises_404(
+        self, mocker, async_db_session, sample_login_request, mock_user
+    ):
+        async_db_session.scalar.return_value = mock_user
+        mocker.patch(
+            "controllers.auth.verify_and_update_password", return_value=(False, None)
+        )
+
+        with pytest.raises(HTTPException) as exc_info:
+            await login_user(sample_login_request, async_db_session)
+
+        assert exc_info.value.status_code == 404
+
+    @pytest.mark.asyncio
+    async def test_outdated_hash_is_upgraded_on_login(
+        self, async_db_session, sample_login_request, mock_user
+    ):
+        # hash made with a cheaper cost than the configured BCRYPT_ROUNDS
+        mock_user.password_hash = CryptContext(
+            schemes=["bcrypt"], bcrypt__rounds=4
+        ).hash(sample_login_request.password)
+        async_db_session.scalar.return_value = mock_user
+
+        response = await login_user(sample_login_request, async_db_session)
+
+        assert "token" in response
+        assert mock_user.password_hash.startswith(f"$2b${BCRYPT_ROUNDS:02d}$")
+        async_db_session.commit.assert_awaited_once()
+
+
+class TestPasswordHashPool:
+    @pytest.mark.asyncio
+    async def test_runs_job_off_the_event_loop(self):
+        thread_name = await run_password_job(lambda: threading.current_thread().name)
+
+        assert thread_name.startswith("password-hash")
+
+    @pytest.mark.asyncio
+    async def test_saturated_pool_fails_fast_with_503(self, mocker):
+        mocker.patch(
+            "controllers.auth.password_hash_jobs",
+            PASSWORD_HASH_WORKERS + PASSWORD_HASH_MAX_QUEUE,
+        )
+        job = mocker.Mock()
+
+        with pytest.raises(HTTPException) as exc_info:
+            await run_password_job(job)
+
+        assert exc_info.value.status_code == 503
+        job.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_job_slot_released_after_failure(self):
+        def failing_job():
+            raise ValueError("boom")
+
+        with pytest.raises(ValueError):
+            await run_password_job(failing_job)
+
+        assert controllers.auth.password_hash_jobs == 0
+
+    @pytest.mark.asyncio
+    async def test_slot_held_until_a_cancelled_callers_job_finishes(self):
+        started, release = threading.Event(), threading.Event()
+
+        def slow_job():
+            started.set()
+            release.wait(5)
+
+        waiter = asyncio.create_task(run_password_job(slow_job))
+        await asyncio.to_thread(started.wait, 5)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+
+        # the hash is still running in the pool
+        assert controllers.auth.password_hash_jobs == 1
+        release.set()
+        while controllers.auth.password_hash_jobs:
+            await asyncio.sleep(0.01)
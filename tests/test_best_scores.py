@@ -0,0 +1,40 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.dialects import mysql
+
+from controllers.best_scores import best_scores_upsert, upsert_best_scores
+from models.tables import LeaderboardBest
+
+
+def history(user_code: str, score: int, day: int) -> dict:
+    return {
+        "user_code": user_code,
+        "game_id": "game_001",
+        "score": score,
+        "created_at": datetime(2026, 1, day),
+    }
+
+
+@pytest.mark.asyncio
+async def test_upsert_keeps_the_highest_score_and_when_it_was_reached(sqlite_db):
+    await upsert_best_scores(sqlite_db, [history("code-1", 100, 1)])
+    await upsert_best_scores(
+        sqlite_db,
+        [history("code-1", 80, 2), history("code-2", 50, 2), history("code-1", 100, 3)],
+    )
+    await upsert_best_scores(sqlite_db, [history("code-2", 70, 4)])
+    await sqlite_db.commit()
+
+    rows = (await sqlite_db.execute(select(LeaderboardBest))).scalars().all()
+    assert sorted((r.user_code, r.best_score, r.achieved_at.day) for r in rows) == [
+        ("code-1", 100, 1),
+        ("code-2", 70, 4),
+    ]
+
+
+def test_mysql_upsert_updates_achieved_at_before_raising_the_score():
+    sql = str(best_scores_upsert("mysql").compile(dialect=mysql.dialect()))
+    update = sql.split("ON DUPLICATE KEY UPDATE")[1]
+    assert update.index("achieved_at") < update.index("best_score = greatest(")
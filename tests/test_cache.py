@@ -0,0 +1,120 @@
+import asyncio
+import time
+
+import pytest
+
+from config.cache import LRUCache, SingleFlight
+from config.metrics import collect_metrics, register_collector
+
+
+class TestLRUCache:
+    def test_get_returns_stored_value(self):
+        cache = LRUCache(maxsize=2)
+        cache.set("a", 1)
+
+        assert cache.get("a") == 1
+        assert cache.get("missing") is None
+        assert cache.stats()["hits"] == 1
+        assert cache.stats()["misses"] == 1
+
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = LRUCache(maxsize=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")  # "b" is now the least recently used
+        cache.set("c", 3)
+
+        assert cache.get("b") is None
+        assert cache.get("a") == 1
+        assert cache.get("c") == 3
+        assert len(cache) == 2
+
+    def test_expired_entry_is_dropped(self):
+        cache = LRUCache(maxsize=2)
+        cache.set("a", 1, expires_at=time.time() - 1)
+        cache.set("b", 2, expires_at=time.time() + 60)
+
+        assert cache.get("a") is None
+        assert cache.get("b") == 2
+        assert len(cache) == 1
+
+    def test_pop_and_clear(self):
+        cache = LRUCache(maxsize=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+
+        cache.pop("a")
+        assert cache.get("a") is None
+        cache.clear()
+        assert len(cache) == 0
+
+    def test_stats_report_hit_ratio(self):
+        cache = LRUCache(maxsize=2)
+        cache.set("a", 1)
+        cache.get("a")
+        cache.get("a")
+        cache.get("b")
+
+        assert cache.stats() == {
+            "size": 1,
+            "maxsize": 2,
+            "hits": 2,
+            "misses": 1,
+            "hit_ratio": 2 / 3,
+        }
+
+
+class TestSingleFlight:
+    @pytest.mark.asyncio
+    async def test_concurrent_calls_share_one_run(self):
+        flight = SingleFlight()
+        runs = 0
+
+        async def work():
+            nonlocal runs
+            runs += 1
+            await asyncio.sleep(0.01)
+            return runs
+
+        results = await asyncio.gather(*(flight.run("k", work) for _ in range(50)))
+
+        assert results == [1] * 50
+        assert flight.stats() == {"in_flight": 0, "started": 1, "coalesced": 49}
+        # finished calls are forgotten, the next one runs again
+        assert await flight.run("k", work) == 2
+
+    @pytest.mark.asyncio
+    async def test_exception_reaches_every_waiter(self):
+        flight = SingleFlight()
+
+        async def work():
+            await asyncio.sleep(0.01)
+            raise RuntimeError("backend down")
+
+        results = await asyncio.gather(
+            *(flight.run("k", work) for _ in range(3)), return_exceptions=True
+        )
+
+        assert all(isinstance(result, RuntimeError) for result in results)
+
+    @pytest.mark.asyncio
+    async def test_cancelled_caller_does_not_cancel_the_others(self):
+        flight = SingleFlight()
+
+        async def work():
+            await asyncio.sleep(0.02)
+            return "done"
+
+        first = asyncio.create_task(flight.run("k", work))
+        second = asyncio.create_task(flight.run("k", work))
+        await asyncio.sleep(0)
+        first.cancel()
+
+        assert await second == "done"
+
+
+def test_collect_metrics_reads_registered_collectors():
+    cache = LRUCache(maxsize=5)
+    register_collector("test_cache", cache.stats)
+
+    assert collect_metrics()["test_cache"]["maxsize"] == 5
@@ -1,131 +1,408 @@
-from controllers.leaderboard import fetch_leaderboard, submit_score
-
-
+import json
+from datetime import datetime
+from unittest.mock import AsyncMock
+
+import pytest
+
+from models.request import SubmitScoresBatchRequest
+from models.response import UserSummary
+from controllers.leaderboard import (
+    decode_cursor,
+    encode_cursor,
+    fetch_around_me,
+    fetch_leaderboard,
+    fetch_leaderboard_page,
+    get_player_ranks_from_redis,
+    stream_leaderboard,
+    submit_score,
+    submit_scores_batch,
+)
+
+
+@pytest.fixture
+def daily_board_only(mocker):
+    # one open period board, so expected script keys/args stay readable
+    return mocker.patch(
+        "controllers.leaderboard.period_boards",
+        side_effect=lambda game_id: [
+            (f"leaderboard:{game_id}:d:2026-10-18", 1792454400)
+        ],
+    )
+
+
+@pytest.mark.usefixtures("daily_board_only")
 class TestSubmitScore:
-    def test_user_not_found_returns_error(
-        self, db_session, make_submit_request, make_current_user
+    @pytest.fixture(autouse=True)
+    def get_user_summary(self, mocker, mock_leaderboard_user):
+        return mocker.patch(
+            "controllers.leaderboard.get_user_summary",
+            new_callable=AsyncMock,
+            return_value=mock_leaderboard_user,
+        )
+
+    @pytest.mark.asyncio
+    async def test_user_not_found_returns_error(
+        self, async_db_session, get_user_summary, make_submit_request, make_current_user
     ):
-        db_session.query.return_value.filter.return_value.first.return_value = None
+        get_user_summary.return_value = None
 
-        result = submit_score(make_submit_request(), make_current_user(), db_session)
+        result = await submit_score(
+            make_submit_request(), make_current_user(), async_db_session
+        )
 
         assert result == {"error": "User not found."}
 
-    def test_new_high_score_is_added_to_redis(
+    @pytest.mark.asyncio
+    async def test_tie_break_game_rejects_scores_it_cannot_encode(
+        self, async_db_session, mocker, make_submit_request, make_current_user
+    ):
+        mocker.patch("controllers.tie_break.TIE_BREAK_GAMES", frozenset({"game_001"}))
+
+        result = await submit_score(
+            make_submit_request(score=2**21), make_current_user(), async_db_session
+        )
+
+        assert result == {"error": "Score out of range for this game."}
+        async_db_session.commit.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_new_high_score_is_added_to_redis(
         self,
-        db_session,
+        async_db_session,
         mock_leaderboard_user,
+        mock_async_redis,
         mocker,
         make_submit_request,
         make_current_user,
     ):
-        db_session.query.return_value.filter.return_value.first.return_value = (
-            mock_leaderboard_user
+        # no existing score, rank 1 (0-indexed)
+        mock_script = mocker.patch(
+            "controllers.leaderboard.submit_best_score",
+            new_callable=AsyncMock,
+            return_value=[None, 0],
         )
-        mock_redis = mocker.patch("controllers.leaderboard.redis_client")
-        mock_redis.zscore.return_value = None  # no existing score
-        mock_redis.zrevrank.return_value = 0  # rank 1 (0-indexed)
-        result = submit_score(
-            make_submit_request(score=150), make_current_user(), db_session
+        result = await submit_score(
+            make_submit_request(score=150), make_current_user(), async_db_session
         )
 
         assert result["message"] == "Score submitted successfully."
         assert result["score"] == 150
         assert result["rank"] == 1
-        mock_redis.zadd.assert_called_once_with("leaderboard:game_001", {1: 150})
+        mock_script.assert_awaited_once_with(
+            keys=[
+                "leaderboard:game_001",
+                "leaderboard:game_001:d:2026-10-18",
+                "leaderboard_version:game_001",
+                "leaderboard_encoding:game_001",
+                "player_games:1",
+            ],
+            args=["game_001", 1, 1792454400, 100, 0, "plain", 1, 150],
+            client=mock_async_redis,
+        )
 
-    def test_lower_score_does_not_update_redis(
+    @pytest.mark.asyncio
+    async def test_lower_score_does_not_update_redis(
         self,
-        db_session,
+        async_db_session,
         mock_leaderboard_user,
+        mock_async_redis,
         mocker,
         make_submit_request,
         make_current_user,
     ):
-        db_session.query.return_value.filter.return_value.first.return_value = (
-            mock_leaderboard_user
+        # existing best is 200, rank 3 (0-indexed)
+        mocker.patch(
+            "controllers.leaderboard.submit_best_score",
+            new_callable=AsyncMock,
+            return_value=["200", 2],
         )
-        mock_redis = mocker.patch("controllers.leaderboard.redis_client")
-        mock_redis.zscore.return_value = 200  # existing best is 200
-        mock_redis.zrevrank.return_value = 2  # rank 3 (0-indexed)
-        result = submit_score(
-            make_submit_request(score=100), make_current_user(), db_session
+        result = await submit_score(
+            make_submit_request(score=100), make_current_user(), async_db_session
         )
 
         assert result["message"] == "Score submitted successfully."
         assert result["score"] == 100
         assert result["rank"] == 3
         assert result["best_score"] == 200
-        mock_redis.zadd.assert_not_called()
+        assert "previous_best" not in result
 
-    def test_equal_score_does_not_update_redis(
+    @pytest.mark.asyncio
+    async def test_equal_score_does_not_update_redis(
         self,
-        db_session,
+        async_db_session,
         mock_leaderboard_user,
+        mock_async_redis,
         mocker,
         make_submit_request,
         make_current_user,
     ):
-        db_session.query.return_value.filter.return_value.first.return_value = (
-            mock_leaderboard_user
+        mocker.patch(
+            "controllers.leaderboard.submit_best_score",
+            new_callable=AsyncMock,
+            return_value=["100", 0],
         )
-        mock_redis = mocker.patch("controllers.leaderboard.redis_client")
-        mock_redis.zscore.return_value = 100
-        mock_redis.zrevrank.return_value = 0
 
-        result = submit_score(
-            make_submit_request(score=100), make_current_user(), db_session
+        result = await submit_score(
+            make_submit_request(score=100), make_current_user(), async_db_session
         )
 
         assert result["message"] == "Score submitted successfully."
-        mock_redis.zadd.assert_not_called()
+        assert result["best_score"] == 100
+        assert "previous_best" not in result
 
-    def test_db_commit_failure_rolls_back(
-        self, db_session, mock_leaderboard_user, make_submit_request, make_current_user
+    @pytest.mark.asyncio
+    async def test_db_commit_failure_rolls_back(
+        self,
+        async_db_session,
+        mock_leaderboard_user,
+        make_submit_request,
+        make_current_user,
     ):
-        db_session.query.return_value.filter.return_value.first.return_value = (
-            mock_leaderboard_user
-        )
-        db_session.commit.side_effect = Exception("DB error")
+        async_db_session.commit.side_effect = Exception("DB error")
 
-        result = submit_score(make_submit_request(), make_current_user(), db_session)
+        result = await submit_score(
+            make_submit_request(), make_current_user(), async_db_session
+        )
 
         assert result == {"error": "Score submission failed."}
-        db_session.rollback.assert_called_once()
+        async_db_session.rollback.assert_awaited_once()
 
-    def test_redis_failure_returns_error(
+    @pytest.mark.asyncio
+    async def test_redis_failure_returns_error(
         self,
-        db_session,
+        async_db_session,
         mock_leaderboard_user,
+        mock_async_redis,
         mocker,
         make_submit_request,
         make_current_user,
     ):
-        db_session.query.return_value.filter.return_value.first.return_value = (
-            mock_leaderboard_user
+        mocker.patch(
+            "controllers.leaderboard.submit_best_score",
+            new_callable=AsyncMock,
+            side_effect=Exception("Redis down"),
         )
-        mock_redis = mocker.patch("controllers.leaderboard.redis_client")
-        mock_redis.zscore.side_effect = Exception("Redis down")
 
-        result = submit_score(make_submit_request(), make_current_user(), db_session)
+        result = await submit_score(
+            make_submit_request(), make_current_user(), async_db_session
+        )
         assert result == {"error": "Score submission failed at leaderboard update."}
 
+    @pytest.mark.asyncio
+    async def test_redis_failure_resyncs_player_best_from_sql(
+        self,
+        async_db_session,
+        mock_async_redis,
+        mocker,
+        make_submit_request,
+        make_current_user,
+    ):
+        mocker.patch(
+            "controllers.leaderboard.submit_best_score",
+            new_callable=AsyncMock,
+            side_effect=Exception("Redis down"),
+        )
+        async_db_session.execute.return_value.all.return_value = [
+            ("test-uuid-123", 300, datetime(2026, 10, 18))
+        ]
+        pipe = mock_async_redis.pipeline.return_value.__aenter__.return_value
 
-class TestFetchLeaderboard:
-    def test_returns_ranked_entries(self, db_session, mocker):
-        mock_redis = mocker.patch("controllers.leaderboard.redis_client")
-        mock_redis.zrevrange.return_value = [("1", 200.0), ("2", 150.0)]
-
-        alice = mocker.Mock()
-        alice.username = "alice"
-        bob = mocker.Mock()
-        bob.username = "bob"
-        db_session.query.return_value.filter.return_value.first.side_effect = [
-            alice,
-            bob,
+        await submit_score(make_submit_request(), make_current_user(), async_db_session)
+
+        pipe.zadd.assert_called_once_with("leaderboard:game_001", {1: 300}, gt=True)
+        pipe.sadd.assert_called_once_with("player_games:1", "game_001")
+
+
+@pytest.mark.usefixtures("daily_board_only")
+class TestSubmitScoresBatch:
+    @pytest.fixture(autouse=True)
+    def get_user_summaries(self, mocker):
+        return mocker.patch(
+            "controllers.leaderboard.get_user_summaries",
+            new_callable=AsyncMock,
+            return_value={
+                1: UserSummary(id=1, username="alice", user_code="code-1"),
+                2: UserSummary(id=2, username="bob", user_code="code-2"),
+            },
+        )
+
+    @staticmethod
+    def batch(*rows):
+        return SubmitScoresBatchRequest(
+            entries=[
+                {"user_id": user_id, "game_id": game_id, "score": score}
+                for user_id, game_id, score in rows
+            ]
+        )
+
+    @pytest.mark.asyncio
+    async def test_one_insert_and_one_script_call_per_game(
+        self, async_db_session, mock_async_redis, mocker
+    ):
+        mock_script = mocker.patch(
+            "controllers.leaderboard.submit_best_score", new_callable=AsyncMock
+        )
+        pipe = mock_async_redis.pipeline.return_value.__aenter__.return_value
+        # per game: previous best and 0-based rank for each of its rows
+        pipe.execute.return_value = [[None, 1, "500", 0], [None, 0]]
+
+        result = await submit_scores_batch(
+            self.batch((1, "g1", 100), (2, "g1", 400), (1, "g2", 50)),
+            async_db_session,
+        )
+
+        # history rows, then the leaderboard_best upsert for the same rows
+        history_call, best_call = async_db_session.execute.await_args_list
+        rows = history_call.args[1]
+        assert [(r["user_code"], r["game_id"], r["score"]) for r in rows] == [
+            ("code-1", "g1", 100),
+            ("code-2", "g1", 400),
+            ("code-1", "g2", 50),
+        ]
+        # submission ids are only needed by the write-behind queue
+        assert "submission_id" not in rows[0]
+        assert mock_script.await_args_list == [
+            mocker.call(
+                keys=[
+                    "leaderboard:g1",
+                    "leaderboard:g1:d:2026-10-18",
+                    "leaderboard_version:g1",
+                    "leaderboard_encoding:g1",
+                    "player_games:1",
+                    "player_games:2",
+                ],
+                args=["g1", 1, 1792454400, 100, 0, "plain", 1, 100, 2, 400],
+                client=pipe,
+            ),
+            mocker.call(
+                keys=[
+                    "leaderboard:g2",
+                    "leaderboard:g2:d:2026-10-18",
+                    "leaderboard_version:g2",
+                    "leaderboard_encoding:g2",
+                    "player_games:1",
+                ],
+                args=["g2", 1, 1792454400, 100, 0, "plain", 1, 50],
+                client=pipe,
+            ),
         ]
+        assert [(r["user_id"], r["game_id"], r["rank"]) for r in result["results"]] == [
+            (1, "g1", 2),
+            (2, "g1", 1),
+            (1, "g2", 1),
+        ]
+        assert result["results"][1]["best_score"] == 500
+        assert [r["best_score"] for r in best_call.args[1]] == [100, 400, 50]
+
+    @pytest.mark.asyncio
+    async def test_unknown_users_get_per_row_errors(
+        self, async_db_session, mock_async_redis, mocker
+    ):
+        mocker.patch(
+            "controllers.leaderboard.submit_best_score", new_callable=AsyncMock
+        )
+        pipe = mock_async_redis.pipeline.return_value.__aenter__.return_value
+        pipe.execute.return_value = [[None, 0]]
+
+        result = await submit_scores_batch(
+            self.batch((99, "g1", 10), (1, "g1", 20)), async_db_session
+        )
+
+        assert result["results"][0] == {"user_id": 99, "error": "User not found."}
+        assert result["results"][1]["rank"] == 1
+        history_call, _ = async_db_session.execute.await_args_list
+        assert len(history_call.args[1]) == 1
+
+    @pytest.mark.asyncio
+    async def test_db_failure_rolls_back_whole_batch(
+        self, async_db_session, mock_async_redis, mocker
+    ):
+        mock_script = mocker.patch(
+            "controllers.leaderboard.submit_best_score", new_callable=AsyncMock
+        )
+        async_db_session.commit.side_effect = Exception("DB error")
+
+        result = await submit_scores_batch(self.batch((1, "g1", 10)), async_db_session)
+
+        assert result == {"error": "Score submission failed."}
+        async_db_session.rollback.assert_awaited_once()
+        mock_script.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_redis_failure_resyncs_committed_players_from_sql(
+        self, async_db_session, mock_async_redis, mocker
+    ):
+        mocker.patch(
+            "controllers.leaderboard.submit_best_score", new_callable=AsyncMock
+        )
+        resync = mocker.patch(
+            "controllers.leaderboard.resync_player_bests", new_callable=AsyncMock
+        )
+        pipe = mock_async_redis.pipeline.return_value.__aenter__.return_value
+        pipe.execute.side_effect = Exception("Redis down")
+
+        result = await submit_scores_batch(
+            self.batch((1, "g1", 100), (2, "g1", 400), (1, "g2", 50)),
+            async_db_session,
+        )
+
+        assert result == {"error": "Score submission failed at leaderboard update."}
+        assert resync.await_args_list == [
+            mocker.call("g1", {"code-1": 1, "code-2": 2}, async_db_session),
+            mocker.call("g2", {"code-1": 1}, async_db_session),
+        ]
+
+
+class TestFetchLeaderboard:
+    @pytest.fixture(autouse=True)
+    def get_user_summaries(self, mocker):
+        return mocker.patch(
+            "controllers.leaderboard.get_user_summaries",
+            new_callable=AsyncMock,
+            return_value={},
+        )
+
+    @staticmethod
+    def summaries(*users):
+        return {
+            user_id: UserSummary(
+                id=user_id,
+                user_code=f"code-{user_id}",
+                username=username,
+                is_active=is_active,
+            )
+            for user_id, username, is_active in users
+        }
+
+    @pytest.mark.asyncio
+    async def test_period_reads_the_current_window_board(
+        self, async_db_session, mock_async_redis, mocker
+    ):
+        mocker.patch(
+            "controllers.leaderboard.leaderboard_key",
+            side_effect=lambda game_id, period: f"leaderboard:{game_id}:w:2026-W42",
+        )
+        mock_async_redis.zrevrange.return_value = []
+
+        result = await fetch_leaderboard(
+            "game_001", 10, async_db_session, period="weekly"
+        )
+
+        mock_async_redis.zrevrange.assert_awaited_once_with(
+            "leaderboard:game_001:w:2026-W42", 0, 9, withscores=True
+        )
+        assert result == {"game_id": "game_001", "leaderboard": [], "period": "weekly"}
+
+    @pytest.mark.asyncio
+    async def test_returns_ranked_entries(
+        self, async_db_session, mock_async_redis, get_user_summaries
+    ):
+        mock_async_redis.zrevrange.return_value = [("1", 200.0), ("2", 150.0)]
+        get_user_summaries.return_value = self.summaries(
+            (1, "alice", True), (2, "bob", True)
+        )
 
-        result = fetch_leaderboard("game_001", limit=10, db=db_session)
+        result = await fetch_leaderboard("game_001", limit=10, db=async_db_session)
 
         assert result["game_id"] == "game_001"
         assert len(result["leaderboard"]) == 2
@@ -140,47 +417,300 @@ class TestFetchLeaderboard:
             "score": 150.0,
         }
 
-    def test_respects_limit_parameter(self, db_session, mocker):
-        mock_redis = mocker.patch("controllers.leaderboard.redis_client")
-        mock_redis.zrevrange.return_value = [("1", 500.0)]
-        user = mocker.Mock()
-        user.username = "testuser"
-        db_session.query.return_value.filter.return_value.first.return_value = user
+    @pytest.mark.asyncio
+    async def test_respects_limit_parameter(
+        self, async_db_session, mock_async_redis, get_user_summaries
+    ):
+        mock_async_redis.zrevrange.return_value = [("1", 500.0)]
+        get_user_summaries.return_value = self.summaries((1, "testuser", True))
 
-        fetch_leaderboard("game_001", limit=5, db=db_session)
+        await fetch_leaderboard("game_001", limit=5, db=async_db_session)
 
-        mock_redis.zrevrange.assert_called_once_with(
+        mock_async_redis.zrevrange.assert_awaited_once_with(
             "leaderboard:game_001", 0, 4, withscores=True
         )
 
-    def test_skips_entry_when_user_not_in_db(self, db_session, mocker):
-        mock_redis = mocker.patch("controllers.leaderboard.redis_client")
-        mock_redis.zrevrange.return_value = [("1", 200.0), ("999", 100.0)]
+    @pytest.mark.asyncio
+    async def test_offset_page_keeps_absolute_ranks(
+        self, async_db_session, mock_async_redis, get_user_summaries
+    ):
+        mock_async_redis.zrevrange.return_value = [("7", 90.0), ("8", 80.0)]
+        get_user_summaries.return_value = self.summaries(
+            (7, "grace", True), (8, "heidi", True)
+        )
+
+        result = await fetch_leaderboard(
+            "game_001", limit=2, db=async_db_session, offset=20
+        )
+
+        mock_async_redis.zrevrange.assert_awaited_once_with(
+            "leaderboard:game_001", 20, 21, withscores=True
+        )
+        assert [row["rank"] for row in result["leaderboard"]] == [21, 22]
+        assert decode_cursor(result["next_cursor"]) == (80.0, "8")
+
+    @pytest.mark.asyncio
+    async def test_cursor_resumes_after_the_last_member(
+        self, async_db_session, mock_async_redis, get_user_summaries, mocker
+    ):
+        page_after = mocker.patch(
+            "controllers.leaderboard.page_after",
+            new_callable=AsyncMock,
+            return_value=[5, ["9", "70"]],
+        )
+        get_user_summaries.return_value = self.summaries((9, "ivan", True))
+
+        result = await fetch_leaderboard(
+            "game_001",
+            limit=2,
+            db=async_db_session,
+            cursor=encode_cursor("8", 80.0),
+        )
+
+        page_after.assert_awaited_once_with(
+            keys=["leaderboard:game_001"],
+            args=["8", 80.0, 2],
+            client=mock_async_redis,
+        )
+        mock_async_redis.zrevrange.assert_not_awaited()
+        # a short page is the last one
+        assert result == {
+            "game_id": "game_001",
+            "leaderboard": [{"rank": 6, "username": "ivan", "score": 70.0}],
+        }
+
+    @pytest.mark.asyncio
+    async def test_invalid_cursor_returns_error(
+        self, async_db_session, mock_async_redis
+    ):
+        result = await fetch_leaderboard(
+            "game_001", limit=10, db=async_db_session, cursor="not-a-cursor"
+        )
 
-        alice = mocker.Mock()
-        alice.username = "alice"
-        db_session.query.return_value.filter.return_value.first.side_effect = [
-            alice,
-            None,
+        assert result == {"error": "Invalid cursor."}
+        mock_async_redis.zrevrange.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_streamed_page_matches_the_buffered_one(
+        self, async_db_session, mock_async_redis, get_user_summaries, mocker
+    ):
+        mocker.patch("controllers.leaderboard.LEADERBOARD_STREAM_CHUNK", 2)
+        entries = [("1", 300.0), ("2", 200.0), ("3", 100.0)]
+        mock_async_redis.zrevrange.return_value = entries
+        get_user_summaries.side_effect = lambda user_ids, db: self.summaries(
+            *[(user_id, f"user{user_id}", True) for user_id in user_ids]
+        )
+        session_factory = mocker.MagicMock()
+        session_factory.return_value.__aenter__.return_value = async_db_session
+
+        buffered = await fetch_leaderboard("game_001", limit=3, db=async_db_session)
+        page = await fetch_leaderboard_page("game_001", limit=3)
+        body = b"".join(
+            [
+                chunk
+                async for chunk in stream_leaderboard(
+                    "game_001", page, 3, session_factory=session_factory
+                )
+            ]
+        )
+
+        assert json.loads(body) == buffered
+        # usernames are resolved one chunk at a time
+        assert [c.args[0] for c in get_user_summaries.await_args_list[1:]] == [
+            [1, 2],
+            [3],
         ]
 
-        result = fetch_leaderboard("game_001", limit=10, db=db_session)
+    @pytest.mark.asyncio
+    async def test_skips_entry_when_user_not_in_db(
+        self, async_db_session, mock_async_redis, get_user_summaries
+    ):
+        mock_async_redis.zrevrange.return_value = [("1", 200.0), ("999", 100.0)]
+        get_user_summaries.return_value = self.summaries((1, "alice", True))
+
+        result = await fetch_leaderboard("game_001", limit=10, db=async_db_session)
 
         assert len(result["leaderboard"]) == 1
         assert result["leaderboard"][0]["username"] == "alice"
 
-    def test_empty_leaderboard_returns_empty_list(self, db_session, mocker):
-        mock_redis = mocker.patch("controllers.leaderboard.redis_client")
-        mock_redis.zrevrange.return_value = []
+    @pytest.mark.asyncio
+    async def test_usernames_resolved_in_single_batch(
+        self, async_db_session, mock_async_redis, get_user_summaries
+    ):
+        mock_async_redis.zrevrange.return_value = [
+            (str(user_id), 1000.0 - user_id) for user_id in range(1, 101)
+        ]
+        get_user_summaries.return_value = self.summaries(
+            *((user_id, f"user{user_id}", True) for user_id in range(1, 101))
+        )
 
-        result = fetch_leaderboard("game_001", limit=10, db=db_session)
+        result = await fetch_leaderboard("game_001", limit=100, db=async_db_session)
+
+        assert len(result["leaderboard"]) == 100
+        assert result["leaderboard"][99]["username"] == "user100"
+        get_user_summaries.assert_awaited_once_with(
+            list(range(1, 101)), async_db_session
+        )
+
+    @pytest.mark.asyncio
+    async def test_skips_inactive_user(
+        self, async_db_session, mock_async_redis, get_user_summaries
+    ):
+        mock_async_redis.zrevrange.return_value = [("1", 200.0), ("2", 100.0)]
+        get_user_summaries.return_value = self.summaries(
+            (1, "alice", False), (2, "bob", True)
+        )
+
+        result = await fetch_leaderboard("game_001", limit=10, db=async_db_session)
+
+        assert result["leaderboard"] == [{"rank": 2, "username": "bob", "score": 100.0}]
+
+    @pytest.mark.asyncio
+    async def test_empty_leaderboard_returns_empty_list(
+        self, async_db_session, mock_async_redis
+    ):
+        mock_async_redis.zrevrange.return_value = []
+
+        result = await fetch_leaderboard("game_001", limit=10, db=async_db_session)
 
         assert result == {"game_id": "game_001", "leaderboard": []}
 
-    def test_redis_failure_returns_error(self, db_session, mocker):
-        mock_redis = mocker.patch("controllers.leaderboard.redis_client")
-        mock_redis.zrevrange.side_effect = Exception("Redis down")
+    @pytest.mark.asyncio
+    async def test_redis_failure_returns_error(
+        self, async_db_session, mock_async_redis
+    ):
+        mock_async_redis.zrevrange.side_effect = Exception("Redis down")
 
-        result = fetch_leaderboard("game_001", limit=10, db=db_session)
+        result = await fetch_leaderboard("game_001", limit=10, db=async_db_session)
 
         assert result == {"error": "Failed to fetch leaderboard."}
+
+
+class TestFetchAroundMe:
+    @pytest.fixture(autouse=True)
+    def get_user_summaries(self, mocker):
+        return mocker.patch(
+            "controllers.leaderboard.get_user_summaries",
+            new_callable=AsyncMock,
+            side_effect=lambda user_ids, db: {
+                user_id: UserSummary(
+                    id=user_id, user_code=f"code-{user_id}", username=f"user{user_id}"
+                )
+                for user_id in user_ids
+            },
+        )
+
+    @pytest.fixture
+    def around_member(self, mocker):
+        return mocker.patch(
+            "controllers.leaderboard.around_member", new_callable=AsyncMock
+        )
+
+    @pytest.mark.asyncio
+    async def test_window_and_top_come_from_one_pipeline(
+        self,
+        async_db_session,
+        mock_async_redis,
+        around_member,
+        get_user_summaries,
+        make_current_user,
+    ):
+        pipe = mock_async_redis.pipeline.return_value.__aenter__.return_value
+        # player 7 is 0-based rank 10, radius 1
+        pipe.execute.return_value = [
+            [10, ["6", "510", "7", "500", "8", "490"]],
+            [("1", 900.0), ("2", 800.0)],
+        ]
+
+        result = await fetch_around_me(
+            "game_001", make_current_user(user_id=7), async_db_session, radius=1, top=2
+        )
+
+        around_member.assert_awaited_once_with(
+            keys=["leaderboard:game_001"], args=[7, 1], client=pipe
+        )
+        pipe.zrevrange.assert_called_once_with(
+            "leaderboard:game_001", 0, 1, withscores=True
+        )
+        pipe.execute.assert_awaited_once()
+        get_user_summaries.assert_awaited_once()
+        assert result == {
+            "game_id": "game_001",
+            "rank": 11,
+            "around": [
+                {"rank": 10, "username": "user6", "score": 510.0},
+                {"rank": 11, "username": "user7", "score": 500.0},
+                {"rank": 12, "username": "user8", "score": 490.0},
+            ],
+            "top": [
+                {"rank": 1, "username": "user1", "score": 900.0},
+                {"rank": 2, "username": "user2", "score": 800.0},
+            ],
+        }
+
+    @pytest.mark.asyncio
+    async def test_unranked_player(
+        self, async_db_session, mock_async_redis, around_member, make_current_user
+    ):
+        pipe = mock_async_redis.pipeline.return_value.__aenter__.return_value
+        pipe.execute.return_value = [[]]
+
+        result = await fetch_around_me(
+            "game_001", make_current_user(), async_db_session, radius=5
+        )
+
+        assert result == {"message": "User not ranked yet."}
+        pipe.zrevrange.assert_not_called()
+
+
+class TestGetPlayerRanksFromRedis:
+    @pytest.mark.asyncio
+    async def test_reads_only_games_in_player_index(
+        self, async_db_session, mock_async_redis
+    ):
+        mock_async_redis.smembers.return_value = {"game_001", "game_002"}
+        pipe = mock_async_redis.pipeline.return_value.__aenter__.return_value
+        # rank, score, board exists, evicted marker, in sorted game id order
+        pipe.execute.return_value = [0, 300.0, 1, 0, 4, 50.0, 1, 0]
+
+        result = await get_player_ranks_from_redis(
+            player_id=1, user_code="code-1", db=async_db_session
+        )
+
+        assert result == {
+            "game_001": {"score": 300.0, "rank": 1},
+            "game_002": {"score": 50.0, "rank": 5},
+        }
+        mock_async_redis.smembers.assert_awaited_once_with("player_games:1")
+        mock_async_redis.scan.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_all_lookups_sent_in_one_pipeline(
+        self, async_db_session, mock_async_redis
+    ):
+        mock_async_redis.smembers.return_value = {"game_001", "game_002"}
+        pipe = mock_async_redis.pipeline.return_value.__aenter__.return_value
+        pipe.execute.return_value = [0, 300.0, 1, 0, None, None, 1, 0]
+
+        result = await get_player_ranks_from_redis(
+            player_id=1, user_code="code-1", db=async_db_session
+        )
+
+        assert result == {"game_001": {"score": 300.0, "rank": 1}}
+        mock_async_redis.pipeline.assert_called_once_with(transaction=False)
+        pipe.execute.assert_awaited_once()
+        assert pipe.zrevrank.call_count == 2
+        assert pipe.zscore.call_count == 2
+
+    @pytest.mark.asyncio
+    async def test_player_without_games_returns_empty(
+        self, async_db_session, mock_async_redis
+    ):
+        mock_async_redis.smembers.return_value = set()
+
+        result = await get_player_ranks_from_redis(
+            player_id=1, user_code="code-1", db=async_db_session
+        )
+
+        assert result == {}
+        mock_async_redis.pipeline.assert_not_called()
@@ -0,0 +1,185 @@
+import asyncio
+import json
+from unittest.mock import AsyncMock
+
+import pytest
+
+from controllers.leaderboard_cache import (
+    fetch_cached_leaderboard,
+    is_cacheable,
+    leaderboard_responses,
+)
+
+
+@pytest.fixture
+def cache_redis(mock_async_redis, mocker):
+    mocker.patch(
+        "controllers.leaderboard_cache.get_async_redis",
+        AsyncMock(return_value=mock_async_redis),
+    )
+    mock_async_redis.get = AsyncMock(return_value="3")
+    mock_async_redis.set = AsyncMock(return_value=True)
+    return mock_async_redis
+
+
+@pytest.fixture
+def session_factory(async_db_session, mocker):
+    factory = mocker.MagicMock()
+    factory.return_value.__aenter__.return_value = async_db_session
+    return factory
+
+
+@pytest.fixture
+def fetch_leaderboard(mocker):
+    return mocker.patch(
+        "controllers.leaderboard_cache.fetch_leaderboard",
+        new_callable=AsyncMock,
+        return_value={
+            "game_id": "game_001",
+            "leaderboard": [{"rank": 1, "username": "zoë", "score": 200.0}],
+        },
+    )
+
+
+class TestFetchCachedLeaderboard:
+    @pytest.mark.asyncio
+    async def test_hit_serves_stored_bytes_while_version_is_unchanged(
+        self, async_db_session, session_factory, cache_redis, fetch_leaderboard
+    ):
+        first = await fetch_cached_leaderboard(
+            "game_001", 10, session_factory=session_factory
+        )
+        second = await fetch_cached_leaderboard(
+            "game_001", 10, session_factory=session_factory
+        )
+
+        assert second is first
+        assert json.loads(first) == fetch_leaderboard.return_value
+        fetch_leaderboard.assert_awaited_once_with(
+            "game_001", 10, async_db_session, period="all"
+        )
+        cache_redis.get.assert_awaited_with("leaderboard_version:game_001")
+
+    @pytest.mark.asyncio
+    async def test_version_bump_rebuilds_the_response(
+        self, session_factory, cache_redis, fetch_leaderboard
+    ):
+        await fetch_cached_leaderboard("game_001", 10, session_factory=session_factory)
+        cache_redis.get.return_value = "4"
+
+        await fetch_cached_leaderboard("game_001", 10, session_factory=session_factory)
+
+        assert fetch_leaderboard.await_count == 2
+
+    @pytest.mark.asyncio
+    async def test_limits_and_periods_are_cached_separately(
+        self, session_factory, cache_redis, fetch_leaderboard
+    ):
+        await fetch_cached_leaderboard("game_001", 10, session_factory=session_factory)
+        await fetch_cached_leaderboard("game_001", 5, session_factory=session_factory)
+        await fetch_cached_leaderboard(
+            "game_001", 10, period="daily", session_factory=session_factory
+        )
+
+        assert fetch_leaderboard.await_count == 3
+        assert len(leaderboard_responses) == 3
+
+    @pytest.mark.asyncio
+    async def test_concurrent_misses_share_one_rebuild(
+        self, session_factory, cache_redis, fetch_leaderboard
+    ):
+        async def slow_fetch(*args, **kwargs):
+            await asyncio.sleep(0.01)
+            return {"game_id": "game_001", "leaderboard": []}
+
+        fetch_leaderboard.side_effect = slow_fetch
+
+        bodies = await asyncio.gather(
+            *(
+                fetch_cached_leaderboard(
+                    "game_001", 10, session_factory=session_factory
+                )
+                for _ in range(100)
+            )
+        )
+
+        assert fetch_leaderboard.await_count == 1
+        assert len(set(bodies)) == 1
+
+    @pytest.mark.asyncio
+    async def test_errors_are_not_cached(
+        self, session_factory, cache_redis, fetch_leaderboard
+    ):
+        fetch_leaderboard.return_value = {"error": "Failed to fetch leaderboard."}
+
+        result = await fetch_cached_leaderboard(
+            "game_001", 10, session_factory=session_factory
+        )
+
+        assert result == {"error": "Failed to fetch leaderboard."}
+        assert len(leaderboard_responses) == 0
+
+    @pytest.mark.asyncio
+    async def test_version_read_failure_returns_error(
+        self, session_factory, cache_redis, fetch_leaderboard
+    ):
+        cache_redis.get.side_effect = Exception("Redis down")
+
+        result = await fetch_cached_leaderboard(
+            "game_001", 10, session_factory=session_factory
+        )
+
+        assert result == {"error": "Failed to fetch leaderboard."}
+        fetch_leaderboard.assert_not_awaited()
+
+
+class TestFleetLock:
+    @pytest.fixture(autouse=True)
+    def fleet_lock(self, mocker):
+        mocker.patch("controllers.leaderboard_cache.LEADERBOARD_FLEET_LOCK", True)
+        mocker.patch("controllers.leaderboard_cache.LEADERBOARD_LOCK_POLL", 0)
+        return mocker.patch(
+            "controllers.leaderboard_cache.release_lock", new_callable=AsyncMock
+        )
+
+    @pytest.mark.asyncio
+    async def test_lock_holder_publishes_the_response_for_other_workers(
+        self, session_factory, cache_redis, fetch_leaderboard, fleet_lock
+    ):
+        cache_redis.get.side_effect = ["3", None]
+
+        body = await fetch_cached_leaderboard(
+            "game_001", 10, session_factory=session_factory
+        )
+
+        lock_call, publish_call = cache_redis.set.await_args_list
+        assert lock_call.args[0] == "leaderboard_response:game_001:all:10:3:lock"
+        assert lock_call.kwargs == {"nx": True, "px": 2000}
+        assert publish_call.args == ("leaderboard_response:game_001:all:10:3", body)
+        fleet_lock.assert_awaited_once_with(
+            keys=["leaderboard_response:game_001:all:10:3:lock"],
+            args=[lock_call.args[1]],
+            client=cache_redis,
+        )
+
+    @pytest.mark.asyncio
+    async def test_other_workers_wait_for_the_published_response(
+        self, session_factory, cache_redis, fetch_leaderboard
+    ):
+        published = '{"game_id":"game_001","leaderboard":[]}'
+        cache_redis.get.side_effect = ["3", None, published]
+        cache_redis.set.return_value = None  # another worker holds the lock
+
+        body = await fetch_cached_leaderboard(
+            "game_001", 10, session_factory=session_factory
+        )
+
+        assert body == published.encode()
+        fetch_leaderboard.assert_not_awaited()
+
+
+def test_only_first_pages_within_top_n_are_cacheable():
+    assert is_cacheable(10)
+    assert not is_cacheable(10, offset=10)
+    assert not is_cacheable(10, cursor="abc")
+    assert not is_cacheable(1000)
@@ -84,3 +84,335 @@ def test_leaderboard_submit_rank_and_profile_games_flow(
     assert bob_profile_response.json()["games"] == {
         "space_race": {"score": 250.0, "rank": 2}
     }
+
+
+def test_batch_submission_requires_service_key_and_ranks_rows(
+    client, register_verified_user, get_user, mocker
+):
+    mocker.patch("controllers.auth.SERVICE_API_KEY", "game-server-key")
+    for index, username in enumerate(("carol", "dave")):
+        register_verified_user(
+            username=username,
+            email=f"{username}@example.com",
+            phone_number=f"0101234568{index}",
+        )
+    carol, dave = get_user("carol"), get_user("dave")
+    body = {
+        "entries": [
+            {"user_id": carol.id, "game_id": "batch_race", "score": 100},
+            {"user_id": dave.id, "game_id": "batch_race", "score": 300},
+            {"user_id": carol.id, "game_id": "batch_race", "score": 200},
+        ]
+    }
+
+    rejected = client.post(
+        "/leaderboard/api/submit-scores",
+        headers={"X-Service-Key": "wrong"},
+        json=body,
+    )
+    assert rejected.status_code == 401
+
+    response = client.post(
+        "/leaderboard/api/submit-scores",
+        headers={"X-Service-Key": "game-server-key"},
+        json=body,
+    )
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert [r["rank"] for r in results] == [2, 1, 2]
+    assert results[2]["previous_best"] == 100.0
+
+    leaderboard_response = client.get("/leaderboard/api/get-leaderboard/batch_race")
+    assert leaderboard_response.json()["leaderboard"] == [
+        {"rank": 1, "username": "dave", "score": 300.0},
+        {"rank": 2, "username": "carol", "score": 200.0},
+    ]
+
+
+def test_rebuild_restores_a_lost_leaderboard_from_sql(
+    client, register_verified_user, mocker
+):
+    from config.redis import redis_client
+
+    mocker.patch("controllers.auth.SERVICE_API_KEY", "game-server-key")
+    erin = register_verified_user(
+        username="erin", email="erin@example.com", phone_number="01012345690"
+    )
+    for score in (120, 80):
+        client.post(
+            "/leaderboard/api/submit-score",
+            headers=erin["headers"],
+            json={"game_id": "lost_race", "score": score},
+        )
+    redis_client.delete("leaderboard:lost_race")
+
+    drift = client.post(
+        "/leaderboard/api/admin/reconcile/lost_race",
+        headers={"X-Service-Key": "game-server-key"},
+    )
+    assert drift.json()["missing"] == 1
+
+    rebuild = client.post(
+        "/leaderboard/api/admin/rebuild/lost_race",
+        headers={"X-Service-Key": "game-server-key"},
+    )
+    assert rebuild.status_code == 200
+    assert rebuild.json()["loaded"] == 1
+
+    leaderboard_response = client.get("/leaderboard/api/get-leaderboard/lost_race")
+    assert leaderboard_response.json()["leaderboard"] == [
+        {"rank": 1, "username": "erin", "score": 120.0}
+    ]
+
+
+def test_period_leaderboards_are_written_with_the_all_time_board(
+    client, register_verified_user
+):
+    from config.redis import redis_client
+    from controllers.periods import leaderboard_key
+
+    frank = register_verified_user(
+        username="frank", email="frank@example.com", phone_number="01012345691"
+    )
+    for score in (40, 90, 60):
+        client.post(
+            "/leaderboard/api/submit-score",
+            headers=frank["headers"],
+            json={"game_id": "window_race", "score": score},
+        )
+
+    for period in ("daily", "weekly", "monthly", "season"):
+        response = client.get(
+            "/leaderboard/api/get-leaderboard/window_race", params={"period": period}
+        )
+        assert response.json()["leaderboard"] == [
+            {"rank": 1, "username": "frank", "score": 90.0}
+        ]
+        assert redis_client.ttl(leaderboard_key("window_race", period)) > 0
+    assert redis_client.ttl(leaderboard_key("window_race")) == -1
+
+    invalid = client.get(
+        "/leaderboard/api/get-leaderboard/window_race", params={"period": "hourly"}
+    )
+    assert invalid.status_code == 422
+
+
+def test_around_me_returns_the_players_neighbourhood(client, register_verified_user):
+    players = [
+        register_verified_user(
+            username=f"near{index}",
+            email=f"near{index}@example.com",
+            phone_number=f"0101234570{index}",
+        )
+        for index in range(5)
+    ]
+    for index, player in enumerate(players):
+        client.post(
+            "/leaderboard/api/submit-score",
+            headers=player["headers"],
+            json={"game_id": "near_race", "score": (index + 1) * 100},
+        )
+
+    # near0 is last with 100, so only the entry above exists
+    response = client.get(
+        "/leaderboard/api/get-leaderboard/near_race/around-me",
+        headers=players[0]["headers"],
+        params={"radius": 1, "top": 1},
+    )
+    assert response.status_code == 200
+    assert response.json() == {
+        "game_id": "near_race",
+        "rank": 5,
+        "around": [
+            {"rank": 4, "username": "near1", "score": 200.0},
+            {"rank": 5, "username": "near0", "score": 100.0},
+        ],
+        "top": [{"rank": 1, "username": "near4", "score": 500.0}],
+    }
+
+    middle = client.get(
+        "/leaderboard/api/get-leaderboard/near_race/around-me",
+        headers=players[2]["headers"],
+        params={"radius": 1},
+    )
+    assert [row["username"] for row in middle.json()["around"]] == [
+        "near3",
+        "near2",
+        "near1",
+    ]
+    assert "top" not in middle.json()
+
+
+def test_leaderboard_pages_by_offset_and_cursor(client, register_verified_user):
+    players = [
+        register_verified_user(
+            username=f"page{index}",
+            email=f"page{index}@example.com",
+            phone_number=f"0101234580{index}",
+        )
+        for index in range(5)
+    ]
+    for index, player in enumerate(players):
+        client.post(
+            "/leaderboard/api/submit-score",
+            headers=player["headers"],
+            json={"game_id": "paged_race", "score": (index + 1) * 100},
+        )
+    url = "/leaderboard/api/get-leaderboard/paged_race"
+
+    first = client.get(url, params={"limit": 2}).json()
+    assert [row["username"] for row in first["leaderboard"]] == ["page4", "page3"]
+
+    # page1 overtakes page3 between requests; the cursor still resumes right
+    # after page3, where an offset of 2 would have repeated page3
+    client.post(
+        "/leaderboard/api/submit-score",
+        headers=players[1]["headers"],
+        json={"game_id": "paged_race", "score": 450},
+    )
+    second = client.get(url, params={"limit": 2, "cursor": first["next_cursor"]}).json()
+    assert [row["username"] for row in second["leaderboard"]] == ["page2", "page0"]
+    assert [row["rank"] for row in second["leaderboard"]] == [4, 5]
+
+    by_offset = client.get(url, params={"limit": 2, "offset": 4}).json()
+    assert by_offset == {
+        "game_id": "paged_race",
+        "leaderboard": [{"rank": 5, "username": "page0", "score": 100.0}],
+    }
+
+    too_big = client.get(url, params={"limit": 100_000})
+    assert too_big.status_code == 422
+
+
+def test_cursor_skips_ties_already_seen_after_its_player_moved(
+    client, register_verified_user
+):
+    players = {
+        f"tie{index}": register_verified_user(
+            username=f"tie{index}",
+            email=f"tie{index}@example.com",
+            phone_number=f"0101234575{index}",
+        )
+        for index in range(4)
+    }
+    for player in players.values():
+        client.post(
+            "/leaderboard/api/submit-score",
+            headers=player["headers"],
+            json={"game_id": "tied_race", "score": 100},
+        )
+    url = "/leaderboard/api/get-leaderboard/tied_race"
+
+    first = client.get(url, params={"limit": 2}).json()
+    seen = [row["username"] for row in first["leaderboard"]]
+    # the cursor's player leaves the tie before the next page is read
+    client.post(
+        "/leaderboard/api/submit-score",
+        headers=players[seen[1]]["headers"],
+        json={"game_id": "tied_race", "score": 200},
+    )
+    second = client.get(url, params={"limit": 2, "cursor": first["next_cursor"]}).json()
+
+    assert {row["username"] for row in second["leaderboard"]} == set(players) - set(
+        seen
+    )
+    assert [row["rank"] for row in second["leaderboard"]] == [3, 4]
+
+
+def test_cached_top_n_is_rebuilt_when_the_top_changes(client, register_verified_user):
+    players = [
+        register_verified_user(
+            username=f"cached{index}",
+            email=f"cached{index}@example.com",
+            phone_number=f"0101234590{index}",
+        )
+        for index in range(2)
+    ]
+    url = "/leaderboard/api/get-leaderboard/cached_race"
+    client.post(
+        "/leaderboard/api/submit-score",
+        headers=players[0]["headers"],
+        json={"game_id": "cached_race", "score": 100},
+    )
+    first = client.get(url, params={"limit": 3})
+    assert first.content == client.get(url, params={"limit": 3}).content
+
+    client.post(
+        "/leaderboard/api/submit-score",
+        headers=players[1]["headers"],
+        json={"game_id": "cached_race", "score": 200},
+    )
+    assert [
+        row["username"]
+        for row in client.get(url, params={"limit": 3}).json()["leaderboard"]
+    ] == ["cached1", "cached0"]
+
+
+def test_tie_break_game_ranks_the_earliest_achiever_first(
+    client, register_verified_user, mocker
+):
+    from config.redis import redis_client
+
+    mocker.patch("controllers.tie_break.TIE_BREAK_GAMES", frozenset({"tie_race"}))
+    # the two submissions land five seconds apart
+    clock = mocker.patch("controllers.tie_break.time")
+    clock.time.side_effect = [1792000000, 1792000005]
+    early = register_verified_user(
+        username="early",
+        email="early@example.com",
+        phone_number="01012345600",
+    )
+    late = register_verified_user(
+        username="late",
+        email="late@example.com",
+        phone_number="01012345601",
+    )
+    for player in (early, late):
+        response = client.post(
+            "/leaderboard/api/submit-score",
+            headers=player["headers"],
+            json={"game_id": "tie_race", "score": 700},
+        )
+    assert response.json()["rank"] == 2
+    # recorded by the first submission, so reads don't rebuild the new board
+    assert redis_client.get("leaderboard_encoding:tie_race") == "tie_break"
+
+    board = client.get("/leaderboard/api/get-leaderboard/tie_race").json()
+    assert board["leaderboard"] == [
+        {"rank": 1, "username": "early", "score": 700},
+        {"rank": 2, "username": "late", "score": 700},
+    ]
+    rank = client.get(
+        "/leaderboard/api/get-leaderboard/tie_race/user-rank",
+        headers=late["headers"],
+    ).json()
+    assert (rank["rank"], rank["score"]) == (2, 700)
+
+
+def test_evicted_leaderboard_is_rebuilt_on_first_read(client, register_verified_user):
+    from config.redis import redis_client
+    from controllers.leaderboard_sync import present_games
+
+    for n, score in enumerate((90, 150)):
+        player = register_verified_user(
+            username=f"idle{n}",
+            email=f"idle{n}@example.com",
+            phone_number=f"0101234561{n}",
+        )
+        client.post(
+            "/leaderboard/api/submit-score",
+            headers=player["headers"],
+            json={"game_id": "idle_race", "score": score},
+        )
+    # what the idle eviction leaves behind
+    redis_client.set("leaderboard_evicted:idle_race", 1)
+    redis_client.delete("leaderboard:idle_race")
+    present_games.clear()
+
+    board = client.get("/leaderboard/api/get-leaderboard/idle_race").json()
+
+    assert board["leaderboard"] == [
+        {"rank": 1, "username": "idle1", "score": 150.0},
+        {"rank": 2, "username": "idle0", "score": 90.0},
+    ]
+    assert not redis_client.exists("leaderboard_evicted:idle_race")
@@ -0,0 +1,193 @@
+import asyncio
+import json
+from unittest.mock import AsyncMock
+
+import pytest
+import pytest_asyncio
+
+from controllers import leaderboard_push
+from controllers.leaderboard_push import (
+    GameFeed,
+    diff_rows,
+    feeds,
+    stream_leaderboard_updates,
+)
+
+
+def page(*rows):
+    return {
+        "game_id": "game_001",
+        "leaderboard": [
+            {"rank": rank, "username": username, "score": score}
+            for rank, username, score in rows
+        ],
+    }
+
+
+def parse(event: bytes) -> tuple[str, dict]:
+    kind, data = event.decode().strip().split("\n")
+    return kind.removeprefix("event: "), json.loads(data.removeprefix("data: "))
+
+
+class FakePubSub:
+    """get_message hands out whatever was published, or waits for timeout."""
+
+    def __init__(self):
+        self.messages = asyncio.Queue()
+        self.psubscribe = AsyncMock()
+
+    async def get_message(self, ignore_subscribe_messages, timeout):
+        try:
+            return await asyncio.wait_for(self.messages.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+@pytest.fixture
+def pubsub(mock_async_redis, mocker):
+    fake = FakePubSub()
+    mock_async_redis.pubsub.return_value.__aenter__.return_value = fake
+    # a truthy mock would swallow the listener task's CancelledError
+    mock_async_redis.pubsub.return_value.__aexit__.return_value = False
+    mocker.patch(
+        "controllers.leaderboard_push.get_async_redis",
+        AsyncMock(return_value=mock_async_redis),
+    )
+    return fake
+
+
+@pytest.fixture
+def pages(mocker):
+    # each fetch returns the newest page in the list
+    current = [page((1, "alice", 200.0), (2, "bob", 100.0))]
+    fetch = mocker.patch(
+        "controllers.leaderboard_push.fetch_cached_leaderboard",
+        new_callable=AsyncMock,
+        side_effect=lambda game_id, limit, period: json.dumps(current[-1]).encode(),
+    )
+    fetch.current = current
+    return fetch
+
+
+@pytest_asyncio.fixture(autouse=True)
+async def fast_ticks(mocker):
+    mocker.patch("controllers.leaderboard_push.LEADERBOARD_PUSH_TICK", 0.05)
+    yield
+    await leaderboard_push.close_leaderboard_feeds()
+
+
+def test_diff_lists_changed_rows_and_emptied_ranks():
+    before = page((1, "alice", 200.0), (2, "bob", 100.0), (3, "carol", 50.0))
+    after = page((1, "dave", 300.0), (2, "alice", 200.0), (3, "carol", 50.0))
+
+    assert diff_rows(before["leaderboard"], after["leaderboard"]) == {
+        "changed": [
+            {"rank": 1, "username": "dave", "score": 300.0},
+            {"rank": 2, "username": "alice", "score": 200.0},
+        ],
+        "removed": [],
+    }
+    assert diff_rows(after["leaderboard"], after["leaderboard"][:1])["removed"] == [
+        2,
+        3,
+    ]
+
+
+class TestGameFeed:
+    @pytest.mark.asyncio
+    async def test_viewers_share_one_feed_task(self, pubsub, pages):
+        first = stream_leaderboard_updates("game_001", 10)
+        second = stream_leaderboard_updates("game_001", 10)
+
+        assert parse(await anext(first))[0] == "snapshot"
+        assert parse(await anext(second))[0] == "snapshot"
+        feed = feeds["game_001"]
+        assert sum(len(queues) for queues in feed.subscribers.values()) == 2
+        task = feed.task
+
+        await first.aclose()
+        assert feeds["game_001"].task is task
+        await second.aclose()
+        assert "game_001" not in feeds
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    @pytest.mark.asyncio
+    async def test_one_pubsub_connection_for_every_watched_game(
+        self, mock_async_redis, pubsub, pages
+    ):
+        streams = [stream_leaderboard_updates(f"game_{n:03}", 10) for n in range(1, 4)]
+        for stream in streams:
+            await anext(stream)
+        await asyncio.sleep(0.06)  # let the feeds do their initial push
+        fetches = len(pages.await_args_list)
+
+        pubsub.messages.put_nowait(
+            {
+                "type": "pmessage",
+                "channel": "leaderboard_updates:game_002",
+                "data": "1",
+            }
+        )
+        await asyncio.sleep(0.02)
+
+        assert mock_async_redis.pubsub.call_count == 1
+        pubsub.psubscribe.assert_awaited_once_with("leaderboard_updates:*")
+        refetched = [call.args[0] for call in pages.await_args_list[fetches:]]
+        assert refetched == ["game_002"]
+        for stream in streams:
+            await stream.aclose()
+        assert leaderboard_push.listener is None
+
+    @pytest.mark.asyncio
+    async def test_burst_of_updates_becomes_one_diff(self, pubsub, pages):
+        stream = stream_leaderboard_updates("game_001", 10)
+        kind, snapshot = parse(await anext(stream))
+        assert (kind, snapshot) == ("snapshot", pages.current[-1])
+        await asyncio.sleep(0.06)  # let the feed do its initial push
+        fetches = pages.await_count
+
+        for score in (300.0, 400.0, 500.0):
+            pages.current.append(
+                page((1, "carol", score), (2, "alice", 200.0), (3, "bob", 100.0))
+            )
+            pubsub.messages.put_nowait(
+                {
+                    "type": "pmessage",
+                    "channel": "leaderboard_updates:game_001",
+                    "data": "1",
+                }
+            )
+        kind, diff = parse(await asyncio.wait_for(anext(stream), 1))
+
+        assert kind == "diff"
+        assert diff["changed"][0] == {"rank": 1, "username": "carol", "score": 500.0}
+        assert pages.await_count == fetches + 1
+        task = feeds["game_001"].task
+        await stream.aclose()
+        await asyncio.gather(task, return_exceptions=True)
+
+    @pytest.mark.asyncio
+    async def test_slow_viewer_gets_a_fresh_snapshot(self, mocker):
+        mocker.patch("controllers.leaderboard_push.LEADERBOARD_PUSH_QUEUE_SIZE", 2)
+        feed = GameFeed("game_001")
+        view = ("all", 10)
+        feed.pages[view] = page((1, "alice", 200.0))
+        queue = asyncio.Queue(maxsize=2)
+        feed.subscribers[view] = {queue}
+
+        for _ in range(3):
+            feed.send(view, b"event: diff\ndata: {}\n\n")
+
+        assert queue.qsize() == 1
+        assert parse(queue.get_nowait()) == ("snapshot", feed.pages[view])
+
+    @pytest.mark.asyncio
+    async def test_fetch_failure_sends_an_error_event(self, pubsub, pages):
+        pages.side_effect = None
+        pages.return_value = {"error": "Failed to fetch leaderboard."}
+
+        events = [event async for event in stream_leaderboard_updates("game_001", 10)]
+
+        assert [parse(event)[0] for event in events] == ["error"]
+        assert "game_001" not in feeds
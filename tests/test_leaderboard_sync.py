@@ -0,0 +1,311 @@
+import asyncio
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import insert
+
+from controllers.best_scores import upsert_best_scores
+from controllers.leaderboard_sync import (
+    backfill_player_games,
+    ensure_leaderboard,
+    rehydrate_leaderboard,
+    rebuild_leaderboard,
+    reconcile_leaderboard,
+    replay_queued_history,
+    stream_best_scores,
+)
+from models.tables import LeaderboardEntry, User
+
+
+@pytest.fixture
+def pipe(mock_async_redis):
+    return mock_async_redis.pipeline.return_value.__aenter__.return_value
+
+
+@pytest.fixture
+def sync_redis(mock_async_redis, mocker):
+    mocker.patch(
+        "controllers.leaderboard_sync.get_async_redis",
+        AsyncMock(return_value=mock_async_redis),
+    )
+    for command in ("expire", "zmscore", "zscan", "zrem"):
+        setattr(mock_async_redis, command, AsyncMock())
+    return mock_async_redis
+
+
+@pytest.fixture
+def scores(sqlite_db):
+    async def _scores(game_id: str, rows: list[tuple[int, int]]):
+        for user_id in sorted({user_id for user_id, _ in rows}):
+            sqlite_db.add(
+                User(
+                    id=user_id,
+                    user_code=f"code-{user_id}",
+                    username=f"user{user_id}",
+                    email=f"user{user_id}@example.com",
+                    password_hash="hashed",
+                )
+            )
+        await sqlite_db.commit()
+        history = [
+            {"user_code": f"code-{user_id}", "game_id": game_id, "score": score}
+            for user_id, score in rows
+        ]
+        await sqlite_db.execute(insert(LeaderboardEntry), history)
+        await upsert_best_scores(sqlite_db, history)
+        await sqlite_db.commit()
+
+    return _scores
+
+
+class TestStreamBestScores:
+    @pytest.mark.asyncio
+    async def test_yields_best_score_per_player_in_chunks(
+        self, sqlite_db, scores, mocker
+    ):
+        mocker.patch("controllers.leaderboard_sync.REBUILD_CHUNK_SIZE", 2)
+        await scores("g1", [(1, 10), (1, 40), (2, 20), (3, 30), (3, 5)])
+
+        chunks = [chunk async for chunk in stream_best_scores("g1", sqlite_db)]
+
+        assert [len(chunk) for chunk in chunks] == [2, 1]
+        assert sorted(row for chunk in chunks for row in chunk) == [
+            (1, 40),
+            (2, 20),
+            (3, 30),
+        ]
+
+
+class TestRebuildLeaderboard:
+    @pytest.mark.asyncio
+    async def test_loads_staging_key_and_renames_it_over_the_live_one(
+        self, sqlite_db, scores, sync_redis, pipe
+    ):
+        await scores("g1", [(1, 10), (2, 20)])
+
+        result = await rebuild_leaderboard("g1", sqlite_db)
+
+        staging_key = pipe.zadd.call_args_list[0].args[0]
+        assert staging_key.startswith("leaderboard:g1:rebuild:")
+        assert pipe.zadd.call_args_list[0].args[1] == {1: 10, 2: 20}
+        pipe.rename.assert_called_once_with(staging_key, "leaderboard:g1")
+        pipe.persist.assert_called_once_with("leaderboard:g1")
+        pipe.set.assert_called_once_with("leaderboard_encoding:g1", "plain")
+        pipe.sadd.assert_any_call("player_games:1", "g1")
+        pipe.incr.assert_called_once_with("leaderboard_version:g1")
+        pipe.publish.assert_called_once_with("leaderboard_updates:g1", "")
+        assert result["loaded"] == 2
+
+    @pytest.mark.asyncio
+    async def test_renews_the_lock_after_every_chunk(
+        self, sqlite_db, scores, sync_redis, pipe, mocker
+    ):
+        mocker.patch("controllers.leaderboard_sync.REBUILD_CHUNK_SIZE", 1)
+        await scores("g1", [(1, 10), (2, 20), (3, 30)])
+        renew_lock = AsyncMock()
+
+        result = await rebuild_leaderboard("g1", sqlite_db, renew_lock=renew_lock)
+
+        assert result["loaded"] == 3
+        assert renew_lock.await_count == result["loaded"] + result["caught_up"]
+
+    @pytest.mark.asyncio
+    async def test_game_without_rows_is_deleted(self, sqlite_db, sync_redis, pipe):
+        result = await rebuild_leaderboard("empty", sqlite_db)
+
+        pipe.delete.assert_called_once_with("leaderboard:empty")
+        pipe.rename.assert_not_called()
+        assert result == {"game_id": "empty", "loaded": 0, "caught_up": 0}
+
+
+class TestReconcileLeaderboard:
+    @pytest_asyncio.fixture
+    async def drifted(self, scores, sync_redis):
+        await scores("g1", [(1, 10), (2, 20), (3, 30)])
+        # 1 missing, 2 behind SQL, 3 ahead of SQL, 99 has no SQL rows at all
+        redis_scores = {2: 5.0, 3: 50.0}
+        sync_redis.zmscore.side_effect = lambda key, members: [
+            redis_scores.get(member) for member in members
+        ]
+        sync_redis.zscan.return_value = (0, [("2", 5.0), ("3", 50.0), ("99", 1.0)])
+
+    @pytest.mark.asyncio
+    async def test_diff_reports_drift_without_writing(
+        self, sqlite_db, drifted, sync_redis, pipe
+    ):
+        report = await reconcile_leaderboard("g1", sqlite_db)
+
+        assert report == {
+            "game_id": "g1",
+            "checked": 3,
+            "missing": 1,
+            "behind": 1,
+            "ahead": 1,
+            "extra": 1,
+            "trimmed": 0,
+            "repaired": False,
+        }
+        pipe.zadd.assert_not_called()
+        sync_redis.zrem.assert_not_awaited()
+        pipe.incr.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_repair_raises_stale_scores_and_drops_extras(
+        self, sqlite_db, drifted, sync_redis, pipe
+    ):
+        await reconcile_leaderboard("g1", sqlite_db, repair=True)
+
+        key, stale = pipe.zadd.call_args.args
+        assert (key, stale) == ("leaderboard:g1", {1: 10, 2: 20})
+        sync_redis.zrem.assert_awaited_once_with("leaderboard:g1", 99)
+        pipe.incr.assert_called_once_with("leaderboard_version:g1")
+
+
+class TestEnsureLeaderboard:
+    @pytest.mark.asyncio
+    async def test_present_board_is_checked_once_per_ttl(self, sync_redis, pipe):
+        pipe.execute.return_value = [1, 0, None]
+
+        await ensure_leaderboard("g1")
+        await ensure_leaderboard("g1")
+
+        pipe.execute.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_concurrent_misses_share_one_rehydration(
+        self, sync_redis, pipe, mocker
+    ):
+        pipe.execute.return_value = [0, 1, None]  # evicted
+        rehydrate = mocker.patch(
+            "controllers.leaderboard_sync.rehydrate_leaderboard",
+            new_callable=AsyncMock,
+            return_value=True,
+        )
+
+        await asyncio.gather(*(ensure_leaderboard("g1") for _ in range(5)))
+
+        rehydrate.assert_awaited_once_with("g1")
+
+    @pytest.mark.asyncio
+    async def test_reads_get_an_error_while_another_worker_rebuilds(
+        self, sync_redis, pipe, mocker
+    ):
+        pipe.execute.return_value = [0, 1, None]
+        rehydrate = mocker.patch(
+            "controllers.leaderboard_sync.rehydrate_leaderboard",
+            new_callable=AsyncMock,
+            return_value=False,  # lock still held after the wait
+        )
+
+        first = await ensure_leaderboard("g1")
+        second = await ensure_leaderboard("g1")
+
+        assert (
+            first
+            == second
+            == {"error": "Leaderboard is being rebuilt, try again shortly."}
+        )
+        # not trusted as present, so the next request checks again
+        assert rehydrate.await_count == 2
+        assert await ensure_leaderboard("g1", write=True) is None
+
+    @pytest.mark.asyncio
+    async def test_board_with_another_score_encoding_is_rebuilt(
+        self, sync_redis, pipe, mocker
+    ):
+        mocker.patch("controllers.tie_break.TIE_BREAK_GAMES", frozenset({"g1"}))
+        # built before g1 was switched to tie-breaking
+        pipe.execute.return_value = [1, 0, None]
+        rehydrate = mocker.patch(
+            "controllers.leaderboard_sync.rehydrate_leaderboard",
+            new_callable=AsyncMock,
+            return_value=True,
+        )
+
+        await ensure_leaderboard("g1")
+
+        rehydrate.assert_awaited_once_with("g1")
+
+    @pytest.mark.asyncio
+    async def test_unknown_game_leaves_no_keys(self, sqlite_db, sync_redis, pipe):
+        session_factory = MagicMock()
+        session_factory.return_value.__aenter__.return_value = sqlite_db
+        session_factory.return_value.__aexit__.return_value = False
+        sync_redis.set = AsyncMock(return_value=True)
+        sync_redis.delete = AsyncMock()
+        pipe.execute.return_value = [0, 0, None]
+
+        assert await rehydrate_leaderboard("nobody", session_factory)
+
+        pipe.rename.assert_not_called()
+        pipe.incr.assert_not_called()
+        sync_redis.delete.assert_awaited_once_with("leaderboard_evicted:nobody")
+
+    @pytest.mark.asyncio
+    async def test_unknown_game_is_not_looked_up_again(
+        self, sqlite_db, sync_redis, pipe, mocker
+    ):
+        mocker.patch("controllers.retention.LEADERBOARD_IDLE_TTL", 3600)
+        session_factory = MagicMock()
+        session_factory.return_value.__aenter__.return_value = sqlite_db
+        session_factory.return_value.__aexit__.return_value = False
+        mocker.patch(
+            "controllers.leaderboard_sync.rehydrate_leaderboard",
+            lambda game_id: rehydrate_leaderboard(game_id, session_factory),
+        )
+        sync_redis.set = AsyncMock(return_value=True)
+        sync_redis.delete = AsyncMock()
+        pipe.execute.return_value = [0, 0, None]
+
+        await ensure_leaderboard("nobody")
+        await ensure_leaderboard("nobody")
+
+        session_factory.assert_called_once()
+        # noted by the first check, then taken back out of the eviction index
+        pipe.zrem.assert_called_once_with("leaderboard_activity", "nobody")
+
+
+@pytest.mark.asyncio
+async def test_replay_keeps_negative_bests(sqlite_db, scores, sync_redis, pipe):
+    await scores("other", [(1, 0), (2, 0)])
+    sync_redis.xrange = AsyncMock(
+        side_effect=[
+            [
+                (
+                    "1792000000000-0",
+                    {"user_code": "code-1", "game_id": "golf", "score": "-7"},
+                ),
+                (
+                    "1792000001000-0",
+                    {"user_code": "code-1", "game_id": "golf", "score": "-3"},
+                ),
+                (
+                    "1792000002000-0",
+                    {"user_code": "code-2", "game_id": "golf", "score": "-9"},
+                ),
+            ],
+            [],
+        ]
+    )
+
+    assert await replay_queued_history(sync_redis, "golf", sqlite_db) == 2
+
+    pipe.zadd.assert_called_once_with("leaderboard:golf", {1: -3, 2: -9}, gt=True)
+
+
+@pytest.mark.asyncio
+async def test_backfill_indexes_every_game_a_player_has_a_best_in(
+    sqlite_db, scores, sync_redis, pipe
+):
+    await scores("g1", [(1, 10), (2, 20)])
+    await scores("g2", [(3, 5)])
+
+    indexed = await backfill_player_games(sqlite_db)
+
+    assert indexed == 3
+    assert sorted(call.args for call in pipe.sadd.call_args_list) == [
+        ("player_games:1", "g1"),
+        ("player_games:2", "g1"),
+        ("player_games:3", "g2"),
+    ]
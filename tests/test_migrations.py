@@ -0,0 +1,120 @@
+from pathlib import Path
+
+import pytest
+from alembic import command
+from alembic.autogenerate import compare_metadata
+from alembic.config import Config
+from alembic.migration import MigrationContext
+from sqlalchemy import create_engine, select, text
+
+from controllers.leaderboard import (
+    cold_ranks_query,
+    player_bests_query,
+    player_cold_ranks_query,
+)
+from controllers.leaderboard_sync import best_scores_query
+from models.tables import Base, LeaderboardEntry
+
+ALEMBIC_INI = Path(__file__).parent.parent / "alembic.ini"
+
+
+@pytest.fixture
+def alembic_config(tmp_path):
+    config = Config(str(ALEMBIC_INI))
+    config.set_main_option("sqlalchemy.url", f"sqlite:///{tmp_path / 'migrations.db'}")
+    return config
+
+
+@pytest.fixture
+def migrated_engine(alembic_config):
+    command.upgrade(alembic_config, "head")
+    engine = create_engine(alembic_config.get_main_option("sqlalchemy.url"))
+    yield engine
+    engine.dispose()
+
+
+def query_plan(engine, query) -> str:
+    with engine.connect() as connection:
+        sql = query.compile(
+            dialect=connection.dialect, compile_kwargs={"literal_binds": True}
+        )
+        rows = connection.execute(text(f"EXPLAIN QUERY PLAN {sql}"))
+        return "\n".join(row[-1] for row in rows)
+
+
+def test_migrations_match_the_models(migrated_engine):
+    # a model change without a revision in migrations/versions fails here
+    with migrated_engine.connect() as connection:
+        diff = compare_metadata(MigrationContext.configure(connection), Base.metadata)
+    assert diff == []
+
+
+def test_best_scores_are_backfilled_from_history(alembic_config):
+    command.upgrade(alembic_config, "0003")
+    engine = create_engine(alembic_config.get_main_option("sqlalchemy.url"))
+    with engine.begin() as connection:
+        connection.execute(
+            text(
+                "INSERT INTO leaderboard (user_code, game_id, score, created_at) VALUES "
+                "('code-1', 'g1', 100, '2026-01-01'), ('code-1', 'g1', 300, '2026-01-02'),"
+                "('code-1', 'g1', 300, '2026-01-03'), ('code-2', 'g1', 50, '2026-01-01')"
+            )
+        )
+
+    command.upgrade(alembic_config, "0004")
+
+    with engine.connect() as connection:
+        rows = connection.execute(
+            text(
+                "SELECT user_code, best_score, achieved_at FROM leaderboard_best "
+                "ORDER BY user_code"
+            )
+        ).all()
+    engine.dispose()
+    assert [tuple(row) for row in rows] == [
+        ("code-1", 300, "2026-01-02"),
+        ("code-2", 50, "2026-01-01"),
+    ]
+
+
+class TestLeaderboardQueryPlans:
+    def test_rebuild_scan_reads_one_row_per_player(self, migrated_engine):
+        plan = query_plan(migrated_engine, best_scores_query("game_001"))
+        assert "leaderboard_best USING INDEX ix_leaderboard_best_game_id" in plan
+        assert "GROUP BY" not in plan
+
+    def test_sql_rank_counts_from_the_best_index(self, migrated_engine):
+        query = cold_ranks_query("game_001", ["code-1", "code-2"])
+        plan = query_plan(migrated_engine, query)
+        assert "(game_id=? AND user_code=?)" in plan
+        assert "COVERING INDEX ix_leaderboard_best_game_id_best_score" in plan
+
+    def test_top_scores_read_in_index_order(self, migrated_engine):
+        query = (
+            select(LeaderboardEntry.user_code, LeaderboardEntry.score)
+            .where(LeaderboardEntry.game_id == "game_001")
+            .order_by(LeaderboardEntry.score.desc())
+            .limit(10)
+        )
+        plan = query_plan(migrated_engine, query)
+        assert "USING INDEX ix_leaderboard_game_id_score" in plan
+        assert "TEMP B-TREE" not in plan
+
+    def test_resync_reads_bests_by_primary_key(self, migrated_engine):
+        query = player_bests_query("game_001", ["code-1", "code-2"])
+        plan = query_plan(migrated_engine, query)
+        assert "(game_id=? AND user_code=?)" in plan
+
+    def test_profile_cold_ranks_count_from_the_best_index(self, migrated_engine):
+        query = player_cold_ranks_query(["game_001", "game_002"], "code-1")
+        plan = query_plan(migrated_engine, query)
+        assert "(game_id=? AND user_code=?)" in plan
+        assert "COVERING INDEX ix_leaderboard_best_game_id_best_score" in plan
+
+    def test_player_history_uses_the_player_index(self, migrated_engine):
+        query = select(LeaderboardEntry).where(
+            LeaderboardEntry.user_code == "code-1",
+            LeaderboardEntry.game_id == "game_001",
+        )
+        plan = query_plan(migrated_engine, query)
+        assert "USING INDEX ix_leaderboard_user_code_game_id" in plan
@@ -0,0 +1,54 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from controllers.periods import leaderboard_key, period_boards, period_bounds
+
+
+def utc(*args) -> datetime:
+    return datetime(*args, tzinfo=timezone.utc)
+
+
+@pytest.mark.parametrize(
+    "period, now, label, start, end",
+    [
+        (
+            "daily",
+            utc(2026, 10, 18, 23, 59),
+            "d:2026-10-18",
+            utc(2026, 10, 18),
+            utc(2026, 10, 19),
+        ),
+        (
+            "weekly",
+            utc(2026, 10, 18),
+            "w:2026-W42",
+            utc(2026, 10, 12),
+            utc(2026, 10, 19),
+        ),
+        # ISO week 1 of 2026 starts in December 2025
+        ("weekly", utc(2026, 1, 1), "w:2026-W01", utc(2025, 12, 29), utc(2026, 1, 5)),
+        ("monthly", utc(2026, 12, 31), "m:2026-12", utc(2026, 12, 1), utc(2027, 1, 1)),
+        ("season", utc(2026, 10, 18), "s:2026-Q4", utc(2026, 10, 1), utc(2027, 1, 1)),
+        ("season", utc(2026, 3, 31), "s:2026-Q1", utc(2026, 1, 1), utc(2026, 4, 1)),
+    ],
+)
+def test_period_bounds(period, now, label, start, end):
+    assert period_bounds(period, now) == (label, start, end)
+
+
+def test_leaderboard_key():
+    now = utc(2026, 10, 18, 12)
+    assert leaderboard_key("game_001") == "leaderboard:game_001"
+    assert (
+        leaderboard_key("game_001", "daily", now) == "leaderboard:game_001:d:2026-10-18"
+    )
+
+
+def test_boards_expire_one_window_after_they_close():
+    boards = dict(period_boards("game_001", utc(2026, 10, 18, 12)))
+
+    assert boards["leaderboard:game_001:d:2026-10-18"] == utc(2026, 10, 20).timestamp()
+    assert boards["leaderboard:game_001:w:2026-W42"] == utc(2026, 10, 26).timestamp()
+    assert boards["leaderboard:game_001:m:2026-10"] == utc(2026, 12, 2).timestamp()
+    assert boards["leaderboard:game_001:s:2026-Q4"] == utc(2027, 4, 3).timestamp()
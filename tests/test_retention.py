@@ -0,0 +1,244 @@
+from datetime import datetime
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from sqlalchemy import insert
+
+from models.response import AuthenticatedUser, UserSummary
+from models.tables import LeaderboardBest
+from controllers.leaderboard import (
+    fetch_cold_ranks,
+    fetch_user_rank,
+    get_player_ranks_from_redis,
+    submit_best_score_params,
+    submit_score,
+)
+from controllers.retention import evict_idle_leaderboards, seed_activity, trim_board
+
+PLAYER = AuthenticatedUser(id=7, username="gina")
+
+
+@pytest.fixture(autouse=True)
+def kept_game(mocker):
+    mocker.patch.dict("controllers.retention.LEADERBOARD_KEEP_TOP", {"long": 3})
+
+
+@pytest.fixture
+def pipe(mock_async_redis):
+    return mock_async_redis.pipeline.return_value.__aenter__.return_value
+
+
+@pytest.fixture
+def bests(sqlite_db):
+    async def _bests(rows: dict[str, int]):
+        await sqlite_db.execute(
+            insert(LeaderboardBest),
+            [
+                {
+                    "game_id": "long",
+                    "user_code": user_code,
+                    "best_score": score,
+                    "achieved_at": datetime(2026, 10, 18),
+                }
+                for user_code, score in rows.items()
+            ],
+        )
+        await sqlite_db.commit()
+
+    return _bests
+
+
+def test_trim_keeps_top_k_and_leaves_other_games_alone():
+    pipe = MagicMock()
+
+    trim_board(pipe, "leaderboard:long", "long")
+    trim_board(pipe, "leaderboard:short", "short")
+
+    pipe.zremrangebyrank.assert_called_once_with("leaderboard:long", 0, -4)
+
+
+def test_script_is_told_how_many_to_keep():
+    assert submit_best_score_params("long", [(7, 50)])["args"][-4] == 3
+    assert submit_best_score_params("short", [(7, 50)])["args"][-4] == 0
+
+
+@pytest.mark.asyncio
+async def test_cold_rank_counts_higher_bests_in_sql(sqlite_db, bests):
+    await bests({"a": 500, "b": 400, "c": 400, "gina": 100, "z": 50})
+
+    ranks = await fetch_cold_ranks("long", ["gina", "c", "nobody"], sqlite_db)
+
+    # 0-based, ties share a rank
+    assert ranks == {"gina": (100, 3), "c": (400, 1)}
+
+
+@pytest.mark.asyncio
+async def test_failed_cold_rank_count_still_accepts_the_score(
+    async_db_session, mock_async_redis, mocker, make_submit_request, make_current_user
+):
+    mocker.patch(
+        "controllers.leaderboard.get_user_summary",
+        AsyncMock(return_value=UserSummary(id=1, user_code="gina", username="g")),
+    )
+    mocker.patch(
+        "controllers.leaderboard.submit_best_score",
+        AsyncMock(return_value=[None, None]),  # cut off the kept top 3
+    )
+    mocker.patch(
+        "controllers.leaderboard.fetch_cold_ranks",
+        AsyncMock(side_effect=RuntimeError("db gone")),
+    )
+    resync = mocker.patch("controllers.leaderboard.resync_player_bests")
+
+    result = await submit_score(
+        make_submit_request(game_id="long", score=90),
+        make_current_user(),
+        async_db_session,
+    )
+
+    assert result == {
+        "message": "Score submitted successfully.",
+        "best_score": 90,
+        "score": 90,
+        "rank": None,
+        "approximate": True,
+    }
+    resync.assert_not_called()
+
+
+class TestFetchUserRank:
+    @pytest.mark.asyncio
+    async def test_kept_player_gets_exact_redis_rank(self, sqlite_db, pipe):
+        pipe.execute.return_value = [1, 400.0]
+
+        result = await fetch_user_rank("long", current_user=PLAYER, db=sqlite_db)
+
+        assert result == {"user_id": 7, "rank": 2, "score": 400.0}
+
+    @pytest.mark.asyncio
+    async def test_trimmed_player_is_ranked_from_sql(
+        self, sqlite_db, bests, pipe, mocker
+    ):
+        await bests({"a": 500, "b": 400, "c": 300, "gina": 100})
+        mocker.patch(
+            "controllers.leaderboard.get_user_summary",
+            AsyncMock(return_value=UserSummary(id=7, user_code="gina", username="g")),
+        )
+        pipe.execute.return_value = [None, None]
+
+        result = await fetch_user_rank("long", current_user=PLAYER, db=sqlite_db)
+
+        assert result == {"user_id": 7, "rank": 4, "score": 100, "approximate": True}
+
+
+@pytest.mark.asyncio
+async def test_profile_ranks_trimmed_players_from_sql(
+    sqlite_db, bests, mock_async_redis, pipe
+):
+    await bests({"a": 500, "b": 400, "c": 300, "gina": 100})
+    mock_async_redis.smembers.return_value = {"long", "short"}
+    # gina was cut off "long" and still holds rank 3 on "short"
+    pipe.execute.return_value = [None, None, 1, 0, 2, 80.0, 1, 0]
+
+    games = await get_player_ranks_from_redis(7, "gina", sqlite_db)
+
+    assert games == {
+        "long": {"score": 100, "rank": 4, "approximate": True},
+        "short": {"score": 80.0, "rank": 3},
+    }
+
+
+@pytest.mark.asyncio
+async def test_profile_ranks_every_cold_game_in_one_query(
+    sqlite_db, bests, mock_async_redis, pipe, mocker
+):
+    await bests({"a": 500, "gina": 100})
+    await sqlite_db.execute(
+        insert(LeaderboardBest),
+        [
+            {
+                "game_id": "gone",
+                "user_code": "gina",
+                "best_score": 70,
+                "achieved_at": datetime(2026, 10, 18),
+            }
+        ],
+    )
+    mock_async_redis.smembers.return_value = {"long", "gone"}
+    # "gone" was evicted, gina was cut off "long"
+    pipe.execute.return_value = [None, None, 0, 1, None, None, 1, 0]
+    execute = mocker.spy(sqlite_db, "execute")
+
+    games = await get_player_ranks_from_redis(7, "gina", sqlite_db)
+
+    assert games == {
+        "gone": {"score": 70, "rank": 1, "approximate": True},
+        "long": {"score": 100, "rank": 2, "approximate": True},
+    }
+    execute.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_profile_ranks_evicted_games_from_sql(
+    sqlite_db, bests, mock_async_redis, pipe, mocker
+):
+    mocker.patch.dict("controllers.retention.LEADERBOARD_KEEP_TOP", clear=True)
+    await bests({"a": 500, "gina": 100})
+    mock_async_redis.smembers.return_value = {"long"}
+    # board gone, marker set: the next read or write rebuilds it
+    pipe.execute.return_value = [None, None, 0, 1]
+
+    games = await get_player_ranks_from_redis(7, "gina", sqlite_db)
+
+    assert games == {"long": {"score": 100, "rank": 2, "approximate": True}}
+
+
+@pytest.mark.asyncio
+async def test_idle_games_lose_their_boards_but_get_a_marker(
+    mock_async_redis, pipe, mocker
+):
+    mocker.patch(
+        "controllers.retention.get_async_redis",
+        AsyncMock(return_value=mock_async_redis),
+    )
+    mocker.patch("controllers.retention.LEADERBOARD_IDLE_TTL", 3600)
+    mock_async_redis.zrangebyscore = AsyncMock(return_value=["old", "busy"])
+    # "busy" was touched again after the range was read
+    mock_async_redis.zscore.side_effect = [1.0, 9e12]
+
+    evicted = await evict_idle_leaderboards()
+
+    assert evicted == ["old"]
+    pipe.set.assert_called_once_with("leaderboard_evicted:old", 1)
+    pipe.unlink.assert_called_once_with("leaderboard:old")
+    pipe.zrem.assert_called_once_with("leaderboard_activity", "old")
+
+
+@pytest.mark.asyncio
+async def test_boards_already_in_redis_are_seeded_into_the_activity_index(
+    mock_async_redis, pipe, mocker
+):
+    mocker.patch(
+        "controllers.retention.get_async_redis",
+        AsyncMock(return_value=mock_async_redis),
+    )
+    mocker.patch("controllers.retention.time.time", return_value=1000.0)
+    mock_async_redis.scan = AsyncMock(
+        side_effect=[
+            (7, ["leaderboard:old", "leaderboard:old:d:2026-10-18"]),
+            (0, ["leaderboard:g:rebuild:abc", "leaderboard:x:y"]),
+        ]
+    )
+    # the daily board and the staging key expire, the all-time boards don't
+    pipe.execute.side_effect = [[-1, 86400], [3600, -1]]
+    mock_async_redis.zadd = AsyncMock(return_value=1)
+
+    assert await seed_activity() == 2
+
+    mock_async_redis.scan.assert_awaited_with(
+        7, match="leaderboard:*", count=100, _type="zset"
+    )
+    assert mock_async_redis.zadd.await_args_list == [
+        mocker.call("leaderboard_activity", {"old": 1000.0}, nx=True),
+        mocker.call("leaderboard_activity", {"x:y": 1000.0}, nx=True),
+    ]
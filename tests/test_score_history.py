@@ -0,0 +1,179 @@
+from datetime import datetime
+from unittest.mock import AsyncMock
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from controllers import score_history
+from controllers.leaderboard import submit_score
+from controllers.score_history import (
+    SCORE_HISTORY_GROUP,
+    SCORE_HISTORY_STREAM,
+    drain_score_history,
+    history_stats,
+    persist_messages,
+    write_history_batch,
+)
+from models.tables import LeaderboardBest, LeaderboardEntry
+
+
+def message(message_id: str, submission_id: str, score: int = 100):
+    return (
+        message_id,
+        {
+            "submission_id": submission_id,
+            "user_code": "code-1",
+            "game_id": "game_001",
+            "score": str(score),
+        },
+    )
+
+
+@pytest.fixture
+def pipe(mock_async_redis):
+    return mock_async_redis.pipeline.return_value.__aenter__.return_value
+
+
+@pytest.fixture
+def history_redis(mock_async_redis, mocker):
+    mocker.patch(
+        "controllers.score_history.get_async_redis",
+        AsyncMock(return_value=mock_async_redis),
+    )
+    mock_async_redis.xgroup_create = AsyncMock()
+    mock_async_redis.xreadgroup = AsyncMock()
+    return mock_async_redis
+
+
+class TestWriteBehindSubmit:
+    @pytest.fixture(autouse=True)
+    def write_behind(self, mocker, mock_leaderboard_user):
+        mocker.patch("controllers.leaderboard.SCORE_WRITE_BEHIND", True)
+        mocker.patch(
+            "controllers.leaderboard.get_user_summary",
+            new_callable=AsyncMock,
+            return_value=mock_leaderboard_user,
+        )
+
+    @pytest.mark.asyncio
+    async def test_queues_history_with_ranking_instead_of_committing(
+        self,
+        async_db_session,
+        mock_async_redis,
+        pipe,
+        mocker,
+        make_submit_request,
+        make_current_user,
+    ):
+        mock_script = mocker.patch(
+            "controllers.leaderboard.submit_best_score", new_callable=AsyncMock
+        )
+        pipe.execute.return_value = [[None, 0], "1700000000000-0"]
+
+        result = await submit_score(
+            make_submit_request(score=150), make_current_user(), async_db_session
+        )
+
+        assert result["rank"] == 1
+        async_db_session.commit.assert_not_awaited()
+        mock_async_redis.pipeline.assert_called_once_with(transaction=True)
+        assert mock_script.await_args.kwargs["client"] is pipe
+        stream, fields = pipe.xadd.call_args.args
+        assert stream == SCORE_HISTORY_STREAM
+        assert fields["user_code"] == "test-uuid-123"
+        assert fields["score"] == 150
+        assert fields["submission_id"]
+
+
+class TestHistoryWriter:
+    @pytest.mark.asyncio
+    async def test_batch_insert_skips_already_written_submissions(self, sqlite_db):
+        session_factory = async_sessionmaker(bind=sqlite_db.bind)
+        history_stats["duplicates"] = 0
+
+        first = await write_history_batch(
+            [message("1700000000000-0", "sub-1")], session_factory
+        )
+        # redelivery of sub-1 after a crash, together with a new entry
+        second = await write_history_batch(
+            [message("1700000000000-0", "sub-1"), message("1700000001000-0", "sub-2")],
+            session_factory,
+        )
+
+        entries = (await sqlite_db.scalars(select(LeaderboardEntry))).all()
+        assert (first, second) == (1, 1)
+        assert sorted(e.submission_id for e in entries) == ["sub-1", "sub-2"]
+        assert history_stats["duplicates"] == 1
+        best = await sqlite_db.scalar(select(LeaderboardBest.best_score))
+        assert best == 100
+        # created_at comes from the stream id, not from when the writer ran
+        assert entries[0].created_at.replace(tzinfo=None) == datetime(
+            2023, 11, 14, 22, 13, 20
+        )
+
+    @pytest.mark.asyncio
+    async def test_written_entries_are_acked_and_deleted(
+        self, mock_async_redis, pipe, mocker
+    ):
+        mocker.patch(
+            "controllers.score_history.write_history_batch",
+            new_callable=AsyncMock,
+            return_value=2,
+        )
+
+        await persist_messages(
+            mock_async_redis, [message("1-0", "sub-1"), message("2-0", "sub-2")]
+        )
+
+        pipe.xack.assert_called_once_with(
+            SCORE_HISTORY_STREAM, SCORE_HISTORY_GROUP, "1-0", "2-0"
+        )
+        pipe.xdel.assert_called_once_with(SCORE_HISTORY_STREAM, "1-0", "2-0")
+
+    @pytest.mark.asyncio
+    async def test_failed_insert_leaves_entries_pending(
+        self, mock_async_redis, pipe, mocker
+    ):
+        mocker.patch(
+            "controllers.score_history.write_history_batch",
+            new_callable=AsyncMock,
+            side_effect=Exception("DB down"),
+        )
+
+        with pytest.raises(Exception):
+            await persist_messages(mock_async_redis, [message("1-0", "sub-1")])
+
+        pipe.xack.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_drain_flushes_own_pending_then_undelivered(
+        self, history_redis, mocker
+    ):
+        persist = mocker.patch(
+            "controllers.score_history.persist_messages", new_callable=AsyncMock
+        )
+        pending, undelivered = [message("1-0", "sub-1")], [message("2-0", "sub-2")]
+        history_redis.xreadgroup.side_effect = [
+            [[SCORE_HISTORY_STREAM, pending]],
+            [],
+            [[SCORE_HISTORY_STREAM, undelivered]],
+            [],
+        ]
+
+        await drain_score_history(timeout=5)
+
+        starts = [
+            next(iter(c.args[2].values()))
+            for c in history_redis.xreadgroup.await_args_list
+        ]
+        assert starts == ["0", "0", ">", ">"]
+        assert [c.args[1] for c in persist.await_args_list] == [pending, undelivered]
+
+
+def test_backlog_stats_are_registered():
+    from config.metrics import collect_metrics
+
+    assert (
+        collect_metrics()["score_history"].keys() == score_history.history_stats.keys()
+    )
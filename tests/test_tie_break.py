@@ -0,0 +1,55 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from controllers.tie_break import (
+    MAX_TIE_BREAK_SCORE,
+    decode_score,
+    encode_score,
+    score_in_range,
+)
+
+
+@pytest.fixture(autouse=True)
+def tie_break_game(mocker):
+    mocker.patch("controllers.tie_break.TIE_BREAK_GAMES", frozenset({"race"}))
+
+
+def utc(*args) -> datetime:
+    return datetime(*args, tzinfo=timezone.utc)
+
+
+def test_plain_games_are_stored_as_is():
+    assert encode_score("other", 500, utc(2026, 10, 18)) == 500
+    assert decode_score("other", "500") == 500.0
+    assert decode_score("other", None) is None
+
+
+def test_earlier_achiever_ranks_higher_on_a_tie():
+    first = encode_score("race", 500, utc(2026, 10, 18, 12, 0, 0))
+    second = encode_score("race", 500, utc(2026, 10, 18, 12, 0, 1))
+    higher = encode_score("race", 501, utc(2030, 1, 1))
+
+    assert higher > first > second
+    assert decode_score("race", first) == decode_score("race", second) == 500
+
+
+@pytest.mark.parametrize("score", [0, 1, -7, MAX_TIE_BREAK_SCORE, -MAX_TIE_BREAK_SCORE])
+def test_round_trips_exactly_through_a_double(score):
+    stored = encode_score("race", score, utc(2162, 1, 1))
+
+    # Redis keeps sorted-set scores as doubles and replies in %.17g
+    assert float(f"{float(stored):.17g}") == stored
+    assert decode_score("race", f"{float(stored):.17g}") == score
+
+
+def test_naive_datetimes_are_read_as_utc():
+    assert encode_score("race", 10, datetime(2026, 10, 18)) == encode_score(
+        "race", 10, utc(2026, 10, 18)
+    )
+
+
+def test_scores_outside_the_exact_range_are_rejected():
+    assert score_in_range("race", MAX_TIE_BREAK_SCORE)
+    assert not score_in_range("race", MAX_TIE_BREAK_SCORE + 1)
+    assert score_in_range("other", 10**12)
@@ -0,0 +1,160 @@
+import pytest
+
+from unittest.mock import AsyncMock
+
+from controllers.user_summaries import (
+    USER_SUMMARY_CHANNEL,
+    USER_SUMMARY_TOMBSTONE_TTL,
+    USER_SUMMARY_TTL,
+    get_user_summaries,
+    get_user_summary,
+    invalidate_user_summary,
+    cache_locally,
+    user_summaries,
+)
+from models.response import UserSummary
+from models.tables import User
+
+
+def make_summary(user_id: int, username: str, **fields) -> UserSummary:
+    return UserSummary(
+        id=user_id, user_code=f"code-{user_id}", username=username, **fields
+    )
+
+
+@pytest.fixture
+def pipe(mock_async_redis):
+    return mock_async_redis.pipeline.return_value.__aenter__.return_value
+
+
+class TestGetUserSummaries:
+    @pytest.mark.asyncio
+    async def test_local_hit_skips_redis_and_db(self, async_db_session, pipe):
+        cache_locally(make_summary(1, "alice"))
+
+        result = await get_user_summaries([1], async_db_session)
+
+        assert result[1].username == "alice"
+        pipe.execute.assert_not_awaited()
+        async_db_session.execute.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_redis_hit_skips_db_and_is_kept_locally(self, async_db_session, pipe):
+        pipe.execute.return_value = [
+            {
+                "id": "1",
+                "user_code": "code-1",
+                "username": "alice",
+                "avatar_url": "",
+                "is_active": "1",
+                "is_verified": "0",
+            }
+        ]
+
+        result = await get_user_summaries([1], async_db_session)
+
+        assert result[1] == make_summary(1, "alice", is_active=True)
+        pipe.hgetall.assert_called_once_with("user_summary:1")
+        async_db_session.execute.assert_not_awaited()
+        assert user_summaries.get(1) == result[1]
+
+    @pytest.mark.asyncio
+    async def test_misses_loaded_in_one_query_and_written_back(
+        self, async_db_session, pipe, mocker
+    ):
+        fill = mocker.patch(
+            "controllers.user_summaries.fill_user_summary", new_callable=AsyncMock
+        )
+        pipe.execute.side_effect = [[{}, {}], []]
+        async_db_session.execute.return_value = [
+            mocker.Mock(
+                id=user_id,
+                user_code=f"code-{user_id}",
+                username=username,
+                avatar_url=None,
+                is_active=True,
+                is_verified=True,
+            )
+            for user_id, username in ((1, "alice"), (2, "bob"))
+        ]
+
+        result = await get_user_summaries([1, 2, 1], async_db_session)
+
+        assert [result[1].username, result[2].username] == ["alice", "bob"]
+        async_db_session.execute.assert_awaited_once()
+        # written only where no copy or tombstone exists
+        fill.assert_any_await(
+            keys=["user_summary:2"],
+            args=[USER_SUMMARY_TTL, "id", 2, "user_code", "code-2", "username", "bob"]
+            + ["avatar_url", "", "is_active", 1, "is_verified", 1],
+            client=pipe,
+        )
+        assert fill.await_count == 2
+
+    @pytest.mark.asyncio
+    async def test_redis_failure_falls_back_to_db(self, async_db_session, pipe):
+        pipe.execute.side_effect = Exception("Redis down")
+        async_db_session.execute.return_value = []
+
+        result = await get_user_summaries([1], async_db_session)
+
+        assert result == {}
+        async_db_session.execute.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_single_query_against_sqlite(self, sqlite_db, pipe, mocker):
+        sqlite_db.add_all(
+            [
+                User(
+                    id=user_id,
+                    user_code=f"code-{user_id}",
+                    username=f"user{user_id}",
+                    email=f"user{user_id}@example.com",
+                    password_hash="hashed",
+                )
+                for user_id in range(1, 51)
+            ]
+        )
+        await sqlite_db.commit()
+        pipe.execute.side_effect = [[{}] * 50, []]
+        execute = mocker.spy(sqlite_db, "execute")
+
+        result = await get_user_summaries(list(range(1, 51)), sqlite_db)
+
+        assert len(result) == 50
+        assert result[50].username == "user50"
+        assert execute.await_count == 1
+        assert await get_user_summary(50, sqlite_db) == result[50]
+        assert execute.await_count == 1
+
+
+class TestInvalidateUserSummary:
+    @pytest.mark.asyncio
+    async def test_drops_local_and_redis_copies_and_broadcasts(self, pipe):
+        cache_locally(make_summary(1, "alice"))
+
+        await invalidate_user_summary(1)
+
+        assert user_summaries.get(1) is None
+        pipe.delete.assert_called_once_with("user_summary:1")
+        pipe.hset.assert_called_once_with("user_summary:1", "invalidated", 1)
+        pipe.expire.assert_called_once_with(
+            "user_summary:1", USER_SUMMARY_TOMBSTONE_TTL
+        )
+        pipe.publish.assert_called_once_with(USER_SUMMARY_CHANNEL, 1)
+        pipe.execute.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_tombstone_is_a_miss(self, async_db_session, pipe):
+        pipe.execute.side_effect = [[{"invalidated": "1"}], []]
+        async_db_session.execute.return_value = []
+
+        await get_user_summaries([1], async_db_session)
+
+        async_db_session.execute.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_redis_failure_does_not_fail_the_committed_change(self, pipe):
+        pipe.execute.side_effect = Exception("Redis down")
+
+        await invalidate_user_summary(1)
@@ -1,7 +1,9 @@
 import pytest
 from fastapi import HTTPException
-from unittest.mock import Mock
+from unittest.mock import AsyncMock, Mock
+from models.response import UserSummary
 from controllers.users import (
+    get_current_identity,
     get_current_user,
     get_user_profile,
     update_user_profile,
@@ -12,7 +14,7 @@ from controllers.users import (
 class TestGetCurrentUser:
     @pytest.mark.asyncio
     async def test_get_current_user_success(
-        self, mocker, db_session, mock_user_from_db
+        self, mocker, async_db_session, mock_user_from_db
     ):
         """Test successfully retrieving current user's profile"""
         # Mock token verification (patch where it's imported from)
@@ -22,9 +24,7 @@ class TestGetCurrentUser:
         )
 
         # Mock database query
-        db_session.query.return_value.filter.return_value.first.return_value = (
-            mock_user_from_db
-        )
+        async_db_session.scalar.return_value = mock_user_from_db
 
         # Mock Redis player ranks
         mocker.patch(
@@ -34,7 +34,7 @@ class TestGetCurrentUser:
 
         mock_request = Mock()
         mock_request.headers = {"Authorization": "Bearer valid_token"}
-        result = await get_current_user(request=mock_request, db=db_session)
+        result = await get_current_user(request=mock_request, db=async_db_session)
 
         assert result.id == 1
         assert result.username == "testuser"
@@ -42,7 +42,7 @@ class TestGetCurrentUser:
         assert result.is_verified is True
 
     @pytest.mark.asyncio
-    async def test_get_current_user_invalid_token(self, mocker, db_session):
+    async def test_get_current_user_invalid_token(self, mocker, async_db_session):
         """Test with invalid token"""
         mocker.patch(
             "controllers.auth.verify_token",
@@ -52,28 +52,28 @@ class TestGetCurrentUser:
         mock_request = Mock()
         mock_request.headers = {"Authorization": "Bearer invalid_token"}
         with pytest.raises(HTTPException) as exc_info:
-            await get_current_user(request=mock_request, db=db_session)
+            await get_current_user(request=mock_request, db=async_db_session)
 
         assert exc_info.value.status_code == 401
 
     @pytest.mark.asyncio
-    async def test_get_current_user_not_found(self, mocker, db_session):
+    async def test_get_current_user_not_found(self, mocker, async_db_session):
         """Test when user doesn't exist in database"""
         mocker.patch(
             "controllers.auth.verify_token",
             return_value={"user_id": 999, "username": "nonexistent"},
         )
-        db_session.query.return_value.filter.return_value.first.return_value = None
+        async_db_session.scalar.return_value = None
 
         mock_request = Mock()
         mock_request.headers = {"Authorization": "Bearer valid_token"}
         with pytest.raises(HTTPException) as exc_info:
-            await get_current_user(request=mock_request, db=db_session)
+            await get_current_user(request=mock_request, db=async_db_session)
 
         assert exc_info.value.status_code == 404
 
     @pytest.mark.asyncio
-    async def test_get_current_user_inactive(self, mocker, db_session):
+    async def test_get_current_user_inactive(self, mocker, async_db_session):
         """Test when user is inactive"""
         inactive_user = Mock()
         inactive_user.id = 1
@@ -83,65 +83,118 @@ class TestGetCurrentUser:
             "controllers.auth.verify_token",
             return_value={"user_id": 1, "username": "testuser"},
         )
-        db_session.query.return_value.filter.return_value.first.return_value = (
-            inactive_user
-        )
+        async_db_session.scalar.return_value = inactive_user
 
         mock_request = Mock()
         mock_request.headers = {"Authorization": "Bearer valid_token"}
         with pytest.raises(HTTPException) as exc_info:
-            await get_current_user(db=db_session, request=mock_request)
+            await get_current_user(db=async_db_session, request=mock_request)
 
         assert exc_info.value.status_code == 404
 
 
+class TestGetCurrentIdentity:
+    @pytest.fixture(autouse=True)
+    def get_user_summary(self, mocker):
+        mocker.patch(
+            "controllers.auth.verify_token",
+            return_value={"user_id": 1, "username": "testuser"},
+        )
+        return mocker.patch(
+            "controllers.users.get_user_summary",
+            new_callable=AsyncMock,
+            return_value=UserSummary(id=1, username="testuser", user_code="code-1"),
+        )
+
+    @pytest.mark.asyncio
+    async def test_returns_claims_without_rank_lookup(
+        self, mocker, async_db_session, get_user_summary
+    ):
+        """Identity comes from the token plus the cached active flag only"""
+        get_ranks = mocker.patch("controllers.users.get_player_ranks_from_redis")
+
+        mock_request = Mock()
+        mock_request.headers = {"Authorization": "Bearer valid_token"}
+        result = await get_current_identity(request=mock_request, db=async_db_session)
+
+        assert result.id == 1
+        assert result.username == "testuser"
+        assert result.is_active is True
+        get_user_summary.assert_awaited_once_with(1, async_db_session)
+        get_ranks.assert_not_called()
+        async_db_session.scalar.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_missing_bearer_header(self, async_db_session, get_user_summary):
+        """Test without an Authorization header"""
+        mock_request = Mock()
+        mock_request.headers = {}
+        with pytest.raises(HTTPException) as exc_info:
+            await get_current_identity(request=mock_request, db=async_db_session)
+
+        assert exc_info.value.status_code == 401
+        get_user_summary.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_inactive_or_missing_user(self, async_db_session, get_user_summary):
+        """Deactivated and deleted users are both rejected"""
+        mock_request = Mock()
+        mock_request.headers = {"Authorization": "Bearer valid_token"}
+
+        for summary in (
+            UserSummary(id=1, username="testuser", user_code="code-1", is_active=False),
+            None,
+        ):
+            get_user_summary.return_value = summary
+            with pytest.raises(HTTPException) as exc_info:
+                await get_current_identity(request=mock_request, db=async_db_session)
+
+            assert exc_info.value.status_code == 404
+
+
 class TestGetUserProfile:
     @pytest.mark.asyncio
     async def test_get_user_profile_success(
-        self, mocker, db_session, mock_different_user
+        self, mocker, async_db_session, mock_different_user
     ):
         """Test successfully retrieving another user's profile"""
-        db_session.query.return_value.filter.return_value.first.return_value = (
-            mock_different_user
-        )
+        async_db_session.scalar.return_value = mock_different_user
 
         mocker.patch(
             "controllers.users.get_player_ranks_from_redis",
             return_value={"game_002": {"score": 250, "rank": 2}},
         )
 
-        result = await get_user_profile("otheruser", db=db_session)
+        result = await get_user_profile("otheruser", db=async_db_session)
 
         assert result.username == "otheruser"
         assert result.avatar_url == "https://example.com/other.jpg"
         assert "game_002" in result.games
 
     @pytest.mark.asyncio
-    async def test_get_user_profile_not_found(self, mocker, db_session):
+    async def test_get_user_profile_not_found(self, mocker, async_db_session):
         """Test when profile doesn't exist"""
-        db_session.query.return_value.filter.return_value.first.return_value = None
+        async_db_session.scalar.return_value = None
 
         with pytest.raises(HTTPException) as exc_info:
-            await get_user_profile("nonexistent", db=db_session)
+            await get_user_profile("nonexistent", db=async_db_session)
 
         assert exc_info.value.status_code == 404
         assert "User not found" in str(exc_info.value.detail)
 
     @pytest.mark.asyncio
     async def test_get_user_profile_no_games(
-        self, mocker, db_session, mock_different_user
+        self, mocker, async_db_session, mock_different_user
     ):
         """Test user profile with no game history"""
-        db_session.query.return_value.filter.return_value.first.return_value = (
-            mock_different_user
-        )
+        async_db_session.scalar.return_value = mock_different_user
 
         mocker.patch(
             "controllers.users.get_player_ranks_from_redis",
             return_value={},
         )
 
-        result = await get_user_profile("otheruser", db=db_session)
+        result = await get_user_profile("otheruser", db=async_db_session)
 
         assert result.username == "otheruser"
         assert result.games == {}
@@ -150,50 +203,56 @@ class TestGetUserProfile:
 class TestUpdateUserProfile:
     @pytest.mark.asyncio
     async def test_update_avatar_success(
-        self, mocker, db_session, mock_current_user, mock_upload_file
+        self, mocker, async_db_session, mock_current_user, mock_upload_file
     ):
         """Test successfully updating user avatar"""
         mock_user = Mock()
         mock_user.id = 1
         mock_user.username = "testuser"
-        db_session.query.return_value.filter.return_value.first.return_value = mock_user
+        async_db_session.scalar.return_value = mock_user
 
         # Mock Cloudinary upload
         mocker.patch(
             "controllers.users.upload_avatar",
             return_value="https://cloudinary.com/new_avatar.jpg",
         )
+        invalidate = mocker.patch(
+            "controllers.users.invalidate_user_summary", new_callable=AsyncMock
+        )
 
         result = await update_user_profile(
-            db_session, mock_current_user, mock_upload_file
+            async_db_session, mock_current_user, mock_upload_file
         )
 
         assert result["message"] == "avatar updated successfully."
         assert mock_user.avatar_url == "https://cloudinary.com/new_avatar.jpg"
-        db_session.commit.assert_called_once()
-        db_session.refresh.assert_called_once_with(mock_user)
+        async_db_session.commit.assert_awaited_once()
+        async_db_session.refresh.assert_awaited_once_with(mock_user)
+        invalidate.assert_awaited_once_with(1)
 
     @pytest.mark.asyncio
     async def test_update_avatar_user_not_found(
-        self, mocker, db_session, mock_current_user, mock_upload_file
+        self, mocker, async_db_session, mock_current_user, mock_upload_file
     ):
         """Test updating avatar when user doesn't exist"""
-        db_session.query.return_value.filter.return_value.first.return_value = None
+        async_db_session.scalar.return_value = None
 
         with pytest.raises(HTTPException) as exc_info:
-            await update_user_profile(db_session, mock_current_user, mock_upload_file)
+            await update_user_profile(
+                async_db_session, mock_current_user, mock_upload_file
+            )
 
         assert exc_info.value.status_code == 404
 
     @pytest.mark.asyncio
     async def test_update_avatar_db_error(
-        self, mocker, db_session, mock_current_user, mock_upload_file
+        self, mocker, async_db_session, mock_current_user, mock_upload_file
     ):
         """Test avatar update with database error"""
         mock_user = Mock()
         mock_user.id = 1
-        db_session.query.return_value.filter.return_value.first.return_value = mock_user
-        db_session.commit.side_effect = Exception("DB error")
+        async_db_session.scalar.return_value = mock_user
+        async_db_session.commit.side_effect = Exception("DB error")
 
         mocker.patch(
             "controllers.users.upload_avatar",
@@ -202,7 +261,7 @@ class TestUpdateUserProfile:
 
         with pytest.raises(Exception):
             result = await update_user_profile(
-                db_session, mock_current_user, mock_upload_file
+                async_db_session, mock_current_user, mock_upload_file
             )
             assert result.status_code == 500
             assert "Failed to update user profile" in str(result.detail)
@@ -210,49 +269,58 @@ class TestUpdateUserProfile:
 
 class TestRemoveUserAvatar:
     @pytest.mark.asyncio
-    async def test_remove_avatar_success(self, mocker, db_session, mock_current_user):
+    async def test_remove_avatar_success(
+        self, mocker, async_db_session, mock_current_user
+    ):
         """Test successfully removing user avatar"""
         mock_user = Mock()
         mock_user.id = 1
         mock_user.username = "testuser"
-        db_session.query.return_value.filter.return_value.first.return_value = mock_user
+        async_db_session.scalar.return_value = mock_user
 
         # Mock Cloudinary delete
         mocker.patch("controllers.users.delete_avatar", return_value=None)
 
+        invalidate = mocker.patch(
+            "controllers.users.invalidate_user_summary", new_callable=AsyncMock
+        )
+
         # Mock default avatar generation
         generate_mock = mocker.patch(
             "controllers.users.generate_default_avatar",
             return_value="https://ui-avatars.com/api/?name=testuser&size=200&background=random&color=fff&bold=true",
         )
 
-        result = await remove_user_avatar(db_session, mock_current_user)
+        result = await remove_user_avatar(async_db_session, mock_current_user)
 
         assert result["message"] == "avatar deleted successfully."
         generate_mock.assert_called_once_with(username="testuser")
-        db_session.commit.assert_called_once()
-        db_session.refresh.assert_called_once_with(mock_user)
+        async_db_session.commit.assert_awaited_once()
+        async_db_session.refresh.assert_awaited_once_with(mock_user)
+        invalidate.assert_awaited_once_with(1)
 
     @pytest.mark.asyncio
     async def test_remove_avatar_user_not_found(
-        self, mocker, db_session, mock_current_user
+        self, mocker, async_db_session, mock_current_user
     ):
         """Test removing avatar when user doesn't exist"""
-        db_session.query.return_value.filter.return_value.first.return_value = None
+        async_db_session.scalar.return_value = None
 
         with pytest.raises(HTTPException) as exc_info:
-            await remove_user_avatar(db_session, mock_current_user)
+            await remove_user_avatar(async_db_session, mock_current_user)
 
         assert exc_info.value.status_code == 404
 
     @pytest.mark.asyncio
-    async def test_remove_avatar_db_error(self, mocker, db_session, mock_current_user):
+    async def test_remove_avatar_db_error(
+        self, mocker, async_db_session, mock_current_user
+    ):
         """Test avatar removal with database error"""
         mock_user = Mock()
         mock_user.id = 1
         mock_user.username = "testuser"
-        db_session.query.return_value.filter.return_value.first.return_value = mock_user
-        db_session.commit.side_effect = Exception("DB error")
+        async_db_session.scalar.return_value = mock_user
+        async_db_session.commit.side_effect = Exception("DB error")
 
         mocker.patch("controllers.users.delete_avatar", return_value=None)
         mocker.patch(
@@ -261,19 +329,19 @@ class TestRemoveUserAvatar:
         )
 
         with pytest.raises(Exception):
-            result = await remove_user_avatar(db_session, mock_current_user)
+            result = await remove_user_avatar(async_db_session, mock_current_user)
             assert result.status_code == 500
             assert "Failed to delete user avatar" in str(result.detail)
 
     @pytest.mark.asyncio
     async def test_remove_avatar_cloudinary_error(
-        self, mocker, db_session, mock_current_user
+        self, mocker, async_db_session, mock_current_user
     ):
         """Test avatar removal with Cloudinary error"""
         mock_user = Mock()
         mock_user.id = 1
         mock_user.username = "testuser"
-        db_session.query.return_value.filter.return_value.first.return_value = mock_user
+        async_db_session.scalar.return_value = mock_user
 
         # Mock Cloudinary delete with error
         mocker.patch(
@@ -282,6 +350,6 @@ class TestRemoveUserAvatar:
         )
 
         with pytest.raises(Exception):
-            result = await remove_user_avatar(db_session, mock_current_user)
+            result = await remove_user_avatar(async_db_session, mock_current_user)
             assert result.status_code == 500
             assert "Failed to delete avatar. Please try again." in str(result.detail)